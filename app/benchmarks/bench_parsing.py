@@ -0,0 +1,396 @@
+"""
+Parsing benchmarks on real-sized timeline pages.
+
+    python -m app.benchmarks.bench_parsing [--pages DIR] [--op SearchTimeline] [--repeat 200]
+
+Each case first checks that the optimized path returns exactly what the generic one does, then times both.
+"""
+import argparse
+import dataclasses
+import datetime
+import gc
+import json
+import os
+import re
+import tempfile
+import timeit
+import tracemalloc
+from collections import defaultdict
+
+import pyarrow.parquet as pq
+
+from app.benchmarks.pages import OPERATION_ROOTS, load_pages, make_page
+from app.scraper.twscrape.columnar import TweetParquetWriter
+from app.scraper.twscrape.filters import in_window, utc_day
+from app.scraper.twscrape.instructions import extract_page
+from app.scraper.twscrape.models import Coordinates, Media, MediaAnimated, MediaVideo, MediaVideoVariant, Place, \
+    PollCard, PollOption, TextLink, Tweet, User, UserRef, interned_users, parse_tweet_views, parse_tweets, \
+    _get_source_label, _get_source_url, _parse_card, _parse_source
+from app.scraper.twscrape.serializer import tweet_to_json
+from app.scraper.twscrape.utils import find_obj, get_by_path, get_typed_object, to_old_obj, to_old_rep
+
+
+def _generic_page(obj: dict, cursor_type: str = "Bottom"):
+    els = get_by_path(obj, "entries") or []
+    cur = find_obj(obj, lambda x: x.get("cursorType") == cursor_type)
+    return els, cur.get("value") if cur else None
+
+
+def _targeted_page(obj: dict, op: str, cursor_type: str = "Bottom"):
+    page = extract_page(obj, op)
+    return page.entries, page.cursor(cursor_type)
+
+
+def _generic_old_rep(obj: dict) -> dict[str, dict]:
+    # to_old_rep before the single pass: recursive walk, then a copy of every tweet and user occurrence
+    tmp = get_typed_object(obj, defaultdict(list))
+    tw1 = {str(x["rest_id"]): to_old_obj(x) for x in tmp.get("Tweet", []) if "legacy" in x}
+    tw2 = [x["tweet"] for x in tmp.get("TweetWithVisibilityResults", []) if "legacy" in x["tweet"]]
+    tw2 = {str(x["rest_id"]): to_old_obj(x) for x in tw2}
+    users = {str(x["rest_id"]): to_old_obj(x) for x in tmp.get("User", []) if "legacy" in x and "id" in x}
+    trends = {x["name"]: x for x in tmp.get("TimelineTrend", [])}
+    return {"tweets": {**tw1, **tw2}, "users": users, "trends": trends}
+
+
+def _parse_all(rep: dict):
+    return [User.parse(x) for x in rep["users"].values()], [Tweet.parse(x, rep) for x in rep["tweets"].values()]
+
+
+def bench_old_rep(pages: list[dict], repeat: int):
+    for obj in pages:
+        generic, single = _generic_old_rep(obj), to_old_rep(obj)
+        for key in ("tweets", "users"):
+            assert list(single[key]) == list(generic[key]), f"{key} differ from the recursive walk"
+            assert single[key] == generic[key], f"{key} differ from to_old_obj"
+        assert single["trends"] == generic["trends"], "trends differ from the recursive walk"
+
+    n = len(pages) * repeat
+    generic = timeit.timeit(lambda: [_generic_old_rep(x) for x in pages], number=repeat)
+    single = timeit.timeit(lambda: [to_old_rep(x) for x in pages], number=repeat)
+    print(f"to_old_rep ({n} pages)")
+    print(f"  recursive walk + copies : {generic / n * 1e6:8.1f} us/page")
+    print(f"  single pass             : {single / n * 1e6:8.1f} us/page ({generic / single:.1f}x)")
+
+    # and the whole parse of the page, of which to_old_rep is a part
+    reps = [(_generic_old_rep(x), to_old_rep(x)) for x in pages]
+    generic = timeit.timeit(lambda: [_parse_all(_generic_old_rep(x)) for x in pages], number=repeat)
+    single = timeit.timeit(lambda: [_parse_all(to_old_rep(x)) for x in pages], number=repeat)
+    assert all(_parse_all(a) == _parse_all(b) for a, b in reps), "parsed models differ"
+    print(f"to_old_rep + User.parse + Tweet.parse ({n} pages)")
+    print(f"  recursive walk + copies : {generic / n * 1e6:8.1f} us/page")
+    print(f"  single pass             : {single / n * 1e6:8.1f} us/page ({generic / single:.1f}x)")
+
+
+def bench_extract(pages: list[dict], op: str, repeat: int):
+    for obj in pages:
+        assert _targeted_page(obj, op) == _generic_page(obj), "targeted extraction differs from the tree walk"
+
+    generic = timeit.timeit(lambda: [_generic_page(x) for x in pages], number=repeat)
+    targeted = timeit.timeit(lambda: [_targeted_page(x, op) for x in pages], number=repeat)
+    n = len(pages) * repeat
+    print(f"cursor + entries ({op}, {n} pages)")
+    print(f"  get_by_path + find_obj : {generic / n * 1e6:8.1f} us/page")
+    print(f"  extract_page           : {targeted / n * 1e6:8.1f} us/page ({generic / targeted:.1f}x)")
+
+
+def _filter_fields(tweets: list) -> list[tuple]:
+    # what the stopping conditions and the date-window exclusion read
+    if tweets and isinstance(tweets[0], Tweet):
+        return [(t.id, t.date, t.user.username, t.user.pinnedIds, t.retweetedTweet.id if t.retweetedTweet else None,
+                 t.quotedTweet.id if t.quotedTweet else None) for t in tweets]
+    return [(t.id, t.date, t.username, t.pinnedIds, t.retweetedId, t.quotedId) for t in tweets]
+
+
+def bench_views(pages: list[dict], repeat: int):
+    for obj in pages:
+        tweets, views = list(parse_tweets(obj)), list(parse_tweet_views(obj))
+        assert _filter_fields(views) == _filter_fields(tweets), "views differ from the parsed tweets"
+        assert [x.tweet() for x in views] == tweets, "materialized views differ from the parsed tweets"
+
+    n = len(pages) * repeat
+    full = timeit.timeit(lambda: [_filter_fields(list(parse_tweets(x))) for x in pages], number=repeat)
+    views = timeit.timeit(lambda: [_filter_fields(list(parse_tweet_views(x))) for x in pages], number=repeat)
+    print(f"ids, date & author of every tweet ({n} pages)")
+    print(f"  parse_tweets      : {full / n * 1e6:8.1f} us/page")
+    print(f"  parse_tweet_views : {views / n * 1e6:8.1f} us/page ({full / views:.1f}x)")
+
+
+def _held(raw: list[str]) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    tweets = []
+    for x in raw:
+        tweets.extend(parse_tweets(json.loads(x)))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, len(tweets)
+
+
+def _generic_source(tw_obj: dict) -> tuple[str | None, str | None]:
+    # _get_source_url & _get_source_label before the memo: two regex searches, compiled (or looked up) every time
+    source = tw_obj.get("source", None)
+    url = m.group(1) if source and (m := re.search(r'href=[\'"]?([^\'" >]+)', source)) else None
+    label = m.group(1) if source and (m := re.search(r">([^<]*)<", source)) else None
+    return url, label
+
+
+def bench_source(pages: list[dict], repeat: int):
+    objs = [x for obj in pages for x in to_old_rep(obj)["tweets"].values()]
+    # the pages are generated with a single source, recorded ones may have a few
+    objs += [{**x, "source": s} for x, s in zip(objs, [
+        '<a href="http://twitter.com/download/iphone" rel="nofollow">Twitter for iPhone</a>',
+        '<a href="http://twitter.com/download/android" rel="nofollow">Twitter for Android</a>',
+        "", None,
+    ])]
+    for x in objs:
+        assert (_get_source_url(x), _get_source_label(x)) == _generic_source(x), "source differs"
+
+    n = len(objs) * repeat
+    _parse_source.cache_clear()
+    generic = timeit.timeit(lambda: [_generic_source(x) for x in objs], number=repeat)
+    memo = timeit.timeit(lambda: [(_get_source_url(x), _get_source_label(x)) for x in objs], number=repeat)
+    print(f"source url & label ({n} tweets, {_parse_source.cache_info().currsize} distinct sources)")
+    print(f"  re.search per tweet : {generic / n * 1e9:8.0f} ns/tweet")
+    print(f"  memoized            : {memo / n * 1e9:8.0f} ns/tweet ({generic / memo:.1f}x)")
+
+
+def _generic_card(obj: dict) -> dict | None:
+    # summary and poll cards before the dispatch table: list rebuilt by each extraction, linear scan per key
+    name = obj["card"]["legacy"]["name"]
+    val = [x for x in obj["card"]["legacy"]["binding_values"] if x["value"]["type"] != "IMAGE_COLOR"]
+
+    def get_str(key, default=None):
+        return next((x["value"]["string_value"] for x in val if x["key"] == key), default)
+
+    if name == "summary_large_image":
+        is_title = lambda x: x["key"] == "title" or x["key"].endswith("_alt_text")
+        titles = sorted([x["value"]["string_value"] for x in val if is_title(x)], key=len, reverse=True)
+        val = [x for x in val if not is_title(x)]
+        description, vanity_url, url = get_str("description", ""), get_str("vanity_url", ""), get_str("card_url", "")
+        val = [x for x in val if x["key"] not in ("description", "vanity_url", "card_url")]
+        photos = sorted([x for x in val if x["value"]["type"] == "IMAGE"],
+                        key=lambda x: x["value"]["image_value"]["height"], reverse=True)
+        photo = {"url": photos[0]["value"]["image_value"]["url"]} if photos else None
+        return {"title": titles[0] if titles else "", "description": description, "vanityUrl": vanity_url,
+                "url": url, "photo": photo, "video": None, "_type": "summary"}
+
+    options = []
+    for x in range(20):
+        label, votes = get_str(f"choice{x + 1}_label"), get_str(f"choice{x + 1}_count")
+        if label is None or votes is None:
+            break
+        options.append({"label": label, "votesCount": int(votes)})
+    finished = next((x["value"]["boolean_value"] for x in val if x["key"] == "counts_are_final"), False)
+    return {"finished": finished, "_type": "poll", "options": options}
+
+
+def bench_cards(pages: list[dict], repeat: int):
+    objs = [x for obj in pages for x in to_old_rep(obj)["tweets"].values() if "card" in x]
+    # the pages only have summary cards, add as many 4 choices polls
+    poll = {"card": {"legacy": {"name": "poll4choice_text_only", "binding_values": [
+        *[{"key": f"choice{i}_{k}", "value": {"type": "STRING", "string_value": v}}
+          for i in range(1, 5) for k, v in [("label", f"Choix {i}"), ("count", str(i * 17))]],
+        {"key": "counts_are_final", "value": {"type": "BOOLEAN", "boolean_value": True}},
+        {"key": "duration_minutes", "value": {"type": "STRING", "string_value": "1440"}},
+    ]}}}
+    objs += [poll] * len(objs)
+    for x in objs:
+        assert _parse_card(x, "").dict() == _generic_card(x), "card differs"
+
+    n = len(objs) * repeat
+    generic = timeit.timeit(lambda: [_generic_card(x) for x in objs], number=repeat)
+    dispatch = timeit.timeit(lambda: [_parse_card(x, "") for x in objs], number=repeat)
+    print(f"summary & poll cards ({n} cards)")
+    print(f"  if-chain + linear lookups : {generic / n * 1e9:8.0f} ns/card")
+    print(f"  dispatch + indexed values : {dispatch / n * 1e9:8.0f} ns/card ({generic / dispatch:.1f}x)")
+
+
+def _generic_window(tweets: list, start_date: str, end_date: str) -> list:
+    # the timeline filter before the sets: references and exclusions in lists, the bounds parsed for every tweet
+    rt_tweets = [t.retweetedId for t in tweets if t.retweetedId is not None]
+    qt_tweets = [t.quotedId for t in tweets if t.quotedId is not None]
+    user_tweets = [t for t in tweets if (t.id not in rt_tweets) and (t.id not in qt_tweets)]
+    user_excluded_tweets = [
+        d for d in user_tweets
+        if not datetime.datetime.strptime(start_date, "%Y-%m-%d").replace(
+            tzinfo=datetime.timezone.utc) <= d.date < datetime.datetime.strptime(end_date, "%Y-%m-%d").replace(
+            tzinfo=datetime.timezone.utc)
+    ]
+    excluded_tweets = []
+    for t in user_excluded_tweets:
+        if t.retweetedId is not None:
+            excluded_tweets.append(t.retweetedId)
+        if t.quotedId is not None:
+            excluded_tweets.append(t.quotedId)
+        excluded_tweets.append(t.id)
+    return [d for d in tweets if not d.id in excluded_tweets]
+
+
+def bench_timeline_filter(op: str, sizes: tuple[int, ...] = (5_000, 50_000)):
+    # a timeline over 20 days, the window keeps the 10 in the middle
+    tweets, day = [], 0
+    while len(tweets) < max(sizes):
+        page = json.dumps(make_page(op, n=100, start_id=1_890_000_000_000_000_000 - day * 10**6, seed=day))
+        tweets.extend(parse_tweet_views(json.loads(page.replace("Feb 18", f"Feb {day % 20 + 1:02d}"))))
+        day += 1
+    start_date, end_date = "2025-02-06", "2025-02-16"
+
+    print(f"timeline date window & retweet/quote exclusion ({op})")
+    for n in sizes:
+        timeline = tweets[:n]
+        [t.date for t in timeline]  # parsed once, by both
+        start = timeit.default_timer()
+        generic = _generic_window(timeline, start_date, end_date)
+        generic_s = timeit.default_timer() - start
+        start = timeit.default_timer()
+        kept = in_window(timeline, utc_day(start_date), utc_day(end_date))
+        sets_s = timeit.default_timer() - start
+        assert [t.id for t in kept] == [t.id for t in generic], "kept tweets differ"
+        print(f"  {n:6d} tweets ({len(kept)} kept) lists: {generic_s * 1e3:9.1f} ms, "
+              f"sets: {sets_s * 1e3:7.1f} ms ({generic_s / sets_s:.0f}x)")
+
+
+def bench_memory(pages: list[dict]):
+    # what a run keeps in memory: the models and the strings they hold once the responses are gone
+    raw = [json.dumps(x) for x in pages]
+    size, n = _held(raw)
+    with interned_users():
+        interned, _ = _held(raw)
+    print(f"memory held by the parsed tweets ({n} tweets, users, media and cards included)")
+    print(f"  {size / n:8.0f} bytes/tweet")
+    print(f"  {interned / n:8.0f} bytes/tweet with interned users ({size / interned:.1f}x)")
+
+
+def bench_users(pages: list[dict], repeat: int):
+    plain = [list(parse_tweets(x)) for x in pages]
+    with interned_users():
+        assert [list(parse_tweets(x)) for x in pages] == plain, "tweets with interned users differ"
+
+    with interned_users() as users:
+        interned = timeit.timeit(lambda: [list(parse_tweets(x)) for x in pages], number=repeat)
+    plain = timeit.timeit(lambda: [list(parse_tweets(x)) for x in pages], number=repeat)
+
+    n = len(pages) * repeat
+    print(f"to_old_rep + Tweet.parse ({n} pages, {users.hits / (users.hits + users.misses):.0%} users reused)")
+    print(f"  User.parse every tweet : {plain / n * 1e6:8.1f} us/page")
+    print(f"  interned users         : {interned / n * 1e6:8.1f} us/page ({plain / interned:.1f}x)")
+
+
+def _reference_json(tweet: Tweet, date_scrape: str) -> str:
+    # Tweet.dict() stamps date_scrape with the current time, at every level
+    def fix(d: dict) -> dict:
+        d["date_scrape"] = date_scrape
+        for k in ("retweetedTweet", "quotedTweet"):
+            if d[k]:
+                fix(d[k])
+        return d
+
+    return json.dumps(fix(tweet.dict()))
+
+
+def _variants(tweets: list[Tweet]) -> list[Tweet]:
+    # the fields the synthetic pages leave empty
+    video = MediaVideo("https://pbs.twimg.com/v.jpg", [MediaVideoVariant("video/mp4", 832000, "https://v.mp4")], 9000)
+    user = dataclasses.replace(tweets[1].user, descriptionLinks=[TextLink("https://a.ca", "a.ca", "https://t.co/a")],
+                               profileBannerUrl=None, protected=True)
+    return [
+        dataclasses.replace(
+            x,
+            user=user if i % 2 else x.user,
+            rawContent=x.rawContent + ' "é" \\ \n\t 😀 \u2028',
+            retweetedTweet=tweets[i - 1] if i % 3 == 1 else None,
+            coordinates=Coordinates(-73.5673, 45.5017) if i % 2 else None,
+            place=Place("1", "Montréal, Québec", "Montréal", "city", "Canada", "CA") if i % 2 else None,
+            card=PollCard([PollOption("Oui", 3), PollOption("Non", 1)], True) if i % 3 == 2 else x.card,
+            media=Media(videos=[video], animated=[MediaAnimated("https://t.jpg", "https://a.mp4")]) if i % 2 else x.media,
+            inReplyToUser=UserRef(42, "42", "bob", "Bob") if i % 2 else None,
+            viewCount=None if i % 2 else x.viewCount,
+            possibly_sensitive=None if i % 3 == 0 else x.possibly_sensitive,
+        )
+        for i, x in enumerate(tweets)
+    ]
+
+
+def bench_serializer(pages: list[dict], repeat: int):
+    date_scrape = "2025-02-18 12:00:00"
+    tweets = [x for obj in pages for x in parse_tweets(obj)]
+    for x in tweets + _variants(tweets):
+        assert tweet_to_json(x, date_scrape) == _reference_json(x, date_scrape), f"tweet {x.id} differs from dict()"
+
+    n = len(tweets) * repeat
+    generic = timeit.timeit(lambda: [json.dumps(x.dict()) for x in tweets], number=repeat)
+    direct = timeit.timeit(lambda: [tweet_to_json(x, date_scrape) for x in tweets], number=repeat)
+    size = sum(len(tweet_to_json(x, date_scrape)) for x in tweets) * repeat
+    print(f"tweet to a JSON line ({n} tweets)")
+    print(f"  json.dumps(Tweet.dict()) : {n / generic:8.0f} tweets/s {size / generic / 2 ** 20:6.1f} MiB/s")
+    print(f"  tweet_to_json            : {n / direct:8.0f} tweets/s {size / direct / 2 ** 20:6.1f} MiB/s "
+          f"({generic / direct:.1f}x)")
+
+
+def bench_columnar(pages: list[dict]):
+    # the same tweets as JSON lines and as Parquet, then what analytics do: one column over every row
+    tweets = [x for obj in pages for x in parse_tweets(obj)]
+    tweets += _variants(tweets)
+    with tempfile.TemporaryDirectory() as tmp:
+        path_jsonl, path_parquet = os.path.join(tmp, "t.jsonl"), os.path.join(tmp, "t.parquet")
+        with open(path_jsonl, "w") as f:
+            f.writelines(tweet_to_json(x) + "\n" for x in tweets)
+        with TweetParquetWriter(path_parquet) as w:
+            w.write(tweets)
+
+        def scan_jsonl():
+            with open(path_jsonl) as f:
+                return sum(int(json.loads(x)["likeCount"]) for x in f)
+
+        def scan_parquet():
+            return pq.read_table(path_parquet, columns=["likeCount"]).column("likeCount").to_pylist()
+
+        assert sum(scan_parquet()) == scan_jsonl() == sum(x.likeCount for x in tweets), "columns differ"
+        size_jsonl, size_parquet = os.path.getsize(path_jsonl), os.path.getsize(path_parquet)
+        jsonl = timeit.timeit(scan_jsonl, number=10) / 10
+        parquet = timeit.timeit(scan_parquet, number=10) / 10
+
+    print(f"sum of likeCount ({len(tweets)} tweets)")
+    print(f"  JSON lines : {size_jsonl / 2 ** 20:6.1f} MiB {jsonl * 1e3:8.1f} ms")
+    print(f"  Parquet    : {size_parquet / 2 ** 20:6.1f} MiB {parquet * 1e3:8.1f} ms "
+          f"({size_jsonl / size_parquet:.1f}x smaller, {jsonl / parquet:.0f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default=None, help="directory of recorded responses (*.json) to use")
+    parser.add_argument("--op", default="UserTweetsAndReplies", choices=list(OPERATION_ROOTS.keys()))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = load_pages(args.pages)
+    else:
+        pages = [make_page(args.op, start_id=1_890_000_000_000_000_000 - i * 10**6, seed=i) for i in range(10)]
+    size = sum(len(json.dumps(x)) for x in pages) / len(pages)
+    print(f"{len(pages)} pages, {size / 1024:.0f} KiB on average\n")
+
+    bench_extract(pages, args.op, args.repeat)
+    print()
+    bench_old_rep(pages, args.repeat)
+    print()
+    bench_views(pages, args.repeat)
+    print()
+    bench_users(pages, args.repeat)
+    print()
+    bench_source(pages, args.repeat)
+    print()
+    bench_cards(pages, args.repeat)
+    print()
+    bench_timeline_filter(args.op)
+    print()
+    bench_memory(pages)
+    print()
+    bench_serializer(pages, args.repeat)
+    print()
+    bench_columnar(pages)
+
+
+if __name__ == "__main__":
+    main()
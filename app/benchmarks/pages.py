@@ -0,0 +1,204 @@
+"""
+Synthetic GraphQL timeline pages shaped (and sized) like real ones: tweets with their author, quoted tweets, cards,
+conversation modules and the extra fields the API sends but the parser ignores. Recorded pages can be used instead
+through `load_pages`.
+"""
+import glob
+import json
+import os
+import random
+
+OPERATION_ROOTS = {
+    "SearchTimeline": lambda ins: {"search_by_raw_query": {"search_timeline": {"timeline": {"instructions": ins}}}},
+    "UserTweetsAndReplies": lambda ins: {
+        "user": {"result": {"__typename": "User", "timeline_v2": {"timeline": {"instructions": ins}}}}
+    },
+    "ListLatestTweetsTimeline": lambda ins: {"list": {"tweets_timeline": {"timeline": {"instructions": ins}}}},
+    "GenericTimelineById": lambda ins: {"timeline": {"timeline": {"instructions": ins}}},
+}
+
+DATE_FMT = "%a %b %d %H:%M:%S +0000 %Y"
+
+
+def make_user(rnd: random.Random, uid: int) -> dict:
+    name = f"user_{uid}"
+    return {
+        "__typename": "User",
+        "id": f"VXNlcjo{uid}",
+        "rest_id": str(uid),
+        "affiliates_highlighted_label": {},
+        "has_graduated_access": True,
+        "is_blue_verified": rnd.random() < 0.3,
+        "profile_image_shape": "Circle",
+        "legacy": {
+            "id_str": str(uid),
+            "can_dm": False,
+            "can_media_tag": True,
+            "created_at": "Wed Oct 10 20:19:24 +0000 2018",
+            "default_profile": False,
+            "default_profile_image": False,
+            "description": " ".join(rnd.choice(["news", "politics", "Canada", "Québec", "media", "views"])
+                                    for _ in range(25)),
+            "entities": {
+                "description": {"urls": []},
+                "url": {"urls": [{"display_url": "example.com", "expanded_url": "https://example.com",
+                                  "url": "https://t.co/abcdefghij", "indices": [0, 23]}]},
+            },
+            "fast_followers_count": 0,
+            "favourites_count": rnd.randint(0, 50_000),
+            "followers_count": rnd.randint(0, 500_000),
+            "friends_count": rnd.randint(0, 5_000),
+            "has_custom_timelines": True,
+            "is_translator": False,
+            "listed_count": rnd.randint(0, 5_000),
+            "location": "Montréal, Québec",
+            "media_count": rnd.randint(0, 10_000),
+            "name": name.title(),
+            "normal_followers_count": rnd.randint(0, 500_000),
+            "pinned_tweet_ids_str": [str(rnd.randint(10**18, 2 * 10**18))],
+            "possibly_sensitive": False,
+            "profile_banner_url": f"https://pbs.twimg.com/profile_banners/{uid}/1600000000",
+            "profile_image_url_https": f"https://pbs.twimg.com/profile_images/{uid}/photo_normal.jpg",
+            "profile_interstitial_type": "",
+            "screen_name": name,
+            "statuses_count": rnd.randint(0, 100_000),
+            "translator_type": "none",
+            "url": "https://t.co/abcdefghij",
+            "verified": False,
+            "want_retweets": False,
+            "withheld_in_countries": [],
+        },
+        "professional": {"rest_id": str(uid * 7), "professional_type": "Business", "category": []},
+        "tipjar_settings": {},
+    }
+
+
+def make_tweet(rnd: random.Random, twid: int, user: dict, date: str, quoted: dict | None = None,
+               card: bool = False) -> dict:
+    text = " ".join(rnd.choice(["la", "le", "budget", "élection", "#cdnpoli", "vote", "ministre", "@bob"])
+                    for _ in range(40))
+    legacy = {
+        "bookmark_count": rnd.randint(0, 100),
+        "bookmarked": False,
+        "created_at": date,
+        "conversation_id_str": str(twid),
+        "display_text_range": [0, len(text)],
+        "entities": {
+            "hashtags": [{"indices": [0, 9], "text": "cdnpoli"}],
+            "symbols": [],
+            "timestamps": [],
+            "urls": [{"display_url": "example.com/a", "expanded_url": "https://example.com/a",
+                      "url": "https://t.co/klmnopqrst", "indices": [100, 123]}],
+            "user_mentions": [{"id_str": "42", "name": "Bob", "screen_name": "bob", "indices": [10, 14]}],
+        },
+        "extended_entities": {"media": [{
+            "display_url": "pic.x.com/xyz", "expanded_url": f"https://x.com/{user['legacy']['screen_name']}/status/1",
+            "id_str": str(twid + 1), "indices": [124, 147], "media_key": f"3_{twid + 1}",
+            "media_url_https": "https://pbs.twimg.com/media/abc.jpg", "type": "photo", "url": "https://t.co/xyz",
+            "ext_media_availability": {"status": "Available"},
+            "features": {"large": {"faces": []}, "medium": {"faces": []}, "small": {"faces": []}},
+            "sizes": {k: {"h": 1200, "w": 1600, "resize": "fit"} for k in ["large", "medium", "small", "thumb"]},
+            "original_info": {"height": 1200, "width": 1600, "focus_rects": [{"x": 0, "y": 0, "w": 1600, "h": 896}]},
+        }]},
+        "favorite_count": rnd.randint(0, 10_000),
+        "favorited": False,
+        "full_text": text,
+        "is_quote_status": quoted is not None,
+        "lang": "fr",
+        "possibly_sensitive": False,
+        "possibly_sensitive_editable": True,
+        "quote_count": rnd.randint(0, 100),
+        "reply_count": rnd.randint(0, 100),
+        "retweet_count": rnd.randint(0, 1_000),
+        "retweeted": False,
+        "user_id_str": user["rest_id"],
+        "id_str": str(twid),
+    }
+    obj = {
+        "__typename": "Tweet",
+        "rest_id": str(twid),
+        "core": {"user_results": {"result": user}},
+        "unmention_data": {},
+        "edit_control": {"edit_tweet_ids": [str(twid)], "editable_until_msecs": "1700000000000",
+                         "is_edit_eligible": True, "edits_remaining": "5"},
+        "is_translatable": True,
+        "views": {"count": str(rnd.randint(0, 10**6)), "state": "EnabledWithCount"},
+        "source": '<a href="https://mobile.twitter.com" rel="nofollow">Twitter Web App</a>',
+        "legacy": legacy,
+    }
+    if quoted is not None:
+        legacy["quoted_status_id_str"] = quoted["rest_id"]
+        legacy["quoted_status_permalink"] = {"url": "https://t.co/q", "expanded": "https://x.com/q", "display": "x.com/q"}
+        obj["quoted_status_result"] = {"result": quoted}
+    if card:
+        obj["card"] = {"rest_id": "https://t.co/klmnopqrst", "legacy": {
+            "name": "summary_large_image",
+            "url": "https://t.co/klmnopqrst",
+            "binding_values": [
+                {"key": "title", "value": {"type": "STRING", "string_value": "Un titre"}},
+                {"key": "description", "value": {"type": "STRING", "string_value": text[:120]}},
+                {"key": "domain", "value": {"type": "STRING", "string_value": "example.com"}},
+                {"key": "vanity_url", "value": {"type": "STRING", "string_value": "example.com"}},
+                {"key": "card_url", "value": {"type": "STRING", "string_value": "https://t.co/klmnopqrst"}},
+                *[{"key": f"{k}_{s}", "value": {"type": "IMAGE", "image_value": {
+                    "url": "https://pbs.twimg.com/card_img/1/abc", "height": 600, "width": 1200}}}
+                  for k in ["thumbnail_image", "summary_photo_image", "photo_image_full_size"]
+                  for s in ["small", "large", "x_large", "original"]],
+                {"key": "photo_image_full_size_color", "value": {"type": "IMAGE_COLOR", "image_color_value": {
+                    "palette": [{"rgb": {"blue": 1, "green": 2, "red": 3}, "percentage": 50.0}]}}},
+            ],
+        }}
+    return obj
+
+
+def _item(twid: int, tweet: dict) -> dict:
+    return {"itemType": "TimelineTweet", "__typename": "TimelineTweet", "tweet_results": {"result": tweet},
+            "tweetDisplayType": "Tweet"}
+
+
+def make_page(op: str = "UserTweetsAndReplies", n: int = 20, start_id: int = 1_890_000_000_000_000_000,
+              cursor: str | None = "DAABCgABGNsbq", seed: int = 0) -> dict:
+    """
+    One page of `op` with `n` entries: a third of them quote another tweet, a quarter carry a card and, like on real
+    timelines with replies, every fifth entry is a conversation module (parent tweet + reply).
+    """
+    rnd = random.Random(seed)
+    users = [make_user(rnd, 10_000 + i) for i in range(8)]
+    entries = []
+    for i in range(n):
+        twid, user = start_id - i * 1_000, users[i % len(users)]
+        date = f"Tue Feb 18 {10 + i % 10:02d}:{i % 60:02d}:00 +0000 2025"
+        quoted = make_tweet(rnd, twid - 500, users[(i + 1) % len(users)], date) if i % 3 == 0 else None
+        tweet = make_tweet(rnd, twid, user, date, quoted=quoted, card=i % 4 == 0)
+        if i % 5 == 4:
+            parent = make_tweet(rnd, twid - 700, users[(i + 2) % len(users)], date)
+            entries.append({"entryId": f"profile-conversation-{twid}", "sortIndex": str(twid), "content": {
+                "entryType": "TimelineTimelineModule", "__typename": "TimelineTimelineModule",
+                "displayType": "VerticalConversation",
+                "items": [{"entryId": f"profile-conversation-{twid}-tweet-{x['rest_id']}", "item": {
+                    "itemContent": _item(int(x["rest_id"]), x)}} for x in (parent, tweet)],
+            }})
+        else:
+            entries.append({"entryId": f"tweet-{twid}", "sortIndex": str(twid), "content": {
+                "entryType": "TimelineTimelineItem", "__typename": "TimelineTimelineItem",
+                "itemContent": _item(twid, tweet)}})
+
+    entries.append({"entryId": f"cursor-top-{start_id}", "sortIndex": str(start_id + 1), "content": {
+        "entryType": "TimelineTimelineCursor", "__typename": "TimelineTimelineCursor", "value": "DAABCgABGNsbtop",
+        "cursorType": "Top"}})
+    if cursor is not None:
+        entries.append({"entryId": f"cursor-bottom-{start_id}", "sortIndex": "0", "content": {
+            "entryType": "TimelineTimelineCursor", "__typename": "TimelineTimelineCursor", "value": cursor,
+            "cursorType": "Bottom"}})
+
+    instructions = [{"type": "TimelineClearCache"}, {"type": "TimelineAddEntries", "entries": entries}]
+    return {"data": OPERATION_ROOTS[op](instructions)}
+
+
+def load_pages(path: str) -> list[dict]:
+    """Recorded responses, one JSON document per `*.json` file of `path`."""
+    pages = []
+    for file in sorted(glob.glob(os.path.join(path, "*.json"))):
+        with open(file, "r") as f:
+            pages.append(json.load(f))
+    return pages
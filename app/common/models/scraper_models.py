@@ -14,6 +14,7 @@ class CustomQuery(BaseModel):
     bool_upload_to_s3: bool = True
     bool_change_to_new_format: bool = False
     force_collection: bool = False
+    output_format: Optional[Literal["jsonl", "parquet", "both"]] = None  # the config's by default
 
 
 class Limits(BaseModel):
@@ -41,6 +42,42 @@ class Dates(BaseModel):
     end_date: str
 
 
+class Watermarks(BaseModel):
+    enabled: bool = False
+    overlap_hours: int = 12
+
+
+class QueryPacking(BaseModel):
+    enabled: bool = False
+    page_size: int = 20
+    max_pages: int = 1
+    max_query_length: int = 500
+
+
+class UserResolution(BaseModel):
+    enabled: bool = False
+    ttl_days: int = 90
+    negative_ttl_days: int = 7
+    concurrency: int = 8
+
+
+class ParseOffload(BaseModel):
+    enabled: bool = False
+    workers: Optional[int] = None
+    min_page_kib: int = 32
+
+
+class Archive(BaseModel):
+    enabled: bool = False
+
+
+class Uploads(BaseModel):
+    workers: int = 4
+    max_pending: int = 64
+    multipart_mib: int = 64
+    retries: int = 3
+
+
 class ConfigModel(BaseModel):
     s3paths: Optional[S3Paths] = S3Paths()
     paths: Optional[Paths] = Paths()
@@ -50,7 +87,15 @@ class ConfigModel(BaseModel):
     use_case: Optional[int] = None
     limit: Optional[Limits] = Limits()
     dates: Optional[Dates] = None
-    scrape_method: Literal["timeline", "search", "explore", "search_explore"] = "timeline"
+    scrape_method: Literal["timeline", "search", "explore", "search_explore", "list_timeline"] = "timeline"
+    output_format: Literal["jsonl", "parquet", "both"] = "jsonl"
+    streaming: bool = False  # search and timeline queries write their tweets page by page
+    watermarks: Optional[Watermarks] = Watermarks()
+    query_packing: Optional[QueryPacking] = QueryPacking()
+    user_resolution: Optional[UserResolution] = UserResolution()
+    parse_offload: Optional[ParseOffload] = ParseOffload()
+    archive: Optional[Archive] = Archive()
+    uploads: Optional[Uploads] = Uploads()
     _log_level: str = "info"
 
     @model_validator(mode='after')
@@ -1,9 +1,16 @@
 # local
 from app.scraper.twscrape.api import API, Flag
 from app.scraper.twscrape.account import Account
-from app.scraper.twscrape.models import Tweet
-from app.scraper.twscrape.utils import gather
-from app.scraper.my_utils.upload_to_s3.upload_to_s3 import upload_to_s3
+from app.scraper.twscrape.columnar import TweetParquetWriter
+from app.scraper.twscrape.filters import in_window, own_tweets, utc_day
+from app.scraper.twscrape.models import Tweet, TweetView, interned_users, materialize, parse_tweet_views, \
+    parse_tweets, unknown_cards
+from app.scraper.twscrape.parse_errors import parse_errors
+from app.scraper.twscrape.parse_executor import ParseExecutor
+from app.scraper.twscrape.serializer import scrape_date, tweet_to_json
+from app.scraper.twscrape.utils import gather, datetime_to_snowflake
+from app.scraper.twscrape.watermarks import WatermarkStore, Watermark
+from app.scraper.my_utils.upload_to_s3.uploader import S3Uploader
 from app.scraper.my_utils.folder_manipulation.folder_manipulation import save_to_jsonl
 from app.common.logger import get_logger, setup_logging
 from app.scraper.my_utils.meo_api.update_crawler_history import update_crawler_history
@@ -13,12 +20,16 @@ from app.scraper.my_utils.dates import bin_and_tuple_date_range
 # pipped
 from asyncio import Queue
 import asyncio
-from typing import Callable, Any, Iterable, Awaitable, Optional
+import functools
+from contextlib import aclosing
+from httpx import Response
+from typing import AsyncGenerator, Callable, Any, Iterable, Awaitable, Optional
 import time
 import os
 from dotenv import load_dotenv
 import requests
 import datetime
+import json
 from thefuzz import fuzz
 import random
 
@@ -26,12 +37,36 @@ AsyncCallable = Callable[[Any, Any], Awaitable[Any]]
 logger = get_logger()
 
 
-def change_to_new_format(data: list[dict], seed_info: dict, force_collection: bool = False) -> list[dict]:
-    phh_id = seed_info["ID"]
-    seed_id = seed_info["SeedID"]
-    collection = seed_info["Collection"]
+def new_format_header(username: str, date_scrape: str, seed_info: dict, force_collection: bool = False) -> dict:
     handle = seed_info["Handle"]
 
+    crawled_date: str = date_scrape.replace("Z", "")
+    crawled_date: str = crawled_date.replace(" ", "T")
+    crawled_date = crawled_date + "Z"
+    is_not_a_retweet_nor_a_quote = (handle.lower() == username.lower())
+    if is_not_a_retweet_nor_a_quote:
+        return {
+            "phh_id": str(seed_info["ID"]),
+            "seed_id": str(seed_info["SeedID"]),
+            "crawled_date": crawled_date,  # strftime("%Y-%m-%dT%H:%M:%SZ")
+            "collection": seed_info["Collection"],
+        }
+    ratio = fuzz.ratio(username.lower(), handle.lower())
+    if 70 < ratio < 80:
+        logger.warning(
+            f"SeedID set to 0 for tweet {username.lower()} and seed {handle.lower()} with ratio {ratio}")
+    elif ratio > 80:
+        logger.error(
+            f"SeedID set to 0 for tweet {username.lower()} and seed {handle.lower()} with ratio {ratio}")
+    return {
+        "phh_id": "0",
+        "seed_id": "0",
+        "crawled_date": crawled_date,  # strftime("%Y-%m-%dT%H:%M:%SZ")
+        "collection": "n/a" if not force_collection else seed_info["Collection"],
+    }
+
+
+def change_to_new_format(data: list[dict], seed_info: dict, force_collection: bool = False) -> list[dict]:
     tweets_new_format: list[dict] = []
 
     for raw_tweet in data:
@@ -40,49 +75,189 @@ def change_to_new_format(data: list[dict], seed_info: dict, force_collection: bo
         else:
             tweet = raw_tweet
 
-        crawled_date: str = tweet["date_scrape"].replace("Z", "")
-        crawled_date: str = crawled_date.replace(" ", "T")
-        crawled_date = crawled_date + "Z"
-        is_not_a_retweet_nor_a_quote = (handle.lower() == tweet["user"]["username"].lower())
-        if is_not_a_retweet_nor_a_quote:
-            new_format = {
-                "phh_id": str(phh_id),
-                "seed_id": str(seed_id),
-                "crawled_date": crawled_date,  # strftime("%Y-%m-%dT%H:%M:%SZ")
-                "collection": collection,
-                "data": tweet
-            }
-        else:
-            ratio = fuzz.ratio(tweet['user']['username'].lower(), handle.lower())
-            if 70 < ratio < 80:
-                logger.warning(
-                    f"SeedID set to 0 for tweet {tweet['user']['username'].lower()} and seed {handle.lower()} with ratio {ratio}")
-            elif ratio > 80:
-                logger.error(
-                    f"SeedID set to 0 for tweet {tweet['user']['username'].lower()} and seed {handle.lower()} with ratio {ratio}")
-            new_format = {
-                "phh_id": "0",
-                "seed_id": "0",
-                "crawled_date": crawled_date,  # strftime("%Y-%m-%dT%H:%M:%SZ")
-                "collection": "n/a" if not force_collection else collection,
-                "data": tweet
-            }
+        new_format = new_format_header(username=tweet["user"]["username"],
+                                       date_scrape=tweet["date_scrape"],
+                                       seed_info=seed_info,
+                                       force_collection=force_collection)
+        new_format["data"] = tweet
         tweets_new_format.append(new_format)
     return tweets_new_format
 
 
-def get_user_tweets_only(tweets: list[Tweet]) -> list[Tweet]:
-    # remove original retweet/quote tweets by the same user
-    rt_tweets = [t.retweetedTweet.id for t in tweets if t.retweetedTweet]
-    qt_tweets = [t.quotedTweet.id for t in tweets if t.quotedTweet]
-
-    tweets = [t for t in tweets if (t.id not in rt_tweets) and (t.id not in qt_tweets)]
-
-    """# remove the pinned tweet
-    if len(tweets) > 1:
-        pinned_tweets = random.sample(tweets, 1).pop().user.pinnedIds
-        tweets = [t for t in tweets if t.id not in pinned_tweets]"""
-    return tweets
+def to_json_lines(tweets: list[Tweet],
+                  seed_info: dict | None,
+                  force_collection: bool = False,
+                  date_scrape: str | None = None) -> list[str]:
+    """
+    The lines `save_to_jsonl` writes for `change_to_new_format([t.dict() for t in tweets], ...)`, or for the
+    tweets themselves when `seed_info` is None, serialized directly.
+    :param date_scrape: `scrape_date()` by default
+    """
+    date_scrape = date_scrape or scrape_date()
+    if seed_info is None:
+        return [tweet_to_json(t, date_scrape) for t in tweets]
+
+    lines: list[str] = []
+    for t in tweets:
+        header = json.dumps(new_format_header(username=t.user.username,
+                                              date_scrape=date_scrape,
+                                              seed_info=seed_info,
+                                              force_collection=force_collection))
+        # "data" is the last key of the new format
+        lines.append(header[:-1] + ', "data": ' + tweet_to_json(t, date_scrape) + "}")
+    return lines
+
+
+def demultiplex_tweets(tweets: list[Tweet],
+                       owners: dict[Any, str],
+                       start: datetime.datetime,
+                       end: datetime.datetime,
+                       key: Callable[[Tweet], Any] = lambda t: t.user.username.lower()) -> dict[str, list[Tweet]]:
+    """
+    Splits tweets collected for several seeds: each seed gets the tweets it authored along with the tweets it
+    retweeted or quoted, i.e. what a query of its own would have returned. `owners` maps `key(tweet)` of a seed's
+    tweets (lowercase username by default) to the seed's handle. A seed only owns its tweets of [start, end): an
+    older tweet of a seed retweeted or quoted by another one goes to the latter only, as its own query would never
+    return it.
+    """
+    def owner(t: Tweet) -> str | None:
+        return owners.get(key(t)) if start <= t.date < end else None
+
+    referenced: dict[int, set[str]] = {}
+    for t in tweets:
+        if (h := owner(t)) is not None:
+            for ref in (t.retweetedTweet, t.quotedTweet):
+                if ref is not None:
+                    referenced.setdefault(ref.id, set()).add(h)
+
+    routed: dict[str, list[Tweet]] = {h: [] for h in owners.values()}
+    seen: dict[str, set[int]] = {h: set() for h in owners.values()}
+    unrouted: int = 0
+    for t in tweets:
+        seeds: set[str] = set(referenced.get(t.id, ()))
+        if (h := owner(t)) is not None:
+            seeds.add(h)
+        if not seeds:
+            unrouted += 1
+        for h in seeds:
+            if t.id not in seen[h]:
+                seen[h].add(t.id)
+                routed[h].append(t)
+    if unrouted > 0:
+        logger.warning(f"{unrouted} tweets collected for {list(owners.values())} didn't belong to any seed")
+    return routed
+
+
+def fallback_searches(handle: str, start_date: str, oldest: datetime.datetime) -> list[str]:
+    """
+    The searches covering what a seed's timeline didn't reach, from `start_date` to the day after the oldest tweet
+    of the seed it returned. None when the timeline went back far enough.
+    """
+    end: str = (oldest + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    if not datetime.datetime.strptime(end, "%Y-%m-%d") > datetime.datetime.strptime(start_date, "%Y-%m-%d"):
+        return []
+    dates = bin_and_tuple_date_range(datetime.datetime.strptime(start_date, "%Y-%m-%d"),
+                                     datetime.datetime.strptime(end, "%Y-%m-%d"))
+    return [f'from:{handle} include:nativeretweets include:retweets until:{sub_end} since:{sub_start}'
+            for sub_start, sub_end in dates]
+
+
+def output_path(path: str, output_format: str = "jsonl") -> str:
+    """Where a query's tweets end up, the `.parquet` next to the `.jsonl` path when the output is Parquet only."""
+    return os.path.splitext(path)[0] + ".parquet" if output_format == "parquet" else path
+
+
+def _headers(tweets: list[Tweet],
+             seed_info: dict | None,
+             force_collection: bool,
+             date_scrape: str) -> list[dict] | None:
+    # the new format's header of each tweet, as the Parquet header columns
+    if seed_info is None:
+        return None
+    return [
+        new_format_header(username=t.user.username,
+                          date_scrape=date_scrape,
+                          seed_info=seed_info,
+                          force_collection=force_collection) for t in tweets
+    ]
+
+
+def to_parquet(path: str,
+               tweets: list[Tweet],
+               seed_info: dict | None,
+               force_collection: bool = False,
+               row_group_size: int = 10_000,
+               date_scrape: str | None = None) -> int:
+    """
+    What `to_json_lines` writes, as typed columns: the new format's header columns (when `seed_info` is set)
+    followed by the tweet's. Returns the number of rows.
+    :param date_scrape: `scrape_date()` by default
+    """
+    date_scrape = date_scrape or scrape_date()
+    with TweetParquetWriter(f"{path}.part", header=seed_info is not None) as writer:
+        for i in range(0, len(tweets), row_group_size):
+            chunk = tweets[i:i + row_group_size]
+            writer.write(chunk, headers=_headers(chunk, seed_info, force_collection, date_scrape),
+                         date_scrape=date_scrape)
+    os.replace(f"{path}.part", path)
+    return writer.rows
+
+
+class PageWriter:
+    """
+    Writes a query's tweets page by page as they arrive, in the format(s) `save` would write them all at once, so
+    that only a page is held. Pages go to temporary files next to the outputs which `commit` renames over them: the
+    outputs are either absent (or the previous ones) or complete, even if the query fails midway.
+    """
+
+    def __init__(self, path: str, seed_info: dict | None, force_collection: bool = False,
+                 output_format: str = "jsonl"):
+        """
+        :param seed_info: None to write the tweets themselves rather than the new format
+        """
+        self.seed_info = seed_info
+        self.force_collection = force_collection
+        self.paths: list[str] = [output_path(path, x) for x in ("jsonl", "parquet") if output_format in (x, "both")]
+        self.count = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._jsonl = open(f"{path}.part", "w") if output_format in ("jsonl", "both") else None
+        self._parquet: Optional[TweetParquetWriter] = TweetParquetWriter(
+            f"{output_path(path, 'parquet')}.part", header=seed_info is not None
+        ) if output_format in ("parquet", "both") else None
+
+    def _write(self, tweets: list[Tweet]):
+        date_scrape: str = scrape_date()
+        if self._jsonl is not None:
+            self._jsonl.writelines(x + "\n" for x in to_json_lines(tweets, self.seed_info, self.force_collection,
+                                                                   date_scrape))
+        if self._parquet is not None:
+            self._parquet.write(tweets, headers=_headers(tweets, self.seed_info, self.force_collection, date_scrape),
+                                date_scrape=date_scrape)
+        self.count += len(tweets)
+
+    async def write(self, tweets: list[Tweet]):
+        if len(tweets) > 0:
+            await asyncio.to_thread(self._write, tweets)
+
+    def _close(self):
+        if self._jsonl is not None:
+            self._jsonl.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    def commit(self) -> list[str]:
+        """Moves the written outputs in place, returns their paths."""
+        self._close()
+        for x in self.paths:
+            os.replace(f"{x}.part", x)
+        return self.paths
+
+    def abort(self):
+        self._close()
+        for x in self.paths:
+            if os.path.exists(f"{x}.part"):
+                os.remove(f"{x}.part")
 
 
 class TwitterScraper:
@@ -93,15 +268,28 @@ class TwitterScraper:
                  use_case: int | None,
                  path_db: str,
                  headless: bool = False,
-                 path_browser: str | None = None):
+                 path_browser: str | None = None,
+                 path_checkpoints: str | None = None,
+                 path_watermarks: str | None = None,
+                 path_archive: str | None = None,
+                 watermark_overlap: datetime.timedelta = datetime.timedelta(hours=12),
+                 parse_executor: ParseExecutor | None = None,
+                 uploader: S3Uploader | None = None):
 
         self.headless = headless
         self.use_case = use_case
 
         # paths
         self.path_db = path_db
+        self.path_checkpoints = path_checkpoints
+        self.path_archive = path_archive
+        self.watermarks: Optional[WatermarkStore] = WatermarkStore(path_watermarks) if path_watermarks else None
+        self.watermark_overlap = watermark_overlap
         self.active_accounts: Optional[list[Account]] = None
         self.path_browser = path_browser
+        self.parse_executor = parse_executor
+        # outputs are uploaded in the background, run_scraper waits for them at the end
+        self.uploader: S3Uploader = uploader or S3Uploader()
 
         try:
             # there's already an event loop
@@ -131,38 +319,112 @@ class TwitterScraper:
                    update_phh_history: bool = True,
                    force_collection: bool = False,
                    bool_upload_to_s3: bool = True,
-                   bool_change_to_new_format: bool = True
+                   bool_change_to_new_format: bool = True,
+                   output_format: str = "jsonl"
                    ):
         logger.info(f"Saving {len([d for d in data])} "
                     f"from seed {seed_info['Handle'] if seed_info else None} "
                     f"to {path} "
                     f"with new_format set to {bool_change_to_new_format}, "
+                    f"output {output_format}, "
                     f"s3 {bool_upload_to_s3} "
                     f"and update_phh_history {update_phh_history}.")
-        data = [t.dict() if not isinstance(t, dict) else t for t in data]
+        are_tweets: bool = len(data) > 0 and all(isinstance(t, Tweet) for t in data)
+        if output_format != "jsonl" and len(data) > 0 and not are_tweets:
+            logger.warning(f"Only tweets can be saved as {output_format}, saving {path} as JSON lines")
+            output_format = "jsonl"
+
+        paths: list[str] = []
+        # both formats carry the same date_scrape
+        date_scrape: str = scrape_date()
+        if output_format in ("parquet", "both"):
+            path_parquet: str = output_path(path, "parquet")
+            await asyncio.to_thread(to_parquet,
+                                    path=path_parquet,
+                                    tweets=list(data),
+                                    seed_info=seed_info if bool_change_to_new_format else None,
+                                    force_collection=force_collection,
+                                    date_scrape=date_scrape)
+            paths.append(path_parquet)
+
+        if output_format in ("jsonl", "both"):
+            if are_tweets:
+                # straight to the JSON lines, without the dicts
+                data = to_json_lines(tweets=data,
+                                     seed_info=seed_info if bool_change_to_new_format else None,
+                                     force_collection=force_collection,
+                                     date_scrape=date_scrape)
+            else:
+                data = [t.dict() if not isinstance(t, dict) else t for t in data]
+
+                if bool_change_to_new_format:
+                    data = change_to_new_format(data=data, seed_info=seed_info, force_collection=force_collection)
 
-        if bool_change_to_new_format:
-            data = change_to_new_format(data=data, seed_info=seed_info, force_collection=force_collection)
+            # save locally
+            save_to_jsonl(path=path, data=data)
+            paths.append(path)
 
-        # save locally
-        save_to_jsonl(path=path, data=data)
+        await self.publish(paths=paths,
+                           seed_info=seed_info,
+                           start_date=start_date,
+                           end_date=end_date,
+                           update_phh_history=update_phh_history,
+                           bool_upload_to_s3=bool_upload_to_s3)
+        return data
 
+    async def publish(self,
+                      paths: list[str],
+                      seed_info: dict,
+                      start_date: str,
+                      end_date: str,
+                      update_phh_history: bool = True,
+                      bool_upload_to_s3: bool = True):
+        """
+        What follows the writing of a query's outputs: the upload to S3 (queued, see `S3Uploader`) and the seed's
+        history, updated once the uploads succeeded.
+        """
+        uploads: list[asyncio.Future | None] = []
         if bool_upload_to_s3:
-            # upload to s3
-            upload_to_s3(
-                bucket_name=os.getenv("S3BUCKET"),
-                folder=os.getenv("S3FOLDER"),
-                filepath=path
-            )
+            for path in paths:
+                uploads.append(await self.uploader.upload(path))
         if update_phh_history:
-            # update seed history
+            # update seed history, the seed isn't scraped again for these dates
             phh_id: str = str(seed_info["ID"])
-            update_crawler_history(
-                phh_id=phh_id,
-                start_date=start_date,
-                end_date=end_date
-            )
-        return data
+            self.uploader.when_uploaded(uploads, functools.partial(update_crawler_history,
+                                                                   phh_id=phh_id,
+                                                                   start_date=start_date,
+                                                                   end_date=end_date))
+
+    async def stream(self,
+                     new_writer: Callable[[], PageWriter],
+                     write: Callable[[PageWriter], Awaitable[None]],
+                     sem: asyncio.Semaphore = None) -> PageWriter:
+        """
+        Runs a streamed query: `write` writes its pages with the writer `new_writer` creates, whose outputs are then
+        committed, or removed if the query fails. The writer is only created once the query holds its slot of `sem`:
+        the queries of a run are all started at once, only the running ones have files open. Returns the committed
+        writer.
+        """
+        async def run() -> PageWriter:
+            writer: PageWriter = new_writer()
+            try:
+                await write(writer)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.commit()
+            return writer
+
+        if sem:
+            async with sem:
+                return await run()
+        return await run()
+
+    async def write_pages(self, writer: PageWriter, pages: AsyncGenerator[Response, None], limit: int = -1):
+        """Writes the tweets of each page of a `*_raw` generator as they arrive."""
+        async with aclosing(pages) as gen:
+            async for rep in gen:
+                await writer.write(await self._tweets(rep, limit))
 
     async def search_twscrape_and_save(self,
                                        query: str,
@@ -175,7 +437,28 @@ class TwitterScraper:
                                        force_collection: bool = False,
                                        bool_upload_to_s3: bool = True,
                                        bool_change_to_new_format: bool = True,
-                                       sem: asyncio.Semaphore = None) -> list[dict] | list:
+                                       output_format: str = "jsonl",
+                                       streaming: bool = False,
+                                       sem: asyncio.Semaphore = None) -> list[dict] | list | int:
+        if streaming:
+            logger.info(f'searching query: {query} (streamed to {path})')
+            writer: PageWriter = await self.stream(
+                lambda: PageWriter(path=path,
+                                   seed_info=seed_info if bool_change_to_new_format else None,
+                                   force_collection=force_collection,
+                                   output_format=output_format),
+                lambda w: self.write_pages(w, self.api.search_raw(query, limit=limit), limit),
+                sem
+            )
+            logger.info(f"Saved {writer.count} from seed {seed_info['Handle'] if seed_info else None} "
+                        f"to {writer.paths}")
+            await self.publish(paths=writer.paths,
+                               seed_info=seed_info,
+                               start_date=start_date,
+                               end_date=end_date,
+                               update_phh_history=update_phh_history,
+                               bool_upload_to_s3=bool_upload_to_s3)
+            return writer.count
 
         if sem:
             async with sem:
@@ -190,9 +473,118 @@ class TwitterScraper:
                                update_phh_history=update_phh_history,
                                force_collection=force_collection,
                                bool_upload_to_s3=bool_upload_to_s3,
-                               bool_change_to_new_format=bool_change_to_new_format)
+                               bool_change_to_new_format=bool_change_to_new_format,
+                               output_format=output_format)
         return data
 
+    async def packed_search_twscrape_and_save(self,
+                                              query: str,
+                                              seeds: list[dict],
+                                              start_date: str,
+                                              end_date: str,
+                                              limit: int = -1,
+                                              update_phh_history: bool = True,
+                                              force_collection: bool = False,
+                                              bool_upload_to_s3: bool = True,
+                                              bool_change_to_new_format: bool = True,
+                                              output_format: str = "jsonl",
+                                              sem: asyncio.Semaphore = None) -> list[dict] | list:
+        if sem:
+            async with sem:
+                data = await self.search_twscrape(query=query, limit=limit)
+        else:
+            data = await self.search_twscrape(query=query, limit=limit)
+
+        # every seed gets its own file & history update, even the ones that didn't tweet
+        handles: list[str] = [s["seed_info"]["Handle"] for s in seeds]
+        routed: dict[str, list[Tweet]] = demultiplex_tweets(data, {h.lower(): h for h in handles},
+                                                            utc_day(start_date), utc_day(end_date)) \
+            if len(seeds) > 1 else {handles[0]: data}
+        saved: list[dict] = []
+        for s in seeds:
+            saved.extend(
+                await self.save(data=routed[s["seed_info"]["Handle"]],
+                                path=s["path"],
+                                seed_info=s["seed_info"],
+                                start_date=start_date,
+                                end_date=end_date,
+                                update_phh_history=update_phh_history,
+                                force_collection=force_collection,
+                                bool_upload_to_s3=bool_upload_to_s3,
+                                bool_change_to_new_format=bool_change_to_new_format,
+                                output_format=output_format)
+            )
+        return saved
+
+    async def list_timeline_twscrape_and_save(self,
+                                              query: int,
+                                              seeds: list[dict],
+                                              start_date: str,
+                                              end_date: str,
+                                              update_phh_history: bool = True,
+                                              force_collection: bool = False,
+                                              bool_upload_to_s3: bool = True,
+                                              bool_change_to_new_format: bool = True,
+                                              output_format: str = "jsonl",
+                                              sem: asyncio.Semaphore = None) -> list[dict] | list:
+        start: datetime.datetime = utc_day(start_date)
+        end: datetime.datetime = utc_day(end_date)
+
+        # the list mixes its members' tweets newest first: stop at the start of the window, or below it at what the
+        # previous run of this list already collected
+        bound: Optional[int] = await self.watermark_bound(f"list:{query}", start, end)
+        if bound is None:
+            bound = datetime_to_snowflake(start)
+
+        if sem:
+            async with sem:
+                data = await self.list_timeline_twscrape(query, watermark=bound)
+        else:
+            data = await self.list_timeline_twscrape(query, watermark=bound)
+
+        # the same filter as a seed's own timeline: the members' tweets outside the window go along with what they
+        # retweet or quote, the originals retweeted or quoted in the window stay
+        data: list[Tweet] = list(materialize(in_window(data, start, end)))
+
+        owners: dict[int, str] = {int(s["user_id"]): s["seed_info"]["Handle"] for s in seeds}
+        routed: dict[str, list[Tweet]] = demultiplex_tweets(data, owners, start, end, key=lambda t: t.user.id)
+        saved: list[dict] = []
+        for s in seeds:
+            saved.extend(
+                await self.save(data=routed[s["seed_info"]["Handle"]],
+                                path=s["path"],
+                                seed_info=s["seed_info"],
+                                start_date=start_date,
+                                end_date=end_date,
+                                update_phh_history=update_phh_history,
+                                force_collection=force_collection,
+                                bool_upload_to_s3=bool_upload_to_s3,
+                                bool_change_to_new_format=bool_change_to_new_format,
+                                output_format=output_format)
+            )
+
+        # only move the watermark once the tweets are saved. The seeds' own watermarks stay where their timelines
+        # left them: a list timeline doesn't show the members' replies to non-members
+        member_tweets: list[Tweet] = [t for t in data if t.user.id in owners]
+        if self.watermarks and len(member_tweets) > 0:
+            newest: Tweet = max(member_tweets, key=lambda x: x.id)
+            await self.watermarks.update(seed=f"list:{query}", newest_id=newest.id, newest_date=newest.date)
+        return saved
+
+    async def watermark_bound(self,
+                              seed: str,
+                              start: datetime.datetime,
+                              end: datetime.datetime) -> Optional[int]:
+        """
+        Lowest tweet ID worth paging to for the window [`start`, `end`) of `seed` given its watermark, None when
+        there's none to apply. A window is always written whole, even when it's scraped again: the watermark never
+        stops paging above the window start, and is ignored when the window ends before it (a re-run or a backfill).
+        """
+        watermark: Optional[Watermark] = await self.watermarks.get(seed) if self.watermarks else None
+        if watermark is None or end <= watermark.newest_date:
+            return None
+        return min(watermark.bound(self.watermark_overlap), datetime_to_snowflake(start))
+
     async def user_tweets_and_replies_twscrape_and_save(self,
                                                         query: int,
                                                         path: str,
@@ -204,61 +596,72 @@ class TwitterScraper:
                                                         force_collection: bool = False,
                                                         bool_upload_to_s3: bool = True,
                                                         bool_change_to_new_format: bool = True,
-                                                        sem: asyncio.Semaphore = None) -> list[dict] | list:
+                                                        output_format: str = "jsonl",
+                                                        streaming: bool = False,
+                                                        sem: asyncio.Semaphore = None) -> list[dict] | list | int:
+        # stop paging once we reach what a previous run already collected for this seed
+        bound: Optional[int] = await self.watermark_bound(str(query), utc_day(start_date), utc_day(end_date))
+
+        if streaming:
+            logger.info(f'user tweets and replies for uid: {query} (streamed to {path})')
+            newest: Optional[Tweet] = None
+
+            async def write(writer: PageWriter):
+                nonlocal newest
+                newest = await self.write_user_timeline(writer, query, seed_info, start_date, end_date,
+                                                        stopping_condition, bound)
+
+            writer: PageWriter = await self.stream(
+                lambda: PageWriter(path=path,
+                                   seed_info=seed_info if bool_change_to_new_format else None,
+                                   force_collection=force_collection,
+                                   output_format=output_format),
+                write,
+                sem
+            )
+            logger.info(f"Saved {writer.count} from seed {seed_info['Handle']} to {writer.paths}")
+            await self.publish(paths=writer.paths,
+                               seed_info=seed_info,
+                               start_date=start_date,
+                               end_date=end_date,
+                               update_phh_history=update_phh_history,
+                               bool_upload_to_s3=bool_upload_to_s3)
+            # only move the watermark once the tweets are saved
+            if self.watermarks and newest is not None:
+                await self.watermarks.update(seed=str(query), newest_id=newest.id, newest_date=newest.date)
+            return writer.count
+
         if sem:
             async with sem:
-                data, flag = await self.user_tweets_and_replies_twscrape(query, stopping_condition)
+                data, flag = await self.user_tweets_and_replies_twscrape(query, stopping_condition, watermark=bound)
         else:
-            data, flag = await self.user_tweets_and_replies_twscrape(query, stopping_condition)
+            data, flag = await self.user_tweets_and_replies_twscrape(query, stopping_condition, watermark=bound)
         # check if flag went off
         if stopping_condition and len(
                 data) > 0:  # triggers if you scraped all the tweets in a person's timeline (1. there are tweets) & you haven't gone far back enough (2. those tweets didn't trigger stopping condition)
             if not flag.get_flag():  # then you might have to do some work
                 # figure out the earliest tweet that you have
-                user_tweets: list[Tweet] = get_user_tweets_only(data)
+                user_tweets: list[TweetView] = own_tweets(data)
                 # launch a search_scrape with query the start date till the latest date you have + 1
                 min_date: datetime.datetime = min(user_tweets, key=lambda x: x.date).date
-                min_date = min_date + datetime.timedelta(days=1)
-                end = min_date.strftime("%Y-%m-%d")
-
-                # check whether the earliest date that you have is after the start date
-                if datetime.datetime.strptime(end, "%Y-%m-%d") > datetime.datetime.strptime(start_date, "%Y-%m-%d"):
-                    # TODO: break it into a loop - check if this works
-                    tasks = []
-                    dates = bin_and_tuple_date_range(datetime.datetime.strptime(start_date, "%Y-%m-%d"),
-                                                     datetime.datetime.strptime(end, "%Y-%m-%d"))
-
-                    async def wrapper_(query: str, limit: int):  # need to create a wrapper so can use the sem
-                        async with sem:
-                            d = await self.search_twscrape(query=query, limit=limit)
-                        return d
-
-                    for sub_start, sub_end in dates:
-                        query = f'from:{seed_info["Handle"]} include:nativeretweets include:retweets until:{sub_end} since:{sub_start}'
-                        tasks.append(
-                            wrapper_(query=query, limit=-1)
-                        )
-                    search_data: tuple[list] = await asyncio.gather(*tasks)
-                    for d in search_data:
-                        data.extend(d)
-
-        # filter out the tweets that are too new or too old by
-        user_tweets: list[Tweet] = get_user_tweets_only(data)
-        user_excluded_tweets: list[Tweet] = [
-            d for d in user_tweets
-            if not datetime.datetime.strptime(start_date, "%Y-%m-%d").replace(
-                tzinfo=datetime.timezone.utc) <= d.date < datetime.datetime.strptime(end_date, "%Y-%m-%d").replace(
-                tzinfo=datetime.timezone.utc)
-        ]  # 1. get the user tweets that are too new or too old
-        excluded_tweets = []
-        for t in user_excluded_tweets:
-            if t.retweetedTweet is not None:  # 2.1 remove any corresponding retweetedTweet
-                excluded_tweets.append(int(t.retweetedTweet.id))
-            if t.quotedTweet is not None:  # 2.2 remove any corresponding quotedTweet
-                excluded_tweets.append(int(t.quotedTweet.id))
-            excluded_tweets.append(int(t.id))
-
-        data = [d for d in data if not int(d.id) in excluded_tweets]
+
+                async def wrapper_(query: str, limit: int):  # need to create a wrapper so can use the sem
+                    async with sem:
+                        d = await self.search_twscrape_views(query=query, limit=limit)
+                    return d
+
+                tasks = [wrapper_(query=q, limit=-1) for q in fallback_searches(seed_info["Handle"], start_date,
+                                                                                min_date)]
+                search_data: tuple[list] = await asyncio.gather(*tasks)
+                for d in search_data:
+                    data.extend(d)
+
+        # filter out the user's tweets that are too new or too old along with what they retweet or quote
+        data = in_window(data, utc_day(start_date), utc_day(end_date))
+
+        # only the tweets that are kept are fully parsed
+        data: list[Tweet] = list(materialize(data))
+        seed_tweets: list[Tweet] = [t for t in data if t.user.id == int(query)]
         data = await self.save(data=data,
                                path=path,
                                seed_info=seed_info,
@@ -267,9 +670,61 @@ class TwitterScraper:
                                update_phh_history=update_phh_history,
                                force_collection=force_collection,
                                bool_upload_to_s3=bool_upload_to_s3,
-                               bool_change_to_new_format=bool_change_to_new_format)
+                               bool_change_to_new_format=bool_change_to_new_format,
+                               output_format=output_format)
+
+        # only move the watermark once the tweets are saved
+        if self.watermarks and len(seed_tweets) > 0:
+            newest: Tweet = max(seed_tweets, key=lambda x: x.id)
+            await self.watermarks.update(seed=str(query), newest_id=newest.id, newest_date=newest.date)
         return data
 
+    async def write_user_timeline(self,
+                                  writer: PageWriter,
+                                  uid: int,
+                                  seed_info: dict,
+                                  start_date: str,
+                                  end_date: str,
+                                  stopping_condition: Callable = None,
+                                  watermark: Optional[int] = None) -> Optional[Tweet]:
+        """
+        Writes a seed's timeline page by page, then the searches covering what it didn't reach, filtered as
+        `user_tweets_and_replies_twscrape_and_save` filters them all at once: the original a tweet retweets or
+        quotes comes in the same page, so each page is filtered on its own. A tweet in several pages is written
+        once. The searches run one after the other, in the slot the query holds. Returns the newest tweet of the
+        seed written, for its watermark.
+        """
+        start, end = utc_day(start_date), utc_day(end_date)
+        written: set[int] = set()
+        newest: Optional[Tweet] = None
+
+        async def write(views: list[TweetView]):
+            nonlocal newest
+            tweets: list[Tweet] = list(materialize(v for v in in_window(views, start, end) if v.id not in written))
+            written.update(t.id for t in tweets)
+            for t in tweets:
+                if t.user.id == int(uid) and (newest is None or t.id > newest.id):
+                    newest = t
+            await writer.write(tweets)
+
+        flag = Flag(False)
+        oldest: Optional[datetime.datetime] = None
+        async with aclosing(self.api.user_tweets_and_replies_raw(uid, stopping_condition=stopping_condition,
+                                                                 flag=flag, watermark=watermark)) as gen:
+            async for rep in gen:
+                views: list[TweetView] = await self._tweet_views(rep)
+                if own := own_tweets(views):
+                    oldest = min([x.date for x in own] + ([oldest] if oldest else []))
+                await write(views)
+
+        # the timeline ended before reaching the start date
+        if stopping_condition and oldest is not None and not flag.get_flag():
+            for q in fallback_searches(seed_info["Handle"], start_date, oldest):
+                async with aclosing(self.api.search_raw(q)) as gen:
+                    async for rep in gen:
+                        await write(await self._tweet_views(rep))
+        return newest
+
     async def explore_twscrape_and_save(self,
                                         query: str,
                                         path: str,
@@ -297,7 +752,25 @@ class TwitterScraper:
                                                product: str = "Top",
                                                bool_upload_to_s3: bool = True,
                                                limit: int = -1,
-                                               sem: asyncio.Semaphore = None) -> list[dict] | list:
+                                               streaming: bool = False,
+                                               sem: asyncio.Semaphore = None) -> list[dict] | list | int:
+        if streaming:
+            logger.info(f"searching twitter trending tweets for timeline {query} (streamed to {path})")
+            kv: dict = {"querySource": "trend_click", "product": product}
+            writer: PageWriter = await self.stream(
+                lambda: PageWriter(path=path, seed_info=None),
+                lambda w: self.write_pages(w, self.api.search_raw(query, limit=limit, kv=kv), limit),
+                sem
+            )
+            logger.info(f"Saved {writer.count} to {path}")
+            await self.publish(paths=writer.paths,
+                               seed_info={},
+                               start_date="",
+                               end_date="",
+                               update_phh_history=False,  # no seed for which to update phh history
+                               bool_upload_to_s3=bool_upload_to_s3)
+            return writer.count
+
         if sem:
             async with sem:
                 data = await self.search_explore_twscrape(query=query, limit=limit, product=product)
@@ -314,20 +787,43 @@ class TwitterScraper:
                                bool_upload_to_s3=bool_upload_to_s3)
         return data
 
+    async def _tweets(self, rep: Response, limit: int = -1) -> list[Tweet]:
+        if self.parse_executor is not None:
+            return await self.parse_executor.tweets(rep, limit)
+        return list(parse_tweets(rep.json(), limit))
+
+    async def _tweet_views(self, rep: Response) -> list[TweetView]:
+        if self.parse_executor is not None:
+            return await self.parse_executor.tweet_views(rep)
+        return list(parse_tweet_views(rep.json()))
+
     async def user_by_login_twscrape(self, username: str):
         return await self.api.user_by_login(username)
 
     async def user_tweets_and_replies_twscrape(self,
                                                uid: int,
-                                               stopping_condition: Callable = None) -> tuple[list, Flag]:
+                                               stopping_condition: Callable = None,
+                                               watermark: Optional[int] = None) -> tuple[list[TweetView], Flag]:
         logger.info(f'user tweets and replies for uid: {uid}')
         stop_condition_flag = Flag(False)
-        data = await gather(
-            self.api.user_tweets_and_replies(uid, stopping_condition=stopping_condition, flag=stop_condition_flag))
+        data: list[TweetView] = []
+        async with aclosing(self.api.user_tweets_and_replies_raw(uid, stopping_condition=stopping_condition,
+                                                                 flag=stop_condition_flag,
+                                                                 watermark=watermark)) as gen:
+            async for rep in gen:
+                data.extend(await self._tweet_views(rep))
 
         # process tweets if needed
         return data, stop_condition_flag
 
+    async def list_timeline_twscrape(self, list_id: int, watermark: Optional[int] = None) -> list[TweetView]:
+        logger.info(f'list timeline for list: {list_id}')
+        data: list[TweetView] = []
+        async with aclosing(self.api.list_timeline_raw(list_id, watermark=watermark)) as gen:
+            async for rep in gen:
+                data.extend(await self._tweet_views(rep))
+        return data
+
     async def user_tweets_twscrape(self, uid: int):
         logger.info(f'user tweets for uid: {uid}')
         data = await gather(self.api.user_tweets(uid))
@@ -354,6 +850,15 @@ class TwitterScraper:
         data = await gather(self.api.search(query, limit))
         return data
 
+    async def search_twscrape_views(self, query: str, limit: int = -1) -> list[TweetView]:
+        """`search_twscrape`, the tweets left as `TweetView`s to be filtered before they're parsed."""
+        logger.info(f'searching query: {query}')
+        data: list[TweetView] = []
+        async with aclosing(self.api.search_raw(query, limit=limit)) as gen:
+            async for rep in gen:
+                data.extend(await self._tweet_views(rep))
+        return data
+
     async def explore_twscrape(self, query: str) -> list:
         logger.info('getting twitter explore trending')
         timeline_to_id: dict = {
@@ -396,7 +901,11 @@ class TwitterScraper:
 
         api: API | None = API(pool=self.path_db,
                               use_case=self.use_case,
-                              _num_calls_before_humanization=(100, 130))
+                              _num_calls_before_humanization=(100, 130),
+                              cursor_store=self.path_checkpoints,
+                              page_sizes=os.path.join(os.path.dirname(self.path_db), "page_sizes.json"),
+                              parse_executor=self.parse_executor,
+                              archive=self.path_archive)
         self.active_accounts: list[Account] = await api.pool.get_active(use_case=self.use_case)
         for u in self.active_accounts:
             username = u.username
@@ -549,36 +1058,96 @@ class TwitterScraper:
     async def search_queries_scrape(self, queries: list[dict]):
         return await self.run_scraper(queries=queries, func=self.search_twscrape_and_save)
 
+    async def packed_search_queries_scrape(self, queries: list[dict]):
+        return await self.run_scraper(queries=queries, func=self.packed_search_twscrape_and_save)
+
     async def user_tweets_scrape(self, queries: list[dict]):
         return await self.run_scraper(queries=queries, func=self.user_tweets_and_replies_twscrape_and_save)
 
+    async def list_timeline_scrape(self, queries: list[dict]):
+        async def list_or_user_timeline(sem: asyncio.Semaphore, **q):
+            # seeds missing from every list come as plain timeline queries
+            if "seeds" in q:
+                return await self.list_timeline_twscrape_and_save(**q, sem=sem)
+            return await self.user_tweets_and_replies_twscrape_and_save(**q, sem=sem)
+
+        return await self.run_scraper(queries=queries, func=list_or_user_timeline)
+
     async def explore_scrape(self, queries: list[dict]):
-        return await self.run_scraper(queries=queries, func=self.explore_twscrape_and_save)
+        # the trends are the result of the run, they're small
+        trends: list[dict] = []
+        meta_data: dict = await self.run_scraper(queries=queries,
+                                                 func=self.explore_twscrape_and_save,
+                                                 on_result=lambda q, data: trends.extend(data))
+        return {"meta_data": meta_data, "scraping_results": trends}
 
     async def search_explore_scrape(self, queries: list[dict]):
         return await self.run_scraper(queries=queries, func=self.search_explore_twscrape_and_save)
 
     async def run_scraper(self,
                           queries: list[dict],
-                          func: Callable
+                          func: Callable,
+                          on_result: Optional[Callable[[dict, Any], None]] = None
                           ) -> dict:
+        """
+        Runs `func` on every query. A query's result (what it saved) is counted and handed to `on_result` as soon as
+        it completes, then dropped: only counters and a summary of each query are kept for the whole run.
+        """
         logger.info(f"Scraping {len(queries)} queries")
         # scraping meta-data
         meta_data: dict = {
             "start_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
-        scraping_results: None = None
+        parse_errors.reset()
+        unknown_cards.clear()
+        self.uploader.reset()
         if len(queries) > 0:
             # log into all accounts before starting
             await self.login_to_all_accounts()
 
             # run with the search method
             sem: asyncio.Semaphore = asyncio.Semaphore(self.lim_acc)
-            scraping_results: tuple[list] = await asyncio.gather(*[func(**q, sem=sem) for q in queries])
+            total_tweets: int = 0
+            summaries: list[dict] = []
+
+            async def run_query(q: dict):
+                nonlocal total_tweets
+                data = await func(**q, sem=sem)
+                # streamed queries only return their count
+                count: int = data if isinstance(data, int) else len(data)
+                total_tweets += count
+                summaries.append({
+                    "query": q.get("query"),
+                    "paths": [s["path"] for s in q["seeds"]] if "seeds" in q else [q["path"]],
+                    "tweets": count,
+                })
+                if len(summaries) % 100 == 0:
+                    logger.info(f"{len(summaries)}/{len(queries)} queries done, {total_tweets} tweets so far")
+                if on_result is not None:
+                    on_result(q, data)
+
+            # tweets of the run share the users they have in common
+            try:
+                with interned_users() as users:
+                    await asyncio.gather(*[run_query(q) for q in queries])
+            finally:
+                # the outputs that are written get uploaded, even when the run fails
+                meta_data["uploads"] = await self.uploader.flush()
+                if self.api.cursor_store is not None:
+                    await self.api.cursor_store.close()
+                if self.api.archive is not None:
+                    await self.api.archive.flush()
+            logger.info(f"Users parsed: {users.misses}, reused: {users.hits}")
 
             # update meta-data
-            meta_data["total_tweets_collected"] = sum([len(i) for i in scraping_results])
+            meta_data["total_tweets_collected"] = total_tweets
             meta_data["total_num_queries"] = len(queries)
+            meta_data["queries"] = summaries
+
+        # failures are grouped by signature, one sample of each is written for the whole run
+        meta_data["parse_errors"] = parse_errors.summary()
+        meta_data["parse_errors_file"] = await parse_errors.flush()
+        meta_data["unknown_cards"] = dict(unknown_cards.most_common())
 
         # update meta_data
         meta_data["end_time"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -591,7 +1160,5 @@ class TwitterScraper:
             )
 
         meta_data["post_scraping_accounts"] = {acc.username: acc.active for acc in accounts_after}
-        if func == self.explore_twscrape_and_save:
-            return {"meta_data": meta_data, "scraping_results": scraping_results[0]}
         # output scraping metadata
         return meta_data
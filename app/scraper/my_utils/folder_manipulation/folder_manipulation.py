@@ -30,10 +30,12 @@ def open_jsonl(file: str) -> List[dict]:
 def save_to_jsonl(path: str, data: Iterable[Any]) -> None:
     file = Path(path)
     file.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, 'w') as f:
+    # written next to it then renamed: the file is either absent or complete
+    with open(f"{path}.part", 'w') as f:
         for item in data:
             if isinstance(item, dict):
                 json.dump(item, f)
             elif isinstance(item, str):
                 f.write(item)
-            f.write('\n')
\ No newline at end of file
+            f.write('\n')
+    os.replace(f"{path}.part", path)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, model_validator
-from typing import Optional, Callable
+from typing import Optional, Callable, Literal
 
 
 class TimelineQuery(BaseModel):
@@ -13,6 +13,8 @@ class TimelineQuery(BaseModel):
     bool_upload_to_s3: bool = True
     bool_change_to_new_format: bool = True
     force_collection: bool = False
+    output_format: Literal["jsonl", "parquet", "both"] = "jsonl"
+    streaming: bool = False  # written page by page rather than at the end
 
     @model_validator(mode="after")
     def validate_query(self) -> 'TimelineQuery':
@@ -39,6 +41,52 @@ class SearchQuery(BaseModel):
     bool_upload_to_s3: bool = True
     bool_change_to_new_format: bool = True
     force_collection: bool = False
+    output_format: Literal["jsonl", "parquet", "both"] = "jsonl"
+    streaming: bool = False  # written page by page rather than at the end
+
+    def to_dict(self) -> dict:
+        return self.model_dump()
+
+
+class PackedSearchQuery(BaseModel):
+    """One search covering several seeds, its results are split back into one file per seed."""
+    query: str
+    seeds: list[dict]  # {"seed_info": ..., "path": ...} for each packed seed
+    start_date: str
+    end_date: str
+    update_phh_history: bool = True
+    bool_upload_to_s3: bool = True
+    bool_change_to_new_format: bool = True
+    force_collection: bool = False
+    output_format: Literal["jsonl", "parquet", "both"] = "jsonl"
+
+    @model_validator(mode="after")
+    def validate_seeds(self) -> 'PackedSearchQuery':
+        if not all("seed_info" in s and "path" in s for s in self.seeds):
+            raise ValueError(f"Every packed seed needs a seed_info and a path, currently {self.seeds}")
+        return self
+
+    def to_dict(self) -> dict:
+        return self.model_dump()
+
+
+class ListTimelineQuery(BaseModel):
+    """The timeline of a list following several seeds, its tweets are routed back to each seed by author ID."""
+    query: int  # list ID
+    seeds: list[dict]  # {"seed_info": ..., "path": ..., "user_id": ...} for each seed the list serves
+    start_date: str
+    end_date: str
+    update_phh_history: bool = True
+    bool_upload_to_s3: bool = True
+    bool_change_to_new_format: bool = True
+    force_collection: bool = False
+    output_format: Literal["jsonl", "parquet", "both"] = "jsonl"
+
+    @model_validator(mode="after")
+    def validate_seeds(self) -> 'ListTimelineQuery':
+        if not all("seed_info" in s and "path" in s and "user_id" in s for s in self.seeds):
+            raise ValueError(f"Every seed of a list needs a seed_info, a path and a user_id, currently {self.seeds}")
+        return self
 
     def to_dict(self) -> dict:
         return self.model_dump()
@@ -59,6 +107,7 @@ class SearchExploreQuery(BaseModel):
     product: str = "Top"
     bool_upload_to_s3: bool = True
     limit: int = -1
+    streaming: bool = False
 
     def to_dict(self) -> dict:
         return self.model_dump()
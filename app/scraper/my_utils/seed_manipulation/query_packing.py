@@ -0,0 +1,74 @@
+import os
+import json
+
+SEARCH_OPERATORS = "include:nativeretweets include:retweets until:{end} since:{start}"
+
+
+def load_tweets_per_day(path_setup: str = "./") -> dict[str, float]:
+    with open(os.path.join(path_setup, "account_id_tweets_per_day.json"), "r") as f:
+        return json.load(f)
+
+
+def packed_search_query(handles: list[str], start: str, end: str) -> str:
+    if len(handles) == 1:
+        return f"from:{handles[0]} " + SEARCH_OPERATORS.format(start=start, end=end)
+    return "(" + " OR ".join(f"from:{h}" for h in handles) + ") " + SEARCH_OPERATORS.format(start=start, end=end)
+
+
+def pack_seeds(handles: list[dict[str, str]],
+               tweets_per_day: dict[str, float],
+               days: float,
+               page_size: int = 20,
+               max_pages: int = 1,
+               max_query_length: int = 500) -> list[list[dict[str, str]]]:
+    """
+    Groups low-volume seeds so that a single `(from:a OR from:b OR ...)` search covers all of them.
+    Parameters
+    ----------
+    handles : list[dict[str, str]]
+        The seeds to plan for
+    tweets_per_day : dict[str, float]
+        Expected tweets per day of each SeedID (see account_id_tweets_per_day.json)
+    days : float
+        Length of the date range searched by each query
+    page_size : int
+        Tweets returned per SearchTimeline page
+    max_pages : int
+        Pages a packed query is expected to take, i.e. a group's expected tweets stay under page_size * max_pages
+    max_query_length : int
+        Longest query allowed, operators and dates included
+    Returns
+    -------
+        list[list[dict[str, str]]]
+        Groups of seeds, a seed that is too busy or whose volume is unknown has a group of its own
+    """
+    budget = page_size * max_pages
+    # longest dates & operators, the handles have the rest
+    handles_budget = max_query_length - len(packed_search_query(["x"], "0000-00-00", "0000-00-00")) + len("from:x")
+
+    def expected(h: dict) -> float | None:
+        tpd = tweets_per_day.get(str(h["SeedID"]))
+        return tpd * days if tpd is not None else None
+
+    groups: list[list[dict]] = []
+    packable: list[tuple[float, dict]] = []
+    for h in handles:
+        volume = expected(h)
+        if volume is None or volume >= budget:
+            groups.append([h])
+        else:
+            packable.append((volume, h))
+
+    # first fit decreasing: the busiest seeds are placed first, the quiet ones fill the gaps
+    bins: list[tuple[float, int, list[dict]]] = []  # (expected tweets, length of the handles part, seeds)
+    for volume, h in sorted(packable, key=lambda x: x[0], reverse=True):
+        length = len(f"from:{h['Handle']}")
+        for i, (b_volume, b_length, b_seeds) in enumerate(bins):
+            # "(" ... ")" and " OR " between handles
+            if b_volume + volume <= budget and b_length + length + 4 + 2 <= handles_budget:
+                bins[i] = (b_volume + volume, b_length + length + 4, b_seeds + [h])
+                break
+        else:
+            bins.append((volume, length, [h]))
+
+    return groups + [b_seeds for _, _, b_seeds in bins]
@@ -0,0 +1,46 @@
+import os
+import json
+
+
+def load_seed_lists(path_setup: str = "./") -> dict[str, list[int]]:
+    """
+    Parameters
+    ----------
+    path_setup : str
+        Where to find seed_lists.json, the X lists managed to follow the seeds: {list ID: [member user IDs]}
+    Returns
+    -------
+        dict[str, list[int]]
+        Empty when no list is managed
+    """
+    path = os.path.join(path_setup, "seed_lists.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {str(list_id): [int(uid) for uid in members] for list_id, members in json.load(f).items()}
+
+
+def assign_seeds_to_lists(user_ids: list[int],
+                          seed_lists: dict[str, list[int]]) -> tuple[dict[str, list[int]], list[int]]:
+    """
+    Parameters
+    ----------
+    user_ids : list[int]
+        User IDs of the seeds to collect
+    seed_lists : dict[str, list[int]]
+        The managed lists and their members
+    Returns
+    -------
+        tuple[dict[str, list[int]], list[int]]
+        The lists to page with the seeds each one serves, and the seeds that aren't in any list
+    """
+    wanted = set(user_ids)
+    assigned: set[int] = set()
+    covered: dict[str, list[int]] = {}
+    # a seed in several lists is read from the one serving the most seeds
+    for list_id, members in sorted(seed_lists.items(), key=lambda x: len(wanted.intersection(x[1])), reverse=True):
+        seeds = [uid for uid in members if uid in wanted and uid not in assigned]
+        if seeds:
+            covered[list_id] = seeds
+            assigned.update(seeds)
+    return covered, [uid for uid in user_ids if uid not in assigned]
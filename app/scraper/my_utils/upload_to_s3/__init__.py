@@ -1 +1,2 @@
-from app.scraper.my_utils.upload_to_s3.upload_to_s3 import upload_to_s3
\ No newline at end of file
+from app.scraper.my_utils.upload_to_s3.upload_to_s3 import upload_to_s3
+from app.scraper.my_utils.upload_to_s3.uploader import S3Uploader
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from app.common.logger import get_logger
+
+logger = get_logger()
+
+
+class S3Uploader:
+    """
+    Uploads the outputs of a run in the background while it keeps scraping: `upload` only queues the file, a pool of
+    `workers` threads sharing one client sends it (in parts past `multipart_mib`) and `flush` waits for the queue to
+    empty. At most `max_pending` files wait at once, `upload` then waits for a slot: files are written faster than
+    they're sent when S3 is slow, the queue mustn't grow with the run.
+    """
+
+    def __init__(self,
+                 workers: int = 4,
+                 max_pending: int = 64,
+                 multipart_mib: int = 64,
+                 retries: int = 3):
+        """
+        :param retries: attempts of a file after the first; requests are also retried by the client itself
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retries = retries
+        # the parts of a large file are sent by threads of their own
+        self.transfer = TransferConfig(multipart_threshold=multipart_mib * 2 ** 20,
+                                       multipart_chunksize=16 * 2 ** 20,
+                                       max_concurrency=4)
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: set[asyncio.Future] = set()
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.reset()
+
+    def reset(self):
+        self.uploaded = 0
+        self.bytes = 0
+        self.failed: list[dict] = []
+
+    @property
+    def client(self):
+        # one client for every thread (they're thread-safe), created on the first upload with the run's credentials
+        with self._client_lock:
+            if self._client is None:
+                config = Config(retries={"max_attempts": 5, "mode": "adaptive"},
+                                max_pool_connections=self.workers * self.transfer.max_concurrency)
+                self._client = boto3.client("s3", region_name=os.environ.get("AWS_REGION"), config=config)
+            return self._client
+
+    def _upload_file(self, path: str, bucket: str, key: str) -> int:
+        # in a worker thread
+        size = os.stat(path).st_size
+        for attempt in range(self.retries + 1):
+            try:
+                self.client.upload_file(path, bucket, key, Config=self.transfer)
+                return size
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Upload of {path} failed ({type(e).__name__}: {e}), retrying")
+                time.sleep(2 ** attempt)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        # a run is an event loop of its own (asyncio.run), the semaphore belongs to it
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots, self._loop = asyncio.Semaphore(self.max_pending), loop
+        return self._slots
+
+    async def upload(self, path: str, bucket: str | None = None, folder: str | None = None) -> asyncio.Future | None:
+        """
+        Queues `path` to be uploaded to `bucket` (env S3BUCKET) under `folder` (env S3FOLDER) with its name, like
+        `upload_to_s3`. Empty files are skipped. Returns the future of the upload, None when it's skipped.
+        """
+        if os.stat(path).st_size == 0:
+            return None
+        bucket = bucket or os.getenv("S3BUCKET")
+        folder = folder if folder is not None else os.getenv("S3FOLDER")
+        key = f"{folder}/{os.path.basename(path)}" if folder else os.path.basename(path)
+
+        slots = self._get_slots()
+        await slots.acquire()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="s3-upload")
+        fut = asyncio.get_running_loop().run_in_executor(self._pool, self._upload_file, path, bucket, key)
+        self._pending.add(fut)
+
+        def done(f: asyncio.Future):
+            self._pending.discard(f)
+            slots.release()
+            if f.cancelled():
+                return
+            if (e := f.exception()) is not None:
+                logger.error(f"Upload of {path} to s3://{bucket}/{key} failed: {type(e).__name__}: {e}")
+                self.failed.append({"path": path, "key": key, "error": f"{type(e).__name__}: {e}"})
+            else:
+                self.uploaded += 1
+                self.bytes += f.result()
+
+        fut.add_done_callback(done)
+        return fut
+
+    def when_uploaded(self, uploads: list[asyncio.Future | None], callback: Callable[[], object]):
+        """
+        Calls `callback` (in a thread) once all of `uploads` succeeded, and never if one of them failed: what
+        follows an upload, like the seed's history, mustn't happen for files that aren't on S3. `flush` waits for it
+        too.
+        """
+        async def run():
+            results = await asyncio.gather(*[u for u in uploads if u is not None], return_exceptions=True)
+            if any(isinstance(r, BaseException) for r in results):
+                # the failure is logged and counted by `upload`
+                return
+            try:
+                await asyncio.to_thread(callback)
+            except Exception as e:
+                logger.error(f"After upload callback failed: {type(e).__name__}: {e}")
+
+        task = asyncio.ensure_future(run())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self) -> dict:
+        """Waits for the queued uploads. Returns what was uploaded since the last `reset` and what failed."""
+        while self._pending:
+            logger.info(f"Waiting for {len(self._pending)} uploads")
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        return {"uploaded": self.uploaded, "bytes": self.bytes, "failed": self.failed}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __repr__(self):
+        return f"S3Uploader(workers={self.workers}, max_pending={self.max_pending})"
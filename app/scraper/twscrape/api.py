@@ -1,15 +1,23 @@
 import asyncio
 from contextlib import aclosing
+from contextvars import ContextVar
 from typing import Callable, Optional
 
 from httpx import Response
 from typing_extensions import deprecated
 
+from app.common.logger import get_logger
 from .accounts_pool import AccountsPool
+from .archive import ResponseArchive
+from .cursor_store import Checkpoint, CursorStore
+from .instructions import extract_page
 from .logger import set_log_level
 from .models import Tweet, User, parse_tweet, parse_tweets, parse_user, parse_users, parse_trends
+from .page_sizes import PageSizes
+from .parse_executor import ParseExecutor
 from .queue_client import QueueClient
 from .utils import encode_params, find_obj, get_by_path
+from .watermarks import page_crossed_watermark
 
 # OP_{NAME} – {NAME} should be same as second part of GQL ID (required to auto-update script)
 OP_SearchTimeline = "UN1i3zUiCWa-6r-Uaho4fw/SearchTimeline"
@@ -30,6 +38,11 @@ OP_UserMedia = "dexO_2tohK86JDudXXG3Yw/UserMedia"
 OP_Bookmarks = "QUjXply7fA7fk05FRyajEg/Bookmarks"
 OP_Explore = "5u36Lskx1dfACjC_WHmH3Q/GenericTimelineById"
 
+logger = get_logger()
+
+# False while probing page sizes: the probes' pages are neither checkpointed nor archived
+_recording: ContextVar[bool] = ContextVar("recording", default=True)
+
 GQL_URL = "https://x.com/i/api/graphql"
 GQL_FEATURES = {  # search values here (view source) https://x.com/
     "articles_preview_enabled": False,
@@ -81,7 +94,11 @@ class API:
             proxy: str | None = None,
             raise_when_no_account=False,
             _num_calls_before_humanization: tuple[int, int] = (15, 30),
-            sem: asyncio.Semaphore = None
+            sem: asyncio.Semaphore = None,
+            cursor_store: CursorStore | str | None = None,
+            page_sizes: PageSizes | str | None = None,
+            parse_executor: ParseExecutor | None = None,
+            archive: ResponseArchive | str | None = None
     ):
         if isinstance(pool, AccountsPool):
             self.pool = pool
@@ -98,6 +115,17 @@ class API:
         # added by mika_jpd
         self.use_case: int = use_case
         self._num_calls_before_humanization: tuple[int, int] = _num_calls_before_humanization
+        self.cursor_store: CursorStore | None = (
+            CursorStore(cursor_store) if isinstance(cursor_store, str) else cursor_store
+        )
+        self.page_sizes: PageSizes = (
+            page_sizes if isinstance(page_sizes, PageSizes) else PageSizes(page_sizes)
+        )
+        self.parse_executor: ParseExecutor | None = parse_executor
+        # raw pages, to parse them again offline (see archive.reparse)
+        self.archive: ResponseArchive | None = (
+            ResponseArchive(archive) if isinstance(archive, str) else archive
+        )
 
     # general helpers
 
@@ -111,6 +139,19 @@ class API:
 
         return rep if is_res else None, new_total, is_cur and not is_lim
 
+    def _page_size(self, op: str, default: int) -> int:
+        return self.page_sizes.get(op.split("/")[-1], default)
+
+    async def _parse_tweets(self, rep: Response, limit: int = -1) -> list[Tweet]:
+        if self.parse_executor is not None:
+            return await self.parse_executor.tweets(rep, limit)
+        return list(parse_tweets(rep.json(), limit))
+
+    async def _parse_users(self, rep: Response, limit: int = -1) -> list[User]:
+        if self.parse_executor is not None:
+            return await self.parse_executor.users(rep, limit)
+        return list(parse_users(rep.json(), limit))
+
     def _get_cursor(self, obj: dict, cursor_type="Bottom"):
         if cur := find_obj(obj, lambda x: x.get("cursorType") == cursor_type):
             return cur.get("value")
@@ -125,16 +166,34 @@ class API:
             ft: dict | None = None,
             limit=-1, cursor_type="Bottom",
             stopping_condition: Callable = None,
-            flag: Optional[Flag] = None):
+            flag: Optional[Flag] = None,
+            watermark: int | None = None):
         queue, cur, cnt, active = op.split("/")[-1], None, 0, True
         kv, ft = {**kv}, {**GQL_FEATURES, **(ft or {})}
 
+        # replay the pages a previous attempt of this job already fetched, then continue from its last cursor
+        checkpoint: Optional[Checkpoint] = None
+        recording: bool = _recording.get()
+        if self.cursor_store is not None and recording:
+            checkpoint = await self.cursor_store.checkpoint(op, kv)
+            async for rep in checkpoint.replay():
+                rep, els, cur, cnt, active = self._parse_page(rep, queue, cnt, limit, cursor_type)
+                if rep is None:
+                    return
+                if await self._check_stopping_condition(rep, els, stopping_condition, flag, watermark):
+                    yield rep
+                    return
+                yield rep
+                if not active:
+                    return
+
         async with QueueClient(pool=self.pool,
                                queue=queue,
                                debug=self.debug,
                                proxy=self.proxy,
                                use_case=self.use_case,
-                               _num_calls_before_humanization=self._num_calls_before_humanization
+                               _num_calls_before_humanization=self._num_calls_before_humanization,
+                               parse_executor=self.parse_executor
                                ) as client:
             while active:
                 params = {"variables": kv, "features": ft}
@@ -149,38 +208,71 @@ class API:
                 if rep is None:
                     return
 
-                obj = rep.json()
-                els = get_by_path(obj, "entries") or []
-                els = [
-                    x
-                    for x in els
-                    if not (
-                            x["entryId"].startswith("cursor-")
-                            or x["entryId"].startswith("messageprompt-")
-                    )
-                ]
-                cur = self._get_cursor(obj, cursor_type)
-
-                rep, cnt, active = self._is_end(rep, queue, els, cur, cnt, limit)
+                rep, els, cur, cnt, active = self._parse_page(rep, queue, cnt, limit, cursor_type)
                 if rep is None:
                     return
 
+                if checkpoint is not None:
+                    await checkpoint.save_page(rep, cur, els)
+                if self.archive is not None and recording:
+                    await self.archive.append(op, kv, kv.get("cursor"), rep.content)
+
                 # test stopping condition
-                if stopping_condition is not None:
-                    try:
-                        if stopping_condition(rep):
-                            flag.set_flag(flag=True)
-                            yield rep
-                            return
-                    except Exception as e:
-                        pass
+                if await self._check_stopping_condition(rep, els, stopping_condition, flag, watermark):
+                    yield rep
+                    return
 
                 yield rep
 
+    def _parse_page(self, rep: Response, queue: str, cnt: int, limit: int, cursor_type: str):
+        obj = rep.json()
+        # known instruction layout of the operation first, whole-tree walks only when the schema changed
+        if (page := extract_page(obj, queue)) is not None:
+            els, cur = page.entries, page.cursor(cursor_type)
+        else:
+            els, cur = get_by_path(obj, "entries") or [], self._get_cursor(obj, cursor_type)
+        els = [
+            x
+            for x in els
+            if not (
+                    x["entryId"].startswith("cursor-")
+                    or x["entryId"].startswith("messageprompt-")
+            )
+        ]
+
+        rep, cnt, active = self._is_end(rep, queue, els, cur, cnt, limit)
+        return rep, els, cur, cnt, active
+
+    async def _check_stopping_condition(self, rep: Response, els: list[dict], stopping_condition: Callable | None,
+                                        flag: Optional[Flag], watermark: int | None = None) -> bool:
+        """
+        :param stopping_condition: called with the page's JSON, in the parse executor for large pages (so it must
+                                   pickle, see `ParseExecutor.call`)
+        """
+        # the page reached tweets a previous run already collected
+        if watermark is not None and page_crossed_watermark(els, watermark):
+            if flag is not None:
+                flag.set_flag(flag=True)
+            return True
+
+        if stopping_condition is None:
+            return False
+        try:
+            if self.parse_executor is not None:
+                stop = await self.parse_executor.call(stopping_condition, rep)
+            else:
+                stop = stopping_condition(rep.json())
+            if stop:
+                flag.set_flag(flag=True)
+                return True
+        except Exception as e:
+            logger.warning(f"Stopping condition failed: {type(e).__name__}: {e}")
+        return False
+
     async def _gql_item(self, op: str, kv: dict, ft: dict | None = None):
         ft = ft or {}
         queue = op.split("/")[-1]
-        async with QueueClient(self.pool, queue, self.debug, proxy=self.proxy, use_case=self.use_case, _num_calls_before_humanization=self._num_calls_before_humanization) as client:
+        async with QueueClient(self.pool, queue, self.debug, proxy=self.proxy, use_case=self.use_case, _num_calls_before_humanization=self._num_calls_before_humanization, parse_executor=self.parse_executor) as client:
             params = {"variables": {**kv}, "features": {**GQL_FEATURES, **ft}}
             return await client.get(f"{GQL_URL}/{op}", params=encode_params(params))
 
@@ -190,7 +282,7 @@ class API:
         op = OP_SearchTimeline
         kv = {
             "rawQuery": q,
-            "count": 20,
+            "count": self._page_size(op, 20),
             "product": "Latest",
             "querySource": "typed_query",
             **(kv or {}),
@@ -202,7 +294,7 @@ class API:
     async def search(self, q: str, limit=-1, kv=None):
         async with aclosing(self.search_raw(q, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
     # user_by_id
@@ -292,7 +384,7 @@ class API:
     async def tweet_replies(self, twid: int, limit=-1, kv=None):
         async with aclosing(self.tweet_replies_raw(twid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     if x.inReplyToTweetId == twid:
                         yield x
 
@@ -300,7 +392,7 @@ class API:
 
     async def followers_raw(self, uid: int, limit=-1, kv=None):
         op = OP_Followers
-        kv = {"userId": str(uid), "count": 20, "includePromotedContent": False, **(kv or {})}
+        kv = {"userId": str(uid), "count": self._page_size(op, 20), "includePromotedContent": False, **(kv or {})}
         ft = {"responsive_web_twitter_article_notes_tab_enabled": False}
         async with aclosing(self._gql_items(op, kv, limit=limit, ft=ft)) as gen:
             async for x in gen:
@@ -309,14 +401,14 @@ class API:
     async def followers(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.followers_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     # verified_followers
 
     async def verified_followers_raw(self, uid: int, limit=-1, kv=None):
         op = OP_BlueVerifiedFollowers
-        kv = {"userId": str(uid), "count": 20, "includePromotedContent": False, **(kv or {})}
+        kv = {"userId": str(uid), "count": self._page_size(op, 20), "includePromotedContent": False, **(kv or {})}
         ft = {"responsive_web_twitter_article_notes_tab_enabled": True}
         async with aclosing(self._gql_items(op, kv, limit=limit, ft=ft)) as gen:
             async for x in gen:
@@ -325,14 +417,14 @@ class API:
     async def verified_followers(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.verified_followers_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     # following
 
     async def following_raw(self, uid: int, limit=-1, kv=None):
         op = OP_Following
-        kv = {"userId": str(uid), "count": 20, "includePromotedContent": False, **(kv or {})}
+        kv = {"userId": str(uid), "count": self._page_size(op, 20), "includePromotedContent": False, **(kv or {})}
         async with aclosing(self._gql_items(op, kv, limit=limit)) as gen:
             async for x in gen:
                 yield x
@@ -340,14 +432,14 @@ class API:
     async def following(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.following_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     # subscriptions
 
     async def subscriptions_raw(self, uid: int, limit=-1, kv=None):
         op = OP_UserCreatorSubscriptions
-        kv = {"userId": str(uid), "count": 20, "includePromotedContent": False, **(kv or {})}
+        kv = {"userId": str(uid), "count": self._page_size(op, 20), "includePromotedContent": False, **(kv or {})}
         async with aclosing(self._gql_items(op, kv, limit=limit)) as gen:
             async for x in gen:
                 yield x
@@ -355,14 +447,14 @@ class API:
     async def subscriptions(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.subscriptions_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     # retweeters
 
     async def retweeters_raw(self, twid: int, limit=-1, kv=None):
         op = OP_Retweeters
-        kv = {"tweetId": str(twid), "count": 20, "includePromotedContent": True, **(kv or {})}
+        kv = {"tweetId": str(twid), "count": self._page_size(op, 20), "includePromotedContent": True, **(kv or {})}
         async with aclosing(self._gql_items(op, kv, limit=limit)) as gen:
             async for x in gen:
                 yield x
@@ -370,7 +462,7 @@ class API:
     async def retweeters(self, twid: int, limit=-1, kv=None):
         async with aclosing(self.retweeters_raw(twid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     async def list_explore_raw(self, timeline_id: str, kv: dict = None):
@@ -385,7 +477,7 @@ class API:
         op = OP_Explore
         kv = {
             "timelineId": timeline_id,
-            "count": 20,
+            "count": self._page_size(op, 20),
             "withQuickPromoteEligibilityTweetFields": True,
             **(kv or {}),
         }
@@ -413,7 +505,7 @@ class API:
         }
         async with aclosing(self.search_raw(q, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
     # favoriters
@@ -422,7 +514,7 @@ class API:
         "Likes is no longer available in X, see: https://x.com/XDevelopers/status/1800675411086409765")  # fmt: skip
     async def favoriters_raw(self, twid: int, limit=-1, kv=None):
         op = OP_Favoriters
-        kv = {"tweetId": str(twid), "count": 20, "includePromotedContent": True, **(kv or {})}
+        kv = {"tweetId": str(twid), "count": self._page_size(op, 20), "includePromotedContent": True, **(kv or {})}
         async with aclosing(self._gql_items(op, kv, limit=limit)) as gen:
             async for x in gen:
                 yield x
@@ -432,7 +524,7 @@ class API:
     async def favoriters(self, twid: int, limit=-1, kv=None):
         async with aclosing(self.favoriters_raw(twid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_users(rep.json(), limit):
+                for x in await self._parse_users(rep, limit):
                     yield x
 
     # user_tweets
@@ -441,7 +533,7 @@ class API:
         op = OP_UserTweets
         kv = {
             "userId": str(uid),
-            "count": 40,
+            "count": self._page_size(op, 40),
             "includePromotedContent": True,
             "withQuickPromoteEligibilityTweetFields": True,
             "withVoice": True,
@@ -456,17 +548,17 @@ class API:
         async with aclosing(
                 self.user_tweets_raw(uid, limit=limit, kv=kv, stopping_condition=stopping_condition)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
     # user_tweets_and_replies
 
     async def user_tweets_and_replies_raw(self, uid: int, limit=-1, kv=None, stopping_condition: Callable = None,
-                                          flag: Flag = None):
+                                          flag: Flag = None, watermark: int | None = None):
         op = OP_UserTweetsAndReplies
         kv = {
             "userId": str(uid),
-            "count": 40,
+            "count": self._page_size(op, 40),
             "includePromotedContent": True,
             "withCommunity": True,
             "withVoice": True,
@@ -474,7 +566,8 @@ class API:
             **(kv or {}),
         }
         async with aclosing(
-                self._gql_items(op, kv, limit=limit, stopping_condition=stopping_condition, flag=flag)) as gen:
+                self._gql_items(op, kv, limit=limit, stopping_condition=stopping_condition, flag=flag,
+                                watermark=watermark)) as gen:
             async for x in gen:
                 yield x
 
@@ -483,20 +576,84 @@ class API:
                                       int, limit=-1,
                                       kv=None,
                                       stopping_condition: Callable = None,
-                                      flag: Flag = None):
+                                      flag: Flag = None,
+                                      watermark: int | None = None):
+        """
+        :param watermark: lowest tweet ID still worth fetching (see `Watermark.bound`), paging stops at the first page
+            reaching older tweets
+        """
         async with aclosing(self.user_tweets_and_replies_raw(uid, limit=limit, kv=kv,
-                                                             stopping_condition=stopping_condition, flag=flag)) as gen:
+                                                             stopping_condition=stopping_condition, flag=flag,
+                                                             watermark=watermark)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
+    async def user_tweets_and_replies_many(self,
+                                           uids: list[int],
+                                           concurrency: int = 4,
+                                           limit=-1,
+                                           kv=None,
+                                           stopping_condition: Callable = None,
+                                           watermarks: dict[int, int] | None = None,
+                                           flags: dict[int, Flag] | None = None,
+                                           done: dict[int, asyncio.Event] | None = None):
+        """
+        Timelines of several users, `(uid, tweet)` are yielded as their pages arrive instead of user after user.
+        :param concurrency: timelines paged at the same time, the next uid starts once one of them is exhausted
+        :param watermarks: `watermark` of each uid (see `user_tweets_and_replies`)
+        :param flags: filled with the `stopping_condition` flag of each uid
+        :param done: filled with an event per uid, set once all the tweets of that uid were yielded
+        """
+        uids = list(dict.fromkeys(uids))
+        flags = flags if flags is not None else {}
+        done = done if done is not None else {}
+        for uid in uids:
+            flags.setdefault(uid, Flag(False))
+            done.setdefault(uid, asyncio.Event())
+
+        # at most one parsed page per chain waits for the consumer, a slow consumer holds the chains back
+        pages: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        todo = iter(uids)
+
+        async def worker():
+            for uid in todo:
+                try:
+                    async with aclosing(self.user_tweets_and_replies_raw(
+                            uid, limit=limit, kv=kv, stopping_condition=stopping_condition, flag=flags[uid],
+                            watermark=(watermarks or {}).get(uid))) as gen:
+                        async for rep in gen:
+                            await pages.put((uid, await self._parse_tweets(rep, limit), None))
+                except Exception as e:
+                    await pages.put((uid, None, e))
+                    return
+                await pages.put((uid, None, None))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(uids)))]
+        try:
+            remaining = len(uids)
+            while remaining > 0:
+                uid, tweets, e = await pages.get()
+                if e is not None:
+                    raise e
+                if tweets is None:
+                    done[uid].set()
+                    remaining -= 1
+                    continue
+                for x in tweets:
+                    yield uid, x
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
     # user_media
 
     async def user_media_raw(self, uid: int, limit=-1, kv=None):
         op = OP_UserMedia
         kv = {
             "userId": str(uid),
-            "count": 40,
+            "count": self._page_size(op, 40),
             "includePromotedContent": False,
             "withClientEventToken": False,
             "withBirdwatchNotes": False,
@@ -512,7 +669,7 @@ class API:
     async def user_media(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.user_media_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep, limit):
+                for x in await self._parse_tweets(rep, limit):
                     # sometimes some tweets without media, so skip them
                     media_count = (
                         len(x.media.photos) + len(x.media.videos) + len(x.media.animated)
@@ -525,17 +682,22 @@ class API:
 
     # list_timeline
 
-    async def list_timeline_raw(self, list_id: int, limit=-1, kv=None):
+    async def list_timeline_raw(self, list_id: int, limit=-1, kv=None, flag: Flag = None,
+                                watermark: int | None = None):
         op = OP_ListLatestTweetsTimeline
-        kv = {"listId": str(list_id), "count": 20, **(kv or {})}
-        async with aclosing(self._gql_items(op, kv, limit=limit)) as gen:
+        kv = {"listId": str(list_id), "count": self._page_size(op, 20), **(kv or {})}
+        async with aclosing(self._gql_items(op, kv, limit=limit, flag=flag, watermark=watermark)) as gen:
             async for x in gen:
                 yield x
 
-    async def list_timeline(self, list_id: int, limit=-1, kv=None):
-        async with aclosing(self.list_timeline_raw(list_id, limit=limit, kv=kv)) as gen:
+    async def list_timeline(self, list_id: int, limit=-1, kv=None, flag: Flag = None, watermark: int | None = None):
+        """
+        :param watermark: lowest tweet ID still worth fetching, paging stops at the first page reaching older tweets
+        """
+        async with aclosing(self.list_timeline_raw(list_id, limit=limit, kv=kv, flag=flag,
+                                                   watermark=watermark)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep, limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
     # likes
@@ -546,7 +708,7 @@ class API:
         op = OP_Likes
         kv = {
             "userId": str(uid),
-            "count": 40,
+            "count": self._page_size(op, 40),
             "includePromotedContent": True,
             "withVoice": True,
             "withV2Timeline": True,
@@ -561,7 +723,7 @@ class API:
     async def liked_tweets(self, uid: int, limit=-1, kv=None):
         async with aclosing(self.liked_tweets_raw(uid, limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
 
     # Get current user bookmarks
@@ -569,7 +731,7 @@ class API:
     async def bookmarks_raw(self, limit=-1, kv=None):
         op = OP_Bookmarks
         kv = {
-            "count": 20,
+            "count": self._page_size(op, 20),
             "includePromotedContent": False,
             "withClientEventToken": False,
             "withBirdwatchNotes": False,
@@ -587,5 +749,63 @@ class API:
     async def bookmarks(self, limit=-1, kv=None):
         async with aclosing(self.bookmarks_raw(limit=limit, kv=kv)) as gen:
             async for rep in gen:
-                for x in parse_tweets(rep.json(), limit):
+                for x in await self._parse_tweets(rep, limit):
                     yield x
+
+    # page sizes
+
+    async def _probe_page_size(self, queue: str, target: int | str, count: int) -> int:
+        fn = {
+            "SearchTimeline": self.search_raw,
+            "UserTweets": self.user_tweets_raw,
+            "UserTweetsAndReplies": self.user_tweets_and_replies_raw,
+            "UserMedia": self.user_media_raw,
+            "Followers": self.followers_raw,
+            "Following": self.following_raw,
+            "BlueVerifiedFollowers": self.verified_followers_raw,
+            "UserCreatorSubscriptions": self.subscriptions_raw,
+            "Retweeters": self.retweeters_raw,
+            "Favoriters": self.favoriters_raw,
+            "ListLatestTweetsTimeline": self.list_timeline_raw,
+        }[queue]
+        # each trial fetches a first page of its own: the cursor store would replay the first one, and keep a chain
+        # that's never finished
+        token = _recording.set(False)
+        try:
+            async with aclosing(fn(target, kv={"count": count})) as gen:
+                async for rep in gen:
+                    els = self._parse_page(rep, queue, 0, -1, "Bottom")[1]
+                    # a conversation module (UserTweetsAndReplies) is one entry holding several of the `count` tweets
+                    return sum(len((x.get("content") or {}).get("items") or [x]) for x in els)
+        finally:
+            _recording.reset(token)
+        return 0
+
+    async def calibrate_page_sizes(self,
+                                   targets: dict[str, int | str],
+                                   candidates: tuple[int, ...] = (20, 40, 60, 100, 200),
+                                   trials: int = 2,
+                                   ratio: float = 0.9) -> dict[str, int]:
+        """
+        Finds the largest `count` each operation honours and records it in `self.page_sizes`. Only first pages are
+        fetched, `trials` for each candidate, until a candidate comes back short.
+        :param targets: operation to the argument of its raw method, e.g. {"SearchTimeline": "news",
+            "Followers": 44196397}; it has to hold more items than the largest candidate
+        :param ratio: a page honours `count` when it holds at least `ratio * count` entries
+        :return: the page size recorded for each operation
+        """
+        res = {}
+        for queue, target in targets.items():
+            best = None
+            for count in sorted(candidates):
+                sizes = [await self._probe_page_size(queue, target, count) for _ in range(trials)]
+                logger.debug(f"{queue} count={count}: {sizes}")
+                if min(sizes) < ratio * count:
+                    break
+                best = count
+            if best is None:
+                logger.warning(f"{queue} returned short pages for every candidate, page size left unchanged")
+                continue
+            self.page_sizes.set(queue, best)
+            res[queue] = best
+        return res
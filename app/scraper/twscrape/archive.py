@@ -0,0 +1,216 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from itertools import repeat
+from typing import Iterator
+
+from app.common.logger import get_logger
+from .cursor_store import QUERY_KEYS, variables_hash
+from .models import parse_tweets
+from .serializer import tweet_to_json
+from .utils import utc
+
+logger = get_logger()
+
+# a record: the lengths of its metadata (JSON) and of its body (zlib), then both
+RECORD = struct.Struct("<II")
+
+
+def read_segment(path: str) -> Iterator[tuple[dict, bytes]]:
+    """(metadata, response body) of every record of a segment, in the order they were appended."""
+    with open(path, "rb") as f:
+        while header := f.read(RECORD.size):
+            if len(header) < RECORD.size:
+                break
+            meta_len, body_len = RECORD.unpack(header)
+            meta, body = f.read(meta_len), f.read(body_len)
+            if len(body) < body_len:  # the writer was killed mid-record
+                logger.warning(f"Truncated record at the end of {path}")
+                break
+            yield json.loads(meta), zlib.decompress(body)
+
+
+class ResponseArchive:
+    """
+    Raw GraphQL pages kept to be parsed again later (new card type, parser fix...) without spending accounts. Bodies
+    are zlib compressed and appended to segment files, each process writes its own segments and starts a new one
+    past `segment_bytes`. Records carry their operation, query, variables and cursor so segments can be read on
+    their own; `index.db` maps these to (segment, offset) for lookups.
+    Pages are buffered and written `batch_pages` at a time in a thread, one file write and one transaction per
+    batch, so the event loop never waits on the disk. `flush` writes what's left, pages still buffered when the
+    process dies are lost (the archive is best effort, the outputs don't depend on it).
+    """
+
+    def __init__(self, path: str, segment_bytes: int = 256 * 2 ** 20, batch_pages: int = 64):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.batch_pages = batch_pages
+        self._segment: str | None = None
+        self._ready = False
+        self._buffer: list[tuple[dict, str, bytes]] = []
+        # batches are written by threads one at a time, in the order they were handed over
+        self._write_lock = threading.Lock()
+
+    @property
+    def _db_file(self) -> str:
+        return os.path.join(self.path, "index.db")
+
+    def segments(self) -> list[str]:
+        if not os.path.exists(self.path):
+            return []
+        return sorted(os.path.join(self.path, x) for x in os.listdir(self.path) if x.endswith(".seg"))
+
+    def _connect(self) -> sqlite3.Connection:
+        # the processes of a run share the index, a writer waits for the others' transactions
+        db = sqlite3.connect(self._db_file, timeout=60)
+        if not self._ready:
+            os.makedirs(self.path, exist_ok=True)
+            db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                op TEXT NOT NULL,
+                query TEXT,
+                vars_hash TEXT NOT NULL,
+                cursor TEXT,
+                segment TEXT NOT NULL,
+                offset INT NOT NULL,
+                fetched_at TEXT NOT NULL
+            );""")
+            db.execute("CREATE INDEX IF NOT EXISTS pages_query ON pages (op, query);")
+            db.commit()
+            self._ready = True
+        return db
+
+    def _next_segment(self) -> str:
+        name = f"{utc.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{len(self.segments()):05d}.seg"
+        return os.path.join(self.path, name)
+
+    def _write(self, batch: list[tuple[dict, str, bytes]]):
+        # in a thread: the records to the current segment, then their rows to the index
+        with self._write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            if self._segment is None or os.path.getsize(self._segment) >= self.segment_bytes:
+                self._segment = self._next_segment()
+            rows = []
+            with open(self._segment, "ab") as f:
+                offset = f.tell()
+                for meta, vars_hash, body in batch:
+                    meta_bytes = json.dumps(meta, default=str).encode()
+                    body = zlib.compress(body)
+                    f.write(RECORD.pack(len(meta_bytes), len(body)) + meta_bytes + body)
+                    rows.append({**meta, "vars_hash": vars_hash, "segment": os.path.basename(self._segment),
+                                 "offset": offset})
+                    offset += RECORD.size + len(meta_bytes) + len(body)
+            with closing(self._connect()) as db:
+                db.executemany(
+                    "INSERT INTO pages VALUES (:op, :query, :vars_hash, :cursor, :segment, :offset, :fetched_at)",
+                    rows,
+                )
+                db.commit()
+
+    async def append(self, op: str, kv: dict, cursor: str | None, body: bytes):
+        """
+        :param kv: variables of the request, its cursor is the one of `cursor`
+        """
+        meta = {
+            "op": op.split("/")[-1],
+            "query": next((str(kv[k]) for k in QUERY_KEYS if k in kv), None),
+            "variables": {k: v for k, v in kv.items() if k != "cursor"},
+            "cursor": cursor,
+            "fetched_at": utc.now().isoformat(),
+        }
+        self._buffer.append((meta, variables_hash(kv), body))
+        if len(self._buffer) >= self.batch_pages:
+            await self.flush()
+
+    async def flush(self):
+        """Writes the buffered pages."""
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        await asyncio.to_thread(self._write, batch)
+
+    def _find(self, op: str, query: str | None) -> list[tuple[str, int]]:
+        qs, params = "SELECT segment, offset FROM pages WHERE op = :op", {"op": op, "query": query}
+        if query is not None:
+            qs += " AND query = :query"
+        with closing(self._connect()) as db:
+            rs = db.execute(qs + " ORDER BY fetched_at", params).fetchall()
+        return [(os.path.join(self.path, x[0]), x[1]) for x in rs]
+
+    async def find(self, op: str, query: str | None = None) -> list[tuple[str, int]]:
+        """(segment, offset) of the written pages of an operation, of one query only when given."""
+        return await asyncio.to_thread(self._find, op, query)
+
+
+# re-parse
+
+def _output_name(op: str, query: str | None) -> str:
+    return re.sub(r"[^\w.-]+", "-", f"{op}_{query}").strip("-")[:200] + ".jsonl"
+
+
+def _reparse_segment(path: str, ops: list[str] | None, seeds: dict[str, dict] | None) -> dict[str, list]:
+    # in a worker: {output file: [(tweet ID, JSON line)]} of one segment
+    if seeds:
+        from app.scraper.TwitterScraper import to_json_lines
+
+    res: dict[str, list] = {}
+    for meta, body in read_segment(path):
+        if ops and meta["op"] not in ops:
+            continue
+        tweets = list(parse_tweets(json.loads(body)))
+        seed_info = (seeds or {}).get(meta["query"])
+        lines = to_json_lines(tweets, seed_info) if seed_info else [tweet_to_json(t) for t in tweets]
+        res.setdefault(_output_name(meta["op"], meta["query"]), []).extend(zip([t.id for t in tweets], lines))
+    return res
+
+
+def reparse(archive: str,
+            output: str,
+            workers: int | None = None,
+            ops: list[str] | None = None,
+            seeds: dict[str, dict] | None = None) -> dict[str, int]:
+    """
+    Parses the archived pages again with the current parser, one process per segment, and writes the tweets of each
+    (operation, query) to its own JSONL file in `output`, once each. No request is made.
+    :param seeds: seed_info by query (user ID for the timelines, the search query...), the tweets of these queries
+                  are written in the new format
+    :return: tweets written by file
+    """
+    segments = ResponseArchive(archive).segments()
+    os.makedirs(output, exist_ok=True)
+    seen: dict[str, set[int]] = {}
+    logger.info(f"Re-parsing {len(segments)} segments of {archive} into {output}")
+
+    # written to temporary files which replace the outputs once complete: a re-run starts over rather than adding
+    # to the previous outputs
+    def parts(name: str) -> str:
+        return os.path.join(output, f"{name}.part")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # in the order of the segments: a tweet fetched several times is written as first fetched
+            for res in pool.map(_reparse_segment, segments, repeat(ops), repeat(seeds)):
+                for name, rows in res.items():
+                    new = name not in seen
+                    ids = seen.setdefault(name, set())
+                    with open(parts(name), "w" if new else "a") as f:
+                        for twid, line in rows:
+                            if twid not in ids:
+                                ids.add(twid)
+                                f.write(line + "\n")
+    except BaseException:
+        for name in seen:
+            if os.path.exists(parts(name)):
+                os.remove(parts(name))
+        raise
+    for name in seen:
+        os.replace(parts(name), os.path.join(output, name))
+    return {name: len(ids) for name, ids in seen.items()}
@@ -10,6 +10,10 @@ from importlib.metadata import version
 import httpx
 
 from .api import API, AccountsPool
+from .archive import reparse
+from .conversations import ConversationCrawler
+from .graph import GraphCrawler
+from .page_sizes import PageSizes
 from .db import get_sqlite_version
 from app.common.logger import get_logger
 from .login import LoginConfig
@@ -52,6 +56,15 @@ async def main(args):
         print(f"SQLite runtime: {sqlite3.sqlite_version} ({await get_sqlite_version()})")
         return
 
+    # offline, no account needed
+    if args.command == "reparse":
+        seeds = None
+        if args.seeds:
+            with open(args.seeds) as f:
+                seeds = json.load(f)
+        print(reparse(args.archive, args.output, workers=args.workers, ops=args.op, seeds=seeds))
+        return
+
     login_config = LoginConfig(getattr(args, "email_first", False), getattr(args, "manual", False))
     pool = AccountsPool(args.db, login_config=login_config)
     api = API(pool, debug=args.debug)
@@ -105,6 +118,37 @@ async def main(args):
         await pool.delete_inactive()
         return
 
+    if args.command == "user_tweets_and_replies_many":
+        async for _, doc in api.user_tweets_and_replies_many(args.user_ids, args.concurrency, limit=args.limit):
+            print(to_str(doc))
+        return
+
+    if args.command == "conversations":
+        crawler = ConversationCrawler(api, concurrency=args.concurrency, max_depth=args.max_depth)
+        print(await crawler.crawl_to_jsonl(args.tweet_ids, args.output))
+        return
+
+    if args.command == "graph":
+        crawler = GraphCrawler(api, args.frontier, args.output, direction=args.direction, hop_limits=args.hop_limits,
+                               concurrency=args.concurrency, max_attempts=args.max_attempts)
+        print(await crawler.crawl(args.user_ids))
+        return
+
+    if args.command == "calibrate":
+        targets = {}
+        if args.query:
+            targets["SearchTimeline"] = args.query
+        if args.user_id:
+            for queue in ["UserTweets", "UserTweetsAndReplies", "UserMedia", "Followers", "Following"]:
+                targets[queue] = args.user_id
+        if args.tweet_id:
+            targets["Retweeters"] = args.tweet_id
+        if args.list_id:
+            targets["ListLatestTweetsTimeline"] = args.list_id
+        api.page_sizes = PageSizes(args.output)
+        print(await api.calibrate_page_sizes(targets, candidates=tuple(args.candidates), trials=args.trials))
+        return
+
     fn = args.command + "_raw" if args.raw else args.command
     fn = getattr(api, fn, None)
     if fn is None:
@@ -187,6 +231,34 @@ def run():
     c_one("tweet_details", "Get tweet details", "tweet_id", "Tweet ID", int)
     c_lim("tweet_replies", "Get replies  of a tweet", "tweet_id", "Tweet ID", int)
     c_lim("retweeters", "Get retweeters of a tweet", "tweet_id", "Tweet ID", int)
+    conversations = subparsers.add_parser("conversations", help="Get the reply trees of several tweets")
+    conversations.add_argument("tweet_ids", nargs="+", type=int, help="Root tweet IDs")
+    conversations.add_argument("--output", required=True, help="JSONL file the tweets are appended to")
+    conversations.add_argument("--concurrency", type=int, default=8, help="Conversations expanded at the same time")
+    conversations.add_argument("--max-depth", type=int, default=None, help="Reply levels to expand")
+    graph = subparsers.add_parser("graph", help="Crawl the follower graph of several users")
+    graph.add_argument("user_ids", nargs="+", type=int, help="Seed user IDs")
+    graph.add_argument("--output", required=True, help="Binary edge list, pairs of uint64 (follower, followed)")
+    graph.add_argument("--frontier", required=True, help="SQLite file of the frontier, reuse it to resume")
+    graph.add_argument("--direction", default="followers", choices=["followers", "following", "verified_followers"])
+    graph.add_argument("--hop-limits", nargs="+", type=int, default=[1000], help="Users paged per user of each hop")
+    graph.add_argument("--concurrency", type=int, default=8, help="Users paged at the same time")
+    graph.add_argument("--max-attempts", type=int, default=3, help="Attempts at a failing user across resumes")
+    calibrate = subparsers.add_parser("calibrate", help="Find the largest page size each operation honours")
+    calibrate.add_argument("--output", required=True, help="JSON file the page sizes are written to")
+    calibrate.add_argument("--query", help="Busy search query, for SearchTimeline")
+    calibrate.add_argument("--user-id", type=int, help="Busy user, for the user timelines and followers/following")
+    calibrate.add_argument("--tweet-id", type=int, help="Widely retweeted tweet, for Retweeters")
+    calibrate.add_argument("--list-id", type=int, help="Busy list, for ListLatestTweetsTimeline")
+    calibrate.add_argument("--candidates", nargs="+", type=int, default=[20, 40, 60, 100, 200])
+    calibrate.add_argument("--trials", type=int, default=2, help="First pages fetched for each candidate")
+    reparse_cmd = subparsers.add_parser("reparse", help="Parse the pages of a response archive again, offline")
+    reparse_cmd.add_argument("archive", help="Archive directory (API(archive=...))")
+    reparse_cmd.add_argument("--output", required=True,
+                             help="Directory of the JSONL files (one per operation and query)")
+    reparse_cmd.add_argument("--workers", type=int, default=None, help="Processes, the number of CPUs by default")
+    reparse_cmd.add_argument("--op", nargs="+", default=None, help="Operations to parse, all by default")
+    reparse_cmd.add_argument("--seeds", help="JSON file of the seed_info of each query, to write the new format")
     c_one("user_by_id", "Get user data by ID", "user_id", "User ID", int)
     c_one("user_by_login", "Get user data by username", "username", "Username")
     c_lim("following", "Get user following", "user_id", "User ID", int)
@@ -196,6 +268,10 @@ def run():
     c_lim("subscriptions", "Get user subscriptions", "user_id", "User ID", int)
     c_lim("user_tweets", "Get user tweets", "user_id", "User ID", int)
     c_lim("user_tweets_and_replies", "Get user tweets and replies", "user_id", "User ID", int)
+    many = subparsers.add_parser("user_tweets_and_replies_many", help="Get tweets and replies of several users")
+    many.add_argument("user_ids", nargs="+", type=int, help="User IDs")
+    many.add_argument("--limit", type=int, default=-1, help="Max tweets to retrieve per user")
+    many.add_argument("--concurrency", type=int, default=4, help="Users scraped at the same time")
     c_lim("user_media", "Get user's media", "user_id", "User ID", int)
     c_lim("list_timeline", "Get tweets from list", "list_id", "List ID", int)
 
@@ -0,0 +1,138 @@
+"""
+Tweets as Parquet: typed columns (integers, timestamps, lists) rather than the strings of `Tweet.dict()`, the user,
+media, place... as structs. The schema follows the dataclasses, the retweeted and quoted tweets are nested one level
+(their own references are kept as IDs) and cards, whose type varies, are JSON.
+"""
+import json
+import os
+import types
+from dataclasses import asdict, fields, is_dataclass
+from datetime import datetime, timezone
+from typing import Callable, Union, get_args, get_origin, get_type_hints
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .models import Tweet
+from .serializer import DATE_SCRAPE_FORMAT, scrape_date
+
+_SCALARS = {
+    int: pa.int64(),
+    str: pa.string(),
+    bool: pa.bool_(),
+    float: pa.float64(),
+    datetime: pa.timestamp("us", tz="UTC"),
+}
+# not data, the class name snscrape used
+_SKIP = {"_type"}
+# tweets referenced by a tweet, nested as _REF_TWEET
+_REFS = {"retweetedTweet": "retweetedTweetId", "quotedTweet": "quotedTweetId"}
+
+
+def _is_card(hint) -> bool:
+    return get_origin(hint) in (Union, types.UnionType) and len([x for x in get_args(hint) if x is not type(None)]) > 1
+
+
+def _type(hint) -> tuple[pa.DataType, Callable]:
+    """The Arrow type of a field and how to convert its value for `pa.Table.from_pylist`."""
+    if get_origin(hint) in (Union, types.UnionType):
+        if _is_card(hint):
+            return pa.string(), lambda v: json.dumps(asdict(v), default=str) if v is not None else None
+        return _type(next(x for x in get_args(hint) if x is not type(None)))
+    if get_origin(hint) is list:
+        t, conv = _type(get_args(hint)[0])
+        return pa.list_(t), (lambda v: [conv(x) for x in v]) if conv is not _same else _same
+    if is_dataclass(hint):
+        return _struct(hint)
+    return _SCALARS[hint], _same
+
+
+def _same(v):
+    return v
+
+
+def _struct(cls, exclude: frozenset = frozenset()) -> tuple[pa.DataType, Callable]:
+    hints = get_type_hints(cls)
+    plan = [(f.name, *_type(hints[f.name])) for f in fields(cls) if f.name not in _SKIP | exclude]
+    t = pa.struct([(name, typ) for name, typ, _ in plan])
+
+    def conv(obj):
+        if obj is None:
+            return None
+        return {name: c(getattr(obj, name)) for name, _, c in plan}
+
+    return t, conv
+
+
+_BASE, _base = _struct(Tweet, exclude=frozenset(_REFS))
+_REF_TWEET = pa.struct([*_BASE, *[(x, pa.int64()) for x in _REFS.values()]])
+
+
+def _ref_tweet(tw: Tweet | None) -> dict | None:
+    if tw is None:
+        return None
+    row = _base(tw)
+    for name, id_name in _REFS.items():
+        ref = getattr(tw, name)
+        row[id_name] = ref.id if ref is not None else None
+    return row
+
+
+# the new format's header (see TwitterScraper.new_format_header) comes first when there's one
+HEADER = [("phh_id", pa.string()), ("seed_id", pa.string()), ("crawled_date", pa.timestamp("s", tz="UTC")),
+          ("collection", pa.string())]
+TWEET_SCHEMA = pa.schema([
+    *_BASE,
+    *[(x, _REF_TWEET) for x in _REFS],
+    ("date_scrape", pa.timestamp("s", tz="UTC")),
+])
+
+
+def tweet_row(tweet: Tweet, date_scrape: datetime) -> dict:
+    row = _base(tweet)
+    for name in _REFS:
+        row[name] = _ref_tweet(getattr(tweet, name))
+    row["date_scrape"] = date_scrape
+    return row
+
+
+class TweetParquetWriter:
+    """
+    Appends tweets to a Parquet file, each `write` is a row group so pages can be written as they arrive. The file is
+    only complete once closed.
+    """
+
+    def __init__(self, path: str, header: bool = False, compression: str = "zstd"):
+        """
+        :param header: whether the rows start with the columns of the new format's header
+        """
+        self.path = path
+        self.schema = pa.schema([*HEADER, *TWEET_SCHEMA]) if header else TWEET_SCHEMA
+        self.rows = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._writer = pq.ParquetWriter(path, self.schema, compression=compression)
+
+    def write(self, tweets: list[Tweet], headers: list[dict] | None = None, date_scrape: str | None = None):
+        """
+        :param headers: the header of each tweet, when the file has them
+        :param date_scrape: the one of the JSON lines and the headers written along (`scrape_date`), stamped UTC like
+                            the headers' crawled_date
+        """
+        if len(tweets) == 0:
+            return
+        date_scrape = datetime.strptime(date_scrape or scrape_date(), DATE_SCRAPE_FORMAT).replace(tzinfo=timezone.utc)
+        rows = [tweet_row(t, date_scrape) for t in tweets]
+        if headers is not None:
+            rows = [{**h, "crawled_date": datetime.fromisoformat(h["crawled_date"].replace("Z", "+00:00")), **r}
+                    for h, r in zip(headers, rows)]
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,137 @@
+import asyncio
+import os
+from collections import defaultdict
+from contextlib import aclosing
+from dataclasses import dataclass
+
+from app.common.logger import get_logger
+from .api import API
+from .serializer import tweet_to_json
+
+logger = get_logger()
+
+
+@dataclass
+class CrawlStats:
+    roots: int = 0
+    expanded: int = 0
+    pages: int = 0
+    tweets: int = 0
+    dropped: int = 0
+    failed: int = 0
+
+
+class ConversationCrawler:
+    """
+    Expands the reply trees of a batch of tweets breadth-first. Tweets are visited once across all the
+    conversations, and a tweet is only expanded (one TweetDetail chain) when the responses so far don't already
+    hold all its replies. Overlapping threads then cost nothing more than their unique tweets.
+    """
+
+    def __init__(self, api: API, concurrency: int = 8, max_frontier: int = 10_000, max_depth: int | None = None):
+        self.api = api
+        self.concurrency = concurrency
+        self.max_frontier = max_frontier
+        self.max_depth = max_depth
+
+        self.stats = CrawlStats()
+        self._visited: set[int] = set()  # tweets already yielded
+        self._expanded: set[int] = set()  # tweets already used as a focal tweet
+        self._in_tree: set[int] = set()  # roots and their replies
+        self._replies_seen: dict[int, int] = defaultdict(int)
+
+    def _push(self, frontier: asyncio.Queue, twid: int, depth: int):
+        if twid in self._expanded or (self.max_depth is not None and depth > self.max_depth):
+            return
+        try:
+            frontier.put_nowait((twid, depth))
+            self._expanded.add(twid)
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+
+    async def crawl(self, roots: list[int]):
+        """Yields every tweet of the conversations once, in the order their pages arrive."""
+        frontier: asyncio.Queue = asyncio.Queue(maxsize=self.max_frontier)
+        found: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        roots = list(dict.fromkeys(int(x) for x in roots))
+        self.stats.roots += len(roots)
+        self._in_tree.update(roots)
+        for twid in roots:
+            self._push(frontier, twid, 0)
+
+        async def expand(twid: int, depth: int):
+            async with aclosing(self.api.tweet_replies_raw(twid)) as gen:
+                async for rep in gen:
+                    self.stats.pages += 1
+                    page = await self.api._parse_tweets(rep)
+                    tweets = [x for x in page if x.id not in self._visited]
+                    for x in tweets:
+                        self._visited.add(x.id)
+                        if x.inReplyToTweetId is not None:
+                            self._replies_seen[x.inReplyToTweetId] += 1
+                    await found.put(tweets)
+
+                    # descendants of the roots, not the ancestors or quoted tweets that come along
+                    changed = True
+                    while changed:
+                        changed = False
+                        for x in page:
+                            if x.id not in self._in_tree and x.inReplyToTweetId in self._in_tree:
+                                self._in_tree.add(x.id)
+                                changed = True
+
+                    # expand the ones whose replies weren't all part of the responses so far
+                    for x in page:
+                        if x.id in self._in_tree and x.replyCount > self._replies_seen[x.id]:
+                            self._push(frontier, x.id, depth + 1)
+
+        async def worker():
+            while True:
+                twid, depth = await frontier.get()
+                try:
+                    await expand(twid, depth)
+                    self.stats.expanded += 1
+                except Exception as e:
+                    self.stats.failed += 1
+                    logger.error(f"Failed to expand the conversation of {twid}: {type(e)} {e}")
+                finally:
+                    frontier.task_done()
+
+        async def wait_frontier():
+            await frontier.join()
+            await found.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        waiter = asyncio.create_task(wait_frontier())
+        try:
+            while (tweets := await found.get()) is not None:
+                self.stats.tweets += len(tweets)
+                for x in tweets:
+                    yield x
+        finally:
+            for t in [*workers, waiter]:
+                t.cancel()
+            await asyncio.gather(*workers, waiter, return_exceptions=True)
+            if self.stats.dropped > 0:
+                logger.warning(f"Frontier full, {self.stats.dropped} tweets weren't expanded")
+
+    async def crawl_to_jsonl(self, roots: list[int], path: str) -> CrawlStats:
+        """
+        Streams the conversations of `roots` to `path`, one tweet per line. The file only replaces a previous one
+        once the crawl is over: a retried crawl doesn't add to the tweets of the one it retries.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        part = f"{path}.part"
+        try:
+            with open(part, "w") as f:
+                async with aclosing(self.crawl(roots)) as gen:
+                    async for x in gen:
+                        f.write(tweet_to_json(x))
+                        f.write("\n")
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+        os.replace(part, path)
+        logger.info(f"Conversations of {len(roots)} tweets saved to {path}: {self.stats}")
+        return self.stats
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import zlib
+from typing import AsyncIterator
+
+import aiosqlite
+from httpx import Response
+
+from app.common.logger import get_logger
+from .utils import entry_tweet_ids, utc
+
+logger = get_logger()
+
+# variables that identify what a chain is about, in order of preference
+QUERY_KEYS = ["rawQuery", "userId", "focalTweetId", "tweetId", "listId", "timelineId"]
+
+
+def variables_hash(kv: dict) -> str:
+    kv = {k: v for k, v in kv.items() if k != "cursor"}
+    return hashlib.sha1(json.dumps(kv, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Checkpoint:
+    """
+    State of one `_gql_items` chain. Every page is stored along with the cursor that follows it, so a retried job
+    can replay what it already fetched and continue the chain from its last cursor.
+    """
+
+    def __init__(self, store: "CursorStore", key: str, op: str, query: str, vars_hash: str):
+        self.store = store
+        self.key = key
+        self.op = op
+        self.query = query
+        self.vars_hash = vars_hash
+        self.cursor: str | None = None
+        self.pages: int = 0
+        self.newest_id: int | None = None
+        self.oldest_id: int | None = None
+
+    async def replay(self):
+        async for body in self.store.get_pages(self.key):
+            yield Response(200, content=body)
+
+    async def save_page(self, rep: Response, cur: str | None, els: list[dict]):
+        ids = [twid for x in els for twid in entry_tweet_ids(x)]
+        if ids:
+            self.newest_id = max(ids + ([self.newest_id] if self.newest_id else []))
+            self.oldest_id = min(ids + ([self.oldest_id] if self.oldest_id else []))
+        self.cursor = cur
+        self.pages += 1
+        await self.store.save_page(self, rep.content)
+
+
+class CursorStore:
+    """
+    Local SQLite store of `(operation, query, variables hash) -> last cursor, pages fetched, newest & oldest tweet ID`
+    and the pages themselves (zlib compressed). Meant to be scoped to a single job: a new run with the same variables
+    (e.g. tomorrow's timeline of the same seed) must use another file, otherwise it would replay today's pages.
+    """
+
+    def __init__(self, db_file: str, replay_batch: int = 16):
+        """
+        :param replay_batch: pages read at once when replaying a chain
+        """
+        self._db_file = db_file
+        self.replay_batch = replay_batch
+        # a single connection for the whole job: the store is the job's own file, no other connection waits on it
+        self._db: aiosqlite.Connection | None = None
+
+    async def _conn(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        os.makedirs(os.path.dirname(os.path.abspath(self._db_file)), exist_ok=True)
+        db = await aiosqlite.connect(self._db_file)
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS chains (
+            key TEXT PRIMARY KEY NOT NULL,
+            op TEXT NOT NULL,
+            query TEXT,
+            vars_hash TEXT NOT NULL,
+            cursor TEXT DEFAULT NULL,
+            pages INT DEFAULT 0,
+            newest_id INT DEFAULT NULL,
+            oldest_id INT DEFAULT NULL,
+            updated_at TEXT DEFAULT NULL
+        );""")
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            key TEXT NOT NULL,
+            page INT NOT NULL,
+            body BLOB NOT NULL,
+            PRIMARY KEY (key, page)
+        );""")
+        await db.commit()
+        # chains starting together all get here, the first connection is kept
+        if self._db is None:
+            self._db = db
+        else:
+            await db.close()
+        return self._db
+
+    async def checkpoint(self, op: str, kv: dict) -> Checkpoint:
+        db = await self._conn()
+        queue, vars_hash = op.split("/")[-1], variables_hash(kv)
+        query = next((str(kv[k]) for k in QUERY_KEYS if k in kv), None)
+        ckpt = Checkpoint(self, f"{queue}:{vars_hash}", queue, query, vars_hash)
+
+        qs = "SELECT cursor, pages, newest_id, oldest_id FROM chains WHERE key = :key"
+        async with db.execute(qs, {"key": ckpt.key}) as cur:
+            rs = await cur.fetchone()
+        if rs:
+            ckpt.cursor, ckpt.pages, ckpt.newest_id, ckpt.oldest_id = rs
+            logger.info(f"Resuming {queue} chain for {query} after {ckpt.pages} pages")
+        return ckpt
+
+    async def get_pages(self, key: str) -> AsyncIterator[bytes]:
+        """The pages of a chain in order, `replay_batch` at a time: a long chain is never held in memory."""
+        db = await self._conn()
+        qs = "SELECT page, body FROM pages WHERE key = :key AND page > :after ORDER BY page ASC LIMIT :n"
+        after = 0
+        while True:
+            async with db.execute(qs, {"key": key, "after": after, "n": self.replay_batch}) as cur:
+                rs = await cur.fetchall()
+            for page, body in rs:
+                after = page
+                yield zlib.decompress(body)
+            if len(rs) < self.replay_batch:
+                return
+
+    async def save_page(self, ckpt: Checkpoint, body: bytes):
+        db = await self._conn()
+        await db.execute(
+            "INSERT OR REPLACE INTO pages (key, page, body) VALUES (:key, :page, :body)",
+            {"key": ckpt.key, "page": ckpt.pages, "body": zlib.compress(body)},
+        )
+        await db.execute(
+            """
+            INSERT INTO chains (key, op, query, vars_hash, cursor, pages, newest_id, oldest_id, updated_at)
+            VALUES (:key, :op, :query, :vars_hash, :cursor, :pages, :newest_id, :oldest_id, :updated_at)
+            ON CONFLICT(key) DO UPDATE SET
+                cursor = excluded.cursor,
+                pages = excluded.pages,
+                newest_id = excluded.newest_id,
+                oldest_id = excluded.oldest_id,
+                updated_at = excluded.updated_at
+            """,
+            {
+                "key": ckpt.key, "op": ckpt.op, "query": ckpt.query, "vars_hash": ckpt.vars_hash,
+                "cursor": ckpt.cursor, "pages": ckpt.pages, "newest_id": ckpt.newest_id,
+                "oldest_id": ckpt.oldest_id, "updated_at": utc.now().isoformat(),
+            },
+        )
+        await db.commit()
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def remove(self):
+        if os.path.exists(self._db_file):
+            os.remove(self._db_file)
@@ -1,6 +1,7 @@
 import asyncio
 import random
 import sqlite3
+import weakref
 from collections import defaultdict
 
 import aiosqlite
@@ -10,7 +11,15 @@ from app.common.logger import get_logger
 MIN_SQLITE_VERSION = "3.24"
 
 logger = get_logger()
-_lock = asyncio.Lock()
+# asyncio.Lock binds to the first loop it waits on, and a job runs several loops one after the other
+_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+def _get_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    if loop not in _locks:
+        _locks[loop] = asyncio.Lock()
+    return _locks[loop]
 
 
 def lock_retry(max_retries=10):
@@ -21,7 +30,7 @@ def lock_retry(max_retries=10):
         async def wrapper(*args, **kwargs):
             for i in range(max_retries):
                 try:
-                    async with _lock:
+                    async with _get_lock():
                         return await func(*args, **kwargs)
                 except sqlite3.OperationalError as e:
                     if i == max_retries - 1 or "database is locked" not in str(e):
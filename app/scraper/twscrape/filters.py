@@ -0,0 +1,56 @@
+"""
+Filters of user timelines, on `TweetView`s so that only the kept tweets get parsed: the tweets the user wrote (rather
+than the originals of what it retweeted or quoted, which come along in the responses), its pinned tweet and a date
+window. References are read once per tweet and compared through sets, the window's bounds are parsed once.
+"""
+import functools
+import random
+from datetime import datetime, timezone
+
+from .models import TweetView
+
+
+@functools.lru_cache(maxsize=256)
+def utc_day(day: str) -> datetime:
+    """"%Y-%m-%d" at midnight UTC. Bounds repeat across the pages and the seeds of a run, so they're parsed once."""
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def _referenced(tweets: list[TweetView]) -> tuple[list[tuple[int | None, int | None]], set[int]]:
+    # (retweeted ID, quoted ID) of each tweet, and all of them
+    refs = [(t.retweetedId, t.quotedId) for t in tweets]
+    ids = {x for pair in refs for x in pair}
+    ids.discard(None)
+    return refs, ids
+
+
+def own_tweets(tweets: list[TweetView]) -> list[TweetView]:
+    """The tweets that aren't retweeted or quoted by another one of `tweets`."""
+    _, referenced = _referenced(tweets)
+    return [t for t in tweets if t.id not in referenced]
+
+
+def without_pinned(tweets: list[TweetView]) -> list[TweetView]:
+    """`tweets` without the ones pinned by the author of one of them (picked at random, after the first)."""
+    if len(tweets) < 2:
+        return tweets
+    pinned = set(random.sample(tweets[1:], 1).pop().pinnedIds)
+    return [t for t in tweets if t.id not in pinned]
+
+
+def in_window(tweets: list[TweetView], start: datetime, end: datetime) -> list[TweetView]:
+    """
+    `tweets` without the user's own tweets outside [start, end) and without what these retweet or quote, in a
+    single pass over the references.
+    """
+    refs, referenced = _referenced(tweets)
+    excluded: set[int] = set()
+    for t, (rt, qt) in zip(tweets, refs):
+        if t.id in referenced or start <= t.date < end:
+            continue
+        excluded.add(t.id)
+        if rt is not None:
+            excluded.add(rt)
+        if qt is not None:
+            excluded.add(qt)
+    return [t for t in tweets if t.id not in excluded]
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import struct
+from contextlib import aclosing
+from typing import Iterator, Literal
+
+import aiosqlite
+
+from app.common.logger import get_logger
+from .api import API
+from .db import lock_retry
+
+logger = get_logger()
+
+# nodes.state
+QUEUED, CLAIMED, DONE, FAILED = 0, 1, 2, 3
+
+# an edge is two little-endian uint64: (follower, followed)
+EDGE = struct.Struct("<QQ")
+
+
+def read_edges(path: str, chunk: int = 65_536) -> Iterator[tuple[int, int]]:
+    with open(path, "rb") as f:
+        while buf := f.read(EDGE.size * chunk):
+            yield from EDGE.iter_unpack(buf)
+
+
+class GraphCrawler:
+    """
+    N-hop follower (or following) graph of a set of seeds. The frontier and the visited set are the `nodes` table of
+    an SQLite file and the edges are appended to a binary edge list, so memory doesn't grow with the graph. The file
+    offset of the edges is committed along with each finished user: a crawl interrupted at any point resumes where
+    it stopped when it's started again with the same files. Users that failed are expanded again when it's
+    restarted, up to `max_attempts` times.
+    """
+
+    def __init__(self,
+                 api: API,
+                 db_file: str,
+                 edges_file: str,
+                 direction: Literal["followers", "following", "verified_followers"] = "followers",
+                 hop_limits: list[int] | tuple[int, ...] = (1000,),
+                 concurrency: int = 8,
+                 max_attempts: int = 3):
+        """
+        :param hop_limits: users paged for each user of hop i, there are as many hops as limits
+        :param max_attempts: expansions of a user that fail before it's left out of the graph for good
+        """
+        self.api = api
+        self._db_file = db_file
+        self.edges_file = edges_file
+        self.direction = direction
+        self.hop_limits = list(hop_limits)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+        self._lock = asyncio.Lock()
+        self._progress = asyncio.Condition()
+        self._active = 0
+
+    @lock_retry()
+    async def _init(self, seeds: list[int]):
+        os.makedirs(os.path.dirname(os.path.abspath(self._db_file)), exist_ok=True)
+        async with aiosqlite.connect(self._db_file) as db:
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                uid INTEGER PRIMARY KEY NOT NULL,
+                hop INT NOT NULL,
+                state INT NOT NULL DEFAULT 0,
+                attempts INT NOT NULL DEFAULT 0
+            );""")
+            async with db.execute("PRAGMA table_info(nodes)") as cur:
+                columns = [x[1] for x in await cur.fetchall()]
+            if "attempts" not in columns:  # frontier of a crawl started before failed users were retried
+                await db.execute("ALTER TABLE nodes ADD COLUMN attempts INT NOT NULL DEFAULT 0")
+            await db.execute("CREATE INDEX IF NOT EXISTS nodes_queue ON nodes (state, hop);")
+            await db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY NOT NULL, value INT);")
+            await db.executemany("INSERT OR IGNORE INTO nodes (uid, hop) VALUES (?, 0)", [(x,) for x in seeds])
+            # users claimed by an interrupted crawl start over, the ones that failed too while they have attempts left
+            await db.execute("""
+            UPDATE nodes SET state = :queued
+            WHERE state = :claimed OR (state = :failed AND attempts < :max_attempts)
+            """, {"queued": QUEUED, "claimed": CLAIMED, "failed": FAILED, "max_attempts": self.max_attempts})
+            async with db.execute("SELECT value FROM meta WHERE key = 'edges_offset'") as cur:
+                rs = await cur.fetchone()
+            await db.commit()
+
+        # drop the edges written after the last committed user
+        offset = rs[0] if rs else 0
+        if os.path.exists(self.edges_file) and os.path.getsize(self.edges_file) > offset:
+            logger.info(f"Truncating {self.edges_file} to the last committed edge ({offset // EDGE.size})")
+            os.truncate(self.edges_file, offset)
+
+    @lock_retry()
+    async def _claim(self) -> tuple[int, int] | None:
+        async with aiosqlite.connect(self._db_file) as db:
+            async with db.execute(
+                    "SELECT uid, hop FROM nodes WHERE state = :queued ORDER BY hop LIMIT 1", {"queued": QUEUED}
+            ) as cur:
+                rs = await cur.fetchone()
+            if rs:
+                await db.execute("UPDATE nodes SET state = :claimed WHERE uid = :uid",
+                                 {"claimed": CLAIMED, "uid": rs[0]})
+                await db.commit()
+        return (rs[0], rs[1]) if rs else None
+
+    @lock_retry()
+    async def _commit(self, uid: int, hop: int, neighbours: list[int], offset: int):
+        async with aiosqlite.connect(self._db_file) as db:
+            if hop + 1 < len(self.hop_limits):
+                await db.executemany("INSERT OR IGNORE INTO nodes (uid, hop) VALUES (?, ?)",
+                                     [(x, hop + 1) for x in neighbours])
+            await db.execute("UPDATE nodes SET state = :done WHERE uid = :uid", {"done": DONE, "uid": uid})
+            await db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('edges_offset', :offset)",
+                             {"offset": offset})
+            await db.commit()
+
+    @lock_retry()
+    async def _fail(self, uid: int):
+        async with aiosqlite.connect(self._db_file) as db:
+            await db.execute("UPDATE nodes SET state = :failed, attempts = attempts + 1 WHERE uid = :uid",
+                             {"failed": FAILED, "uid": uid})
+            await db.commit()
+
+    async def _expand(self, uid: int, hop: int):
+        neighbours: list[int] = []
+        try:
+            fn = getattr(self.api, f"{self.direction}_raw")
+            async with aclosing(fn(uid, limit=self.hop_limits[hop])) as gen:
+                async for rep in gen:
+                    neighbours.extend(x.id for x in await self.api._parse_users(rep))
+        except Exception as e:
+            # the pages fetched so far are dropped: the user is expanded whole on its next attempt, or not at all
+            logger.error(f"Failed to get the {self.direction} of {uid}: {type(e)} {e}")
+            await self._fail(uid)
+            return
+
+        edges = [(x, uid) if self.direction != "following" else (uid, x) for x in neighbours]
+        async with self._lock:
+            with open(self.edges_file, "ab") as f:
+                f.write(b"".join(EDGE.pack(*e) for e in edges))
+                offset = f.tell()
+            await self._commit(uid, hop, neighbours, offset)
+
+    async def _worker(self):
+        while True:
+            async with self._progress:
+                while (node := await self._claim()) is None:
+                    if self._active == 0:  # nothing queued and nobody left to queue more
+                        self._progress.notify_all()
+                        return
+                    await self._progress.wait()
+                self._active += 1
+            try:
+                await self._expand(*node)
+            finally:
+                async with self._progress:
+                    self._active -= 1
+                    self._progress.notify_all()
+
+    async def crawl(self, seeds: list[int]) -> dict[str, int]:
+        os.makedirs(os.path.dirname(os.path.abspath(self.edges_file)), exist_ok=True)
+        await self._init([int(x) for x in seeds])
+        await asyncio.gather(*[self._worker() for _ in range(self.concurrency)])
+        return await self.stats()
+
+    @lock_retry()
+    async def stats(self) -> dict[str, int]:
+        async with aiosqlite.connect(self._db_file) as db:
+            async with db.execute("SELECT state, COUNT(*) FROM nodes GROUP BY state") as cur:
+                rs = dict(await cur.fetchall())
+        size = os.path.getsize(self.edges_file) if os.path.exists(self.edges_file) else 0
+        return {
+            "queued": rs.get(QUEUED, 0), "done": rs.get(DONE, 0), "failed": rs.get(FAILED, 0),
+            "edges": size // EDGE.size,
+        }
@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from typing import Any
+
+# where each GraphQL operation keeps its timeline instructions, newest schema first
+INSTRUCTION_PATHS: dict[str, list[tuple[str, ...]]] = {
+    "SearchTimeline": [("data", "search_by_raw_query", "search_timeline", "timeline", "instructions")],
+    "UserTweets": [
+        ("data", "user", "result", "timeline_v2", "timeline", "instructions"),
+        ("data", "user", "result", "timeline", "timeline", "instructions"),
+    ],
+    "UserTweetsAndReplies": [
+        ("data", "user", "result", "timeline_v2", "timeline", "instructions"),
+        ("data", "user", "result", "timeline", "timeline", "instructions"),
+    ],
+    "UserMedia": [
+        ("data", "user", "result", "timeline_v2", "timeline", "instructions"),
+        ("data", "user", "result", "timeline", "timeline", "instructions"),
+    ],
+    "Likes": [
+        ("data", "user", "result", "timeline_v2", "timeline", "instructions"),
+        ("data", "user", "result", "timeline", "timeline", "instructions"),
+    ],
+    "Followers": [("data", "user", "result", "timeline", "timeline", "instructions")],
+    "Following": [("data", "user", "result", "timeline", "timeline", "instructions")],
+    "BlueVerifiedFollowers": [("data", "user", "result", "timeline", "timeline", "instructions")],
+    "UserCreatorSubscriptions": [("data", "user", "result", "timeline", "timeline", "instructions")],
+    "Retweeters": [("data", "retweeters_timeline", "timeline", "instructions")],
+    "Favoriters": [("data", "favoriters_timeline", "timeline", "instructions")],
+    "TweetDetail": [("data", "threaded_conversation_with_injections_v2", "instructions")],
+    "ListLatestTweetsTimeline": [("data", "list", "tweets_timeline", "timeline", "instructions")],
+    "Bookmarks": [("data", "bookmark_timeline_v2", "timeline", "instructions")],
+    "GenericTimelineById": [("data", "timeline", "timeline", "instructions")],
+}
+
+
+@dataclass
+class TimelinePage:
+    entries: list[dict] = field(default_factory=list)
+    cursors: dict[str, str] = field(default_factory=dict)  # cursorType: value, first one seen wins
+
+    def cursor(self, cursor_type: str = "Bottom") -> str | None:
+        return self.cursors.get(cursor_type)
+
+
+def get_instructions(obj: dict, queue: str) -> list[dict] | None:
+    for path in INSTRUCTION_PATHS.get(queue, []):
+        cur: Any = obj
+        for key in path:
+            if not isinstance(cur, dict) or key not in cur:
+                cur = None
+                break
+            cur = cur[key]
+        if isinstance(cur, list):
+            return cur
+    return None
+
+
+def _add_cursor(cursors: dict[str, str], obj: dict | None):
+    if obj and "cursorType" in obj and obj["cursorType"] not in cursors:
+        cursors[obj["cursorType"]] = obj.get("value")
+
+
+def _collect_cursors(cursors: dict[str, str], entry: dict):
+    # cursors sit on the entry content (TimelineTimelineCursor), on an item (e.g. TweetDetail's ShowMoreThreads)
+    # or on the items of a module
+    content = entry.get("content") or entry.get("item") or {}
+    _add_cursor(cursors, content)
+    _add_cursor(cursors, content.get("itemContent"))
+    for x in content.get("items") or []:
+        _add_cursor(cursors, (x.get("item") or {}).get("itemContent"))
+
+
+def extract_page(obj: dict, queue: str) -> TimelinePage | None:
+    """
+    Entries and cursors of a timeline page in a single pass over its instructions. Returns None when the response
+    doesn't follow the known schema of the operation, in which case callers fall back to the generic tree walkers.
+    """
+    instructions = get_instructions(obj, queue)
+    if instructions is None:
+        return None
+
+    page, found_entries = TimelinePage(), False
+    for ins in instructions:
+        if not isinstance(ins, dict):
+            return None
+
+        if "entries" in ins:
+            # same as the generic walker: the entries of the page are the first entries list
+            if not found_entries:
+                page.entries, found_entries = ins["entries"], True
+            for x in ins["entries"]:
+                _collect_cursors(page.cursors, x)
+        if "entry" in ins:  # TimelineReplaceEntry, TimelinePinEntry
+            _collect_cursors(page.cursors, ins["entry"])
+        for x in ins.get("moduleItems") or []:  # TimelineAddToModule
+            _collect_cursors(page.cursors, x)
+
+    return page
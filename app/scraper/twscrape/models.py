@@ -1,24 +1,28 @@
 import email.utils
+import functools
 import json
 import os
-import random
 import re
-import string
 import sys
 import traceback
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Generator, Optional, Union
+from typing import Generator, Iterable, Optional, Union
 
 import httpx
 
 from app.common.logger import get_logger
+from .parse_errors import parse_errors
 from .utils import find_item, get_or, int_or, to_old_rep, utc
 
 logger = get_logger()
 
 
-@dataclass
+# slotted: a run holds hundreds of thousands of these, a __dict__ each would be most of their size
+@dataclass(slots=True)
 class JSONTrait:
     def dict(self):
         return asdict(self)
@@ -27,7 +31,7 @@ class JSONTrait:
         return json.dumps(self.dict(), default=str)
 
 
-@dataclass
+@dataclass(slots=True)
 class Coordinates(JSONTrait):
     longitude: float
     latitude: float
@@ -43,7 +47,7 @@ class Coordinates(JSONTrait):
         return None
 
 
-@dataclass
+@dataclass(slots=True)
 class Place(JSONTrait):
     id: str
     fullName: str
@@ -64,7 +68,7 @@ class Place(JSONTrait):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class TextLink(JSONTrait):
     url: str
     text: str | None
@@ -84,7 +88,7 @@ class TextLink(JSONTrait):
         return tmp
 
 
-@dataclass
+@dataclass(slots=True)
 class UserRef(JSONTrait):
     id: int
     id_str: str
@@ -97,12 +101,12 @@ class UserRef(JSONTrait):
         return UserRef(
             id=int(obj["id_str"]),
             id_str=obj["id_str"],
-            username=obj["screen_name"],
-            displayname=obj["name"],
+            username=_intern(obj["screen_name"]),
+            displayname=_intern(obj["name"]),
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class User(JSONTrait):
     id: int
     id_str: str
@@ -137,10 +141,10 @@ class User(JSONTrait):
         return User(
             id=int(obj["id_str"]),
             id_str=obj["id_str"],
-            url=f'https://x.com/{obj["screen_name"]}',
-            username=obj["screen_name"],
-            displayname=obj["name"],
-            rawDescription=obj["description"],
+            url=_intern(f'https://x.com/{obj["screen_name"]}'),
+            username=_intern(obj["screen_name"]),
+            displayname=_intern(obj["name"]),
+            rawDescription=_intern(obj["description"]),
             created=email.utils.parsedate_to_datetime(obj["created_at"]),
             followersCount=obj["followers_count"],
             friendsCount=obj["friends_count"],
@@ -148,12 +152,12 @@ class User(JSONTrait):
             favouritesCount=obj["favourites_count"],
             listedCount=obj["listed_count"],
             mediaCount=obj["media_count"],
-            location=obj["location"],
-            profileImageUrl=obj["profile_image_url_https"],
-            profileBannerUrl=obj.get("profile_banner_url"),
+            location=_intern(obj["location"]),
+            profileImageUrl=_intern(obj["profile_image_url_https"]),
+            profileBannerUrl=_intern(obj.get("profile_banner_url")),
             verified=obj.get("verified"),
             blue=obj.get("is_blue_verified"),
-            blueType=obj.get("verified_type"),
+            blueType=_intern(obj.get("verified_type")),
             protected=obj.get("protected"),
             descriptionLinks=_parse_links(obj, ["entities.description.urls", "entities.url.urls"]),
             pinnedIds=[int(x) for x in obj.get("pinned_tweet_ids_str", [])],
@@ -171,7 +175,7 @@ class User(JSONTrait):
         return user_dict
 
 
-@dataclass
+@dataclass(slots=True)
 class Tweet(JSONTrait):
     id: int
     id_str: str
@@ -213,22 +217,10 @@ class Tweet(JSONTrait):
 
     @staticmethod
     def parse(obj: dict, res: dict):
-        tw_usr = User.parse(res["users"][obj["user_id_str"]])
+        tw_usr = _parse_user(res["users"][obj["user_id_str"]])
 
-        rt_id_path = [
-            "retweeted_status_id_str",
-            "retweeted_status_result.result.rest_id",
-            "retweeted_status_result.result.tweet.rest_id",
-        ]
-
-        qt_id_path = [
-            "quoted_status_id_str",
-            "quoted_status_result.result.rest_id",
-            "quoted_status_result.result.tweet.rest_id",
-        ]
-
-        rt_obj = get_or(res, f"tweets.{_first(obj, rt_id_path)}")
-        qt_obj = get_or(res, f"tweets.{_first(obj, qt_id_path)}")
+        rt_obj = get_or(res, f"tweets.{_first(obj, _RT_ID_PATH)}")
+        qt_obj = get_or(res, f"tweets.{_first(obj, _QT_ID_PATH)}")
 
         url = f'https://x.com/{tw_usr.username}/status/{obj["id_str"]}'
         doc = Tweet(
@@ -237,7 +229,7 @@ class Tweet(JSONTrait):
             url=url,
             date=email.utils.parsedate_to_datetime(obj["created_at"]),
             user=tw_usr,
-            lang=obj["lang"],
+            lang=_intern(obj["lang"]),
             rawContent=get_or(obj, "note_tweet.note_tweet_results.result.text", obj["full_text"]),
             replyCount=obj["reply_count"],
             retweetCount=obj["retweet_count"],
@@ -246,8 +238,8 @@ class Tweet(JSONTrait):
             bookmarkedCount=get_or(obj, "bookmark_count", 0),
             conversationId=int(obj["conversation_id_str"]),
             conversationIdStr=obj["conversation_id_str"],
-            hashtags=[x["text"] for x in get_or(obj, "entities.hashtags", [])],
-            cashtags=[x["text"] for x in get_or(obj, "entities.symbols", [])],
+            hashtags=[_intern(x["text"]) for x in get_or(obj, "entities.hashtags", [])],
+            cashtags=[_intern(x["text"]) for x in get_or(obj, "entities.symbols", [])],
             mentionedUsers=[UserRef.parse(x) for x in get_or(obj, "entities.user_mentions", [])],
             links=_parse_links(
                 obj, ["entities.urls", "note_tweet.note_tweet_results.result.entity_set.urls"]
@@ -260,7 +252,7 @@ class Tweet(JSONTrait):
             inReplyToTweetId=int_or(obj, "in_reply_to_status_id_str"),
             inReplyToTweetIdStr=get_or(obj, "in_reply_to_status_id_str"),
             inReplyToUser=_get_reply_user(obj, res),
-            source=obj.get("source", None),
+            source=_intern(obj.get("source", None)),
             sourceUrl=_get_source_url(obj),
             sourceLabel=_get_source_label(obj),
             media=Media.parse(obj),
@@ -324,7 +316,160 @@ class Tweet(JSONTrait):
         return tweet_dict
 
 
-@dataclass
+# legacy fields read by User.parse, pinned_tweet_ids_str aside; `url` stands for the links of the profile
+_USER_KEY = (
+    "id_str", "screen_name", "name", "description", "created_at", "followers_count", "friends_count",
+    "statuses_count", "favourites_count", "listed_count", "media_count", "location", "profile_image_url_https",
+    "profile_banner_url", "verified", "is_blue_verified", "verified_type", "protected", "url",
+)
+
+
+class UserInterner:
+    """
+    One `User` per author: the tweets of an author, and the retweeted and quoted tweets of known authors, share an
+    instance rather than each parsing the user again. Users are keyed by the fields `User.parse` reads, so a profile
+    that changes during the run gets a new instance. The least recently used are dropped past `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = 20_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._users: OrderedDict[tuple, User] = OrderedDict()
+
+    def get(self, obj: dict) -> User:
+        key = (*[obj.get(k) for k in _USER_KEY], tuple(obj.get("pinned_tweet_ids_str", ())))
+        user = self._users.get(key)
+        if user is not None:
+            self._users.move_to_end(key)
+            self.hits += 1
+            return user
+
+        user = User.parse(obj)
+        self.misses += 1
+        self._users[key] = user
+        if len(self._users) > self.maxsize:
+            self._users.popitem(last=False)
+        return user
+
+    def __len__(self):
+        return len(self._users)
+
+    def __repr__(self):
+        return f"UserInterner(users={len(self)}, hits={self.hits}, misses={self.misses})"
+
+
+_user_interner: ContextVar[UserInterner | None] = ContextVar("user_interner", default=None)
+
+
+def set_user_interner(interner: UserInterner | None) -> Token:
+    """Tweets parsed from now on in this context (and the tasks it creates) share users through `interner`."""
+    return _user_interner.set(interner)
+
+
+@contextmanager
+def interned_users(maxsize: int = 20_000):
+    interner = UserInterner(maxsize)
+    token = set_user_interner(interner)
+    try:
+        yield interner
+    finally:
+        _user_interner.reset(token)
+
+
+def _parse_user(obj: dict) -> User:
+    interner = _user_interner.get()
+    return interner.get(obj) if interner is not None else User.parse(obj)
+
+
+class TweetView:
+    """
+    A tweet of a response read only as far as filtering needs: IDs, date and author, straight from the raw objects.
+    `tweet()` parses the whole `Tweet` (user, media, card, links...) once it's known to be kept.
+    """
+
+    __slots__ = ("id", "_obj", "_res", "_date")
+
+    def __init__(self, obj: dict, res: dict):
+        self.id: int = int(obj["id_str"])
+        self._obj = obj
+        self._res = res
+        self._date: datetime | None = None
+
+    @property
+    def date(self) -> datetime:
+        if self._date is None:
+            self._date = email.utils.parsedate_to_datetime(self._obj["created_at"])
+        return self._date
+
+    @property
+    def user_id(self) -> int:
+        return int(self._obj["user_id_str"])
+
+    @property
+    def username(self) -> str:
+        return self._res["users"][self._obj["user_id_str"]]["screen_name"]
+
+    @property
+    def pinnedIds(self) -> list[int]:
+        return [int(x) for x in self._res["users"][self._obj["user_id_str"]].get("pinned_tweet_ids_str", [])]
+
+    @property
+    def retweetedId(self) -> int | None:
+        """ID of `Tweet.retweetedTweet`"""
+        return self._ref_id(_RT_ID_PATH)
+
+    @property
+    def quotedId(self) -> int | None:
+        """ID of `Tweet.quotedTweet`"""
+        return self._ref_id(_QT_ID_PATH)
+
+    def _ref_id(self, paths: list[str]) -> int | None:
+        ref = get_or(self._res, f"tweets.{_first(self._obj, paths)}")
+        return int(ref["id_str"]) if ref else None
+
+    def tweet(self) -> Tweet:
+        return Tweet.parse(self._obj, self._res)
+
+    def __repr__(self):
+        return f"TweetView(id={self.id})"
+
+
+class ParsedTweetView(TweetView):
+    """`TweetView` of a tweet parsed already, e.g. by a `ParseExecutor`."""
+
+    __slots__ = ("_tweet",)
+
+    def __init__(self, tweet: Tweet):
+        self.id = tweet.id
+        self._date = tweet.date
+        self._tweet = tweet
+
+    @property
+    def user_id(self) -> int:
+        return self._tweet.user.id
+
+    @property
+    def username(self) -> str:
+        return self._tweet.user.username
+
+    @property
+    def pinnedIds(self) -> list[int]:
+        return self._tweet.user.pinnedIds
+
+    @property
+    def retweetedId(self) -> int | None:
+        return self._tweet.retweetedTweet.id if self._tweet.retweetedTweet else None
+
+    @property
+    def quotedId(self) -> int | None:
+        return self._tweet.quotedTweet.id if self._tweet.quotedTweet else None
+
+    def tweet(self) -> Tweet:
+        return self._tweet
+
+
+@dataclass(slots=True)
 class MediaPhoto(JSONTrait):
     url: str
 
@@ -333,7 +478,7 @@ class MediaPhoto(JSONTrait):
         return MediaPhoto(url=obj["media_url_https"])
 
 
-@dataclass
+@dataclass(slots=True)
 class MediaVideo(JSONTrait):
     thumbnailUrl: str
     variants: list["MediaVideoVariant"]
@@ -357,7 +502,7 @@ class MediaVideo(JSONTrait):
         return mediaVideo_dict
 
 
-@dataclass
+@dataclass(slots=True)
 class MediaAnimated(JSONTrait):
     thumbnailUrl: str
     videoUrl: str
@@ -373,7 +518,7 @@ class MediaAnimated(JSONTrait):
             return None
 
 
-@dataclass
+@dataclass(slots=True)
 class MediaVideoVariant(JSONTrait):
     contentType: str
     bitrate: int
@@ -388,7 +533,7 @@ class MediaVideoVariant(JSONTrait):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Media(JSONTrait):
     photos: list[MediaPhoto] = field(default_factory=list)
     videos: list[MediaVideo] = field(default_factory=list)
@@ -430,12 +575,12 @@ class Media(JSONTrait):
         return media_dict
 
 
-@dataclass
+@dataclass(slots=True)
 class Card(JSONTrait):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class SummaryCard(Card):
     title: str
     description: str
@@ -446,13 +591,13 @@ class SummaryCard(Card):
     _type: str = "summary"
 
 
-@dataclass
+@dataclass(slots=True)
 class PollOption(JSONTrait):
     label: str
     votesCount: int
 
 
-@dataclass
+@dataclass(slots=True)
 class PollCard(Card):
     options: list[PollOption]
     finished: bool
@@ -469,7 +614,7 @@ class PollCard(Card):
         return poll_card_dict
 
 
-@dataclass
+@dataclass(slots=True)
 class BroadcastCard(Card):
     title: str
     url: str
@@ -477,44 +622,44 @@ class BroadcastCard(Card):
     _type: str = "broadcast"
 
 
-@dataclass
+@dataclass(slots=True)
 class AudiospaceCard(Card):
     url: str
     _type: str = "audiospace"
 
 
-@dataclass
+@dataclass(slots=True)
 class RequestParam(JSONTrait):
     key: str
     value: str
 
 
-@dataclass
+@dataclass(slots=True)
 class UrtEndpointOption(JSONTrait):
     requestParams: list[RequestParam]
 
 
-@dataclass
+@dataclass(slots=True)
 class TrendUrl(JSONTrait):
     url: str
     urlType: str
     urlEndpointOptions: list[RequestParam]
 
 
-@dataclass
+@dataclass(slots=True)
 class TrendMetadata(JSONTrait):
     domain_context: str
     meta_description: str
     url: TrendUrl
 
 
-@dataclass
+@dataclass(slots=True)
 class GroupedTrend(JSONTrait):
     name: str
     url: TrendUrl
 
 
-@dataclass
+@dataclass(slots=True)
 class TimelineTrend(JSONTrait):
     id: Optional[str]
     rank: Optional[str | int]
@@ -543,147 +688,124 @@ class TimelineTrend(JSONTrait):
         return d
 
 
-def _parse_card_get_bool(values: list[dict], key: str):
-    for x in values:
-        if x["key"] == key:
-            return x["value"]["boolean_value"]
-    return False
+def _card_values(obj: dict) -> dict[str, dict]:
+    # binding_values is a list of {"key", "value"}, indexed once per card; the first of a repeated key is kept
+    values: dict[str, dict] = {}
+    for x in get_or(obj, "card.legacy.binding_values", []):
+        if x["value"]["type"] != "IMAGE_COLOR":
+            values.setdefault(x["key"], x["value"])
+    return values
 
 
-def _parse_card_get_str(values: list[dict], key: str, defaultVal=None) -> str | None:
-    for x in values:
-        if x["key"] == key:
-            return x["value"]["string_value"]
-    return defaultVal
+def _card_str(values: dict[str, dict], key: str, default=None) -> str | None:
+    val = values.get(key)
+    return val["string_value"] if val is not None else default
 
 
-def _parse_card_extract_str(values: list[dict], key: str):
-    pretenders = [x["value"]["string_value"] for x in values if x["key"] == key]
-    new_values = [x for x in values if x["key"] != key]
-    return pretenders[0] if pretenders else "", new_values
+def _card_largest_photo(values: dict[str, dict]) -> MediaPhoto | None:
+    photos = [x["image_value"] for x in values.values() if x["type"] == "IMAGE"]
+    if not photos:
+        return None
+    return MediaPhoto(url=max(photos, key=lambda x: x["height"])["url"])
 
 
-def _parse_card_extract_title(values: list[dict]):
-    new_values, pretenders = [], []
+def _parse_summary_card(values: dict[str, dict]) -> SummaryCard:
     # title is trimmed to 70 chars, so try to find the longest text in alt_text
-    for x in values:
-        k = x["key"]
-        if k == "title" or k.endswith("_alt_text"):
-            pretenders.append(x["value"]["string_value"])
-        else:
-            new_values.append(x)
-
-    pretenders = sorted(pretenders, key=lambda x: len(x), reverse=True)
-    return pretenders[0] if pretenders else "", new_values
-
-
-def _parse_card_extract_largest_photo(values: list[dict]):
-    photos = [x for x in values if x["value"]["type"] == "IMAGE"]
-    photos = sorted(photos, key=lambda x: x["value"]["image_value"]["height"], reverse=True)
-    values = [x for x in values if x["value"]["type"] != "IMAGE"]
-    if photos:
-        return MediaPhoto(url=photos[0]["value"]["image_value"]["url"]), values
-    else:
-        return None, values
+    titles = [v["string_value"] for k, v in values.items() if k == "title" or k.endswith("_alt_text")]
+    return SummaryCard(
+        title=max(titles, key=len) if titles else "",
+        description=_card_str(values, "description", ""),
+        vanityUrl=_card_str(values, "vanity_url", ""),
+        url=_card_str(values, "card_url", ""),
+        photo=_card_largest_photo(values),
+    )
 
 
-def _parse_card_prepare_values(obj: dict):
-    values = get_or(obj, "card.legacy.binding_values", [])
-    # values = sorted(values, key=lambda x: x["key"])
-    # values = [x for x in values if x["key"] not in {"domain", "creator", "site"}]
-    values = [x for x in values if x["value"]["type"] != "IMAGE_COLOR"]
-    return values
+def _parse_unified_card(values: dict[str, dict]) -> SummaryCard:
+    val = json.loads(values["unified_card"]["string_value"])
 
+    co = get_or(val, "component_objects", {})
+    do = get_or(val, "destination_objects", {})
+    me = list(get_or(val, "media_entities", {}).values())
+    if len(me) > 1:
+        logger.debug(f"[Card] Multiple media entities: {json.dumps(me, indent=2)}")
 
-def _parse_card(obj: dict, url: str):
-    name = get_or(obj, "card.legacy.name", None)
-    if not name:
+    me = me[0] if me else {}
+
+    return SummaryCard(
+        title=get_or(co, "details_1.data.title.content", ""),
+        description=get_or(co, "details_1.data.subtitle.content", ""),
+        vanityUrl=get_or(do, "browser_with_docked_media_1.data.url_data.vanity", ""),
+        url=get_or(do, "browser_with_docked_media_1.data.url_data.url", ""),
+        photo=MediaPhoto.parse(me) if me and me["type"] == "photo" else None,
+        video=MediaVideo.parse(me) if me and me["type"] == "video" else None,
+    )
+
+
+_POLL_CHOICES = [(f"choice{x}_label", f"choice{x}_count") for x in range(1, 21)]
+
+
+def _parse_poll_card(values: dict[str, dict]) -> PollCard:
+    options = []
+    for label_key, count_key in _POLL_CHOICES:
+        label, votes = values.get(label_key), values.get(count_key)
+        if label is None or votes is None:
+            break
+
+        options.append(PollOption(label=label["string_value"], votesCount=int(votes["string_value"])))
+
+    finished = values["counts_are_final"]["boolean_value"] if "counts_are_final" in values else False
+    # duration_minutes = int(_card_str(values, "duration_minutes") or "0")
+    # end_datetime_utc = _card_str(values, "end_datetime_utc")
+    return PollCard(options=options, finished=finished)
+
+
+def _parse_broadcast_card(values: dict[str, dict]) -> BroadcastCard | None:
+    card_url = _card_str(values, "broadcast_url")
+    card_title = _card_str(values, "broadcast_title")
+    if card_url is None or card_title is None:
         return None
 
-    if name in {"summary", "summary_large_image", "player"}:
-        val = _parse_card_prepare_values(obj)
-        title, val = _parse_card_extract_title(val)
-        description, val = _parse_card_extract_str(val, "description")
-        vanity_url, val = _parse_card_extract_str(val, "vanity_url")
-        url, val = _parse_card_extract_str(val, "card_url")
-        photo, val = _parse_card_extract_largest_photo(val)
-
-        return SummaryCard(
-            title=title,
-            description=description,
-            vanityUrl=vanity_url,
-            url=url,
-            photo=photo,
-        )
+    return BroadcastCard(title=card_title, url=card_url, photo=_card_largest_photo(values))
 
-    if name == "unified_card":
-        val = _parse_card_prepare_values(obj)
-        val = [x for x in val if x["key"] == "unified_card"][0]["value"]["string_value"]
-        val = json.loads(val)
-
-        co = get_or(val, "component_objects", {})
-        do = get_or(val, "destination_objects", {})
-        me = list(get_or(val, "media_entities", {}).values())
-        if len(me) > 1:
-            logger.debug(f"[Card] Multiple media entities: {json.dumps(me, indent=2)}")
-
-        me = me[0] if me else {}
-
-        title = get_or(co, "details_1.data.title.content", "")
-        description = get_or(co, "details_1.data.subtitle.content", "")
-        vanity_url = get_or(do, "browser_with_docked_media_1.data.url_data.vanity", "")
-        url = get_or(do, "browser_with_docked_media_1.data.url_data.url", "")
-        video = MediaVideo.parse(me) if me and me["type"] == "video" else None
-        photo = MediaPhoto.parse(me) if me and me["type"] == "photo" else None
-
-        return SummaryCard(
-            title=title,
-            description=description,
-            vanityUrl=vanity_url,
-            url=url,
-            photo=photo,
-            video=video,
-        )
 
-    if re.match(r"poll\d+choice_text_only", name):
-        val = _parse_card_prepare_values(obj)
-
-        options = []
-        for x in range(20):
-            label = _parse_card_get_str(val, f"choice{x + 1}_label")
-            votes = _parse_card_get_str(val, f"choice{x + 1}_count")
-            if label is None or votes is None:
-                break
-
-            options.append(PollOption(label=label, votesCount=int(votes)))
-
-        finished = _parse_card_get_bool(val, "counts_are_final")
-        # duration_minutes = int(_parse_card_get_str(val, "duration_minutes") or "0")
-        # end_datetime_utc = _parse_card_get_str(val, "end_datetime_utc")
-        # print(json.dumps(val, indent=2))
-        return PollCard(options=options, finished=finished)
-
-    if name == "745291183405076480:broadcast":
-        val = _parse_card_prepare_values(obj)
-        card_url = _parse_card_get_str(val, "broadcast_url")
-        card_title = _parse_card_get_str(val, "broadcast_title")
-        photo, _ = _parse_card_extract_largest_photo(val)
-        if card_url is None or card_title is None:
-            return None
+def _parse_audiospace_card(values: dict[str, dict]) -> AudiospaceCard | None:
+    # no more data in this object, possible extra api call needed to get card info
+    card_url = _card_str(values, "card_url")
+    if card_url is None:
+        return None
 
-        return BroadcastCard(title=card_title, url=card_url, photo=photo)
+    return AudiospaceCard(url=card_url)
 
-    if name == "3691233323:audiospace":
-        # no more data in this object, possible extra api call needed to get card info
-        val = _parse_card_prepare_values(obj)
-        card_url = _parse_card_get_str(val, "card_url")
-        if card_url is None:
-            return None
 
-        # print(json.dumps(val, indent=2))
-        return AudiospaceCard(url=card_url)
+# card name -> parser of its values; poll names (poll2choice_text_only...) are added as they're met
+_CARD_PARSERS = {
+    "summary": _parse_summary_card,
+    "summary_large_image": _parse_summary_card,
+    "player": _parse_summary_card,
+    "unified_card": _parse_unified_card,
+    "745291183405076480:broadcast": _parse_broadcast_card,
+    "3691233323:audiospace": _parse_audiospace_card,
+}
+
+# unknown card types met by the process and how many times, the first of each is logged
+unknown_cards: Counter[str] = Counter()
+
+
+def _parse_card(obj: dict, url: str):
+    name = get_or(obj, "card.legacy.name", None)
+    if not name:
+        return None
+
+    parser = _CARD_PARSERS.get(name)
+    if parser is None and _POLL_CARD_RE.match(name):
+        parser = _CARD_PARSERS[name] = _parse_poll_card
+    if parser is not None:
+        return parser(_card_values(obj))
 
-    logger.warning(f"Unknown card type '{name}' on {url}")
+    unknown_cards[name] += 1
+    if unknown_cards[name] == 1:
+        logger.warning(f"Unknown card type '{name}' on {url}, counted from now on")
     if "PYTEST_CURRENT_TEST" in os.environ:  # help debugging tests
         print(f"Unknown card type '{name}' on {url}", file=sys.stderr)
         # print(json.dumps(obj["card"]["legacy"], indent=2))
@@ -692,6 +814,27 @@ def _parse_card(obj: dict, url: str):
 
 # internal helpers
 
+_RT_ID_PATH = [
+    "retweeted_status_id_str",
+    "retweeted_status_result.result.rest_id",
+    "retweeted_status_result.result.tweet.rest_id",
+]
+
+_QT_ID_PATH = [
+    "quoted_status_id_str",
+    "quoted_status_result.result.rest_id",
+    "quoted_status_result.result.tweet.rest_id",
+]
+
+_SOURCE_URL_RE = re.compile(r'href=[\'"]?([^\'" >]+)')
+_SOURCE_LABEL_RE = re.compile(r">([^<]*)<")
+_POLL_CARD_RE = re.compile(r"poll\d+choice_text_only")
+
+
+def _intern(x: str | None) -> str | None:
+    # usernames, languages, sources... repeat across the tweets of a run, one copy of each is enough
+    return sys.intern(x) if x is not None else None
+
 
 def _get_reply_user(tw_obj: dict, res: dict):
     user_id = tw_obj.get("in_reply_to_user_id_str", None)
@@ -710,18 +853,22 @@ def _get_reply_user(tw_obj: dict, res: dict):
     return None
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_source(source: str) -> tuple[str | None, str | None]:
+    # a run sees a handful of distinct sources ("Twitter Web App", "Twitter for iPhone"...), each is parsed once
+    url = match.group(1) if (match := _SOURCE_URL_RE.search(source)) else None
+    label = match.group(1) if (match := _SOURCE_LABEL_RE.search(source)) else None
+    return _intern(url), _intern(label)
+
+
 def _get_source_url(tw_obj: dict):
     source = tw_obj.get("source", None)
-    if source and (match := re.search(r'href=[\'"]?([^\'" >]+)', source)):
-        return str(match.group(1))
-    return None
+    return _parse_source(source)[0] if source else None
 
 
 def _get_source_label(tw_obj: dict):
     source = tw_obj.get("source", None)
-    if source and (match := re.search(r">([^<]*)<", source)):
-        return str(match.group(1))
-    return None
+    return _parse_source(source)[1] if source else None
 
 
 def _parse_links(obj: dict, paths: list[str]):
@@ -752,24 +899,6 @@ def _get_views(obj: dict, rt_obj: dict):
     return None
 
 
-def _write_dump(kind: str, e: Exception, x: dict, obj: dict):
-    uniq = "".join(random.choice(string.ascii_lowercase) for _ in range(5))
-    time = utc.now().strftime("%Y-%m-%d_%H-%M-%S")
-    dumpfile = f"/tmp/twscrape/twscrape_parse_error_{time}_{uniq}.txt"
-    os.makedirs(os.path.dirname(dumpfile), exist_ok=True)
-
-    with open(dumpfile, "w") as fp:
-        msg = [
-            f"Error parsing {kind}. Error: {type(e)}",
-            traceback.format_exc(),
-            json.dumps(x, default=str),
-            json.dumps(obj, default=str),
-        ]
-        fp.write("\n\n".join(msg))
-
-    logger.error(f"Failed to parse response of {kind}, writing dump to {dumpfile}")
-
-
 def _parse_items(rep: httpx.Response, kind: str, limit: int = -1):
     if kind == "user":
         Cls, key = User, "users"
@@ -798,7 +927,7 @@ def _parse_items(rep: httpx.Response, kind: str, limit: int = -1):
                 ids.add(tmp.id)
                 yield tmp
         except Exception as e:
-            _write_dump(kind, e, x, obj)
+            parse_errors.record(kind, e, x)
             continue
 
 
@@ -809,6 +938,38 @@ def parse_tweets(rep: httpx.Response, limit: int = -1) -> Generator[Tweet, None,
     return _parse_items(rep, "tweet", limit)  # type: ignore
 
 
+def parse_tweet_views(rep: httpx.Response, record_errors: bool = True) -> Generator[TweetView, None, None]:
+    """
+    `parse_tweets` that only parses the tweets as far as `TweetView` reads them.
+    :param record_errors: False for the checks that read a page besides its main parse, a failure is recorded once
+    """
+    res = rep if isinstance(rep, dict) else rep.json()
+    obj = to_old_rep(res)
+
+    ids = set()
+    for x in obj["tweets"].values():
+        try:
+            view = TweetView(x, obj)
+            # Tweet.parse fails without the author
+            if view.id not in ids and x["user_id_str"] in obj["users"]:
+                ids.add(view.id)
+                yield view
+        except Exception as e:
+            if record_errors:
+                parse_errors.record("tweet", e, x)
+            continue
+
+
+def materialize(views: Iterable[TweetView]) -> Generator[Tweet, None, None]:
+    """The `Tweet` of each view, the ones that fail to parse are recorded and skipped like in `parse_tweets`."""
+    for x in views:
+        try:
+            yield x.tweet()
+        except Exception as e:
+            parse_errors.record("tweet", e, x._obj)
+            continue
+
+
 def parse_users(rep: httpx.Response, limit: int = -1) -> Generator[User, None, None]:
     return _parse_items(rep, "user", limit)  # type: ignore
 
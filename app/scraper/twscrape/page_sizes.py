@@ -0,0 +1,38 @@
+import json
+import os
+
+from app.common.logger import get_logger
+from .utils import utc
+
+logger = get_logger()
+
+
+class PageSizes:
+    """
+    `count` sent by each GraphQL operation, i.e. how many entries a page holds. Requests, and so the account budget,
+    scale with 1 / count. Values are either set by hand or found by `API.calibrate_page_sizes` and kept in a JSON
+    file: {operation: {"count": int, "calibrated_at": str}}.
+    """
+
+    def __init__(self, path: str | None = None, sizes: dict[str, int] | None = None):
+        self.path = path
+        self._sizes: dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self._sizes = json.load(f)
+        for queue, count in (sizes or {}).items():
+            self._sizes[queue] = {"count": count, "calibrated_at": None}
+
+    def get(self, queue: str, default: int) -> int:
+        return self._sizes[queue]["count"] if queue in self._sizes else default
+
+    def set(self, queue: str, count: int):
+        self._sizes[queue] = {"count": count, "calibrated_at": utc.now().isoformat()}
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "w") as f:
+                json.dump(self._sizes, f, indent=2)
+        logger.info(f"Page size of {queue} set to {count}")
+
+    def __repr__(self):
+        return f"PageSizes({ {k: v['count'] for k, v in self._sizes.items()} })"
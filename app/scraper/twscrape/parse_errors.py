@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import traceback
+from dataclasses import dataclass
+
+from app.common.logger import get_logger
+from .utils import utc
+
+logger = get_logger()
+
+
+@dataclass
+class ParseError:
+    kind: str
+    error: str
+    location: str
+    count: int = 0
+    message: str = ""
+    traceback: str = ""
+    item: str = ""  # JSON of the first failing item, cut to `max_sample_bytes`
+
+
+class ParseErrors:
+    """
+    Parse failures of the process grouped by signature: the kind of item, the exception type and where it was raised.
+    A change of schema on X's side fails the same way on every item, so a signature keeps a count and the first item
+    only, and is logged at its 1st, 10th, 100th... occurrence. Nothing is written while parsing, `flush` writes the
+    samples within `max_bytes`.
+    """
+
+    def __init__(self, max_signatures: int = 100, max_sample_bytes: int = 64 * 1024, max_bytes: int = 2 * 2 ** 20):
+        self.max_signatures = max_signatures
+        self.max_sample_bytes = max_sample_bytes
+        self.max_bytes = max_bytes
+        self.reset()
+
+    def reset(self):
+        self._errors: dict[tuple[str, str, str], ParseError] = {}
+        self.dropped = 0  # failures of signatures past `max_signatures`, counted only
+
+    @property
+    def total(self) -> int:
+        return sum(x.count for x in self._errors.values()) + self.dropped
+
+    def record(self, kind: str, e: Exception, item: dict):
+        """Called from the `except` of the failed item."""
+        frame = traceback.extract_tb(e.__traceback__)[-1] if e.__traceback__ else None
+        location = f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}" if frame else "?"
+        key = (kind, type(e).__name__, location)
+
+        err = self._errors.get(key)
+        if err is None:
+            if len(self._errors) >= self.max_signatures:
+                self.dropped += 1
+                return
+            err = self._errors[key] = ParseError(kind=kind, error=key[1], location=location, message=str(e)[:500],
+                                                 traceback=traceback.format_exc(),
+                                                 item=json.dumps(item, default=str)[:self.max_sample_bytes])
+        err.count += 1
+
+        # 1, 10, 100...
+        if str(err.count).rstrip("0") == "1":
+            logger.error(f"Failed to parse {kind} ({err.count} times so far): {err.error} at {location}: {err.message}")
+
+    def merge(self, errors: list[ParseError], dropped: int = 0):
+        """Adds the failures recorded by another process, see `drain`."""
+        self.dropped += dropped
+        for x in errors:
+            key = (x.kind, x.error, x.location)
+            if key in self._errors:
+                self._errors[key].count += x.count
+            elif len(self._errors) < self.max_signatures:
+                self._errors[key] = x
+            else:
+                self.dropped += x.count
+
+    def drain(self) -> tuple[list[ParseError], int]:
+        errors, dropped = list(self._errors.values()), self.dropped
+        self.reset()
+        return errors, dropped
+
+    def summary(self) -> dict:
+        """What goes into the job's meta-data: counts by signature, most frequent first."""
+        errors = sorted(self._errors.values(), key=lambda x: x.count, reverse=True)
+        return {
+            "total": self.total,
+            "dropped": self.dropped,
+            "signatures": [
+                {"kind": x.kind, "error": x.error, "location": x.location, "count": x.count, "message": x.message}
+                for x in errors
+            ],
+        }
+
+    async def flush(self, path: str | None = None) -> str | None:
+        """Writes the summary and the samples to `path` (overwritten), off the event loop. Nothing when no failure."""
+        if self.total == 0:
+            return None
+        samples, size = [], 0
+        for x in sorted(self._errors.values(), key=lambda x: x.count, reverse=True):
+            if size + len(x.traceback) + len(x.item) <= self.max_bytes:
+                size += len(x.traceback) + len(x.item)
+                samples.append({"kind": x.kind, "error": x.error, "location": x.location, "traceback": x.traceback,
+                                "item": x.item})
+        doc = {**self.summary(), "samples": samples}
+
+        path = path or f"/tmp/twscrape/twscrape_parse_errors_{utc.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+        await asyncio.to_thread(_write_json, path, doc)
+        logger.warning(f"{doc['total']} items failed to parse ({len(self._errors)} signatures), "
+                       f"{len(samples)} samples in {path}")
+        return path
+
+
+def _write_json(path: str, doc: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+
+
+# the process' failures; workers of a ParseExecutor send theirs back with the parsed items
+parse_errors = ParseErrors()
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from httpx import Response
+
+from app.common.logger import get_logger
+from .models import ParsedTweetView, Tweet, TweetView, User, UserInterner, parse_tweet_views, parse_tweets, \
+    parse_users, set_user_interner, unknown_cards
+from .parse_errors import ParseError, parse_errors
+
+logger = get_logger()
+
+
+_PARSERS = {"tweet": parse_tweets, "user": parse_users}
+
+
+# run in the workers: the body of the response in, the parsed models out (slotted dataclasses, so they pickle small)
+# along with the failures and the unknown cards, merged into the ones of the main process
+
+def _init_worker():
+    # a worker lives as long as the pool, i.e. the run
+    set_user_interner(UserInterner())
+
+
+def _parse(kind: str, content: bytes, limit: int) -> tuple[list, list[ParseError], int, dict[str, int]]:
+    items = list(_PARSERS[kind](json.loads(content), limit))
+    cards = dict(unknown_cards)
+    unknown_cards.clear()
+    return items, *parse_errors.drain(), cards
+
+
+def _call(fn: Callable[[dict], Any], content: bytes) -> Any:
+    return fn(json.loads(content))
+
+
+class ParseExecutor:
+    """
+    Parses responses in a pool of processes so that the event loop, which drives the requests of every account,
+    only awaits the result. Pages smaller than `min_bytes` are parsed inline: shipping them costs more than parsing.
+    The pool is started with the first large page and can be shared by several `API`s.
+    """
+
+    def __init__(self, workers: int | None = None, min_bytes: int = 32 * 1024):
+        """
+        :param workers: processes of the pool, the number of CPUs by default
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.min_bytes = min_bytes
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and its threads isn't safe
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker)
+            logger.info(f"Parse executor started with {self.workers} workers")
+        return self._pool
+
+    async def _run(self, kind: str, rep: Response, limit: int) -> list:
+        if len(rep.content) < self.min_bytes:
+            return list(_PARSERS[kind](rep.json(), limit))
+        try:
+            items, errors, dropped, cards = await asyncio.get_running_loop().run_in_executor(
+                self._get_pool(), _parse, kind, rep.content, limit
+            )
+        except BrokenProcessPool as e:
+            # a worker died (e.g. killed for its memory), start a new pool for the next pages
+            logger.error(f"Parse executor broken, parsing inline: {type(e)} {e}")
+            self._pool = None
+            return list(_PARSERS[kind](rep.json(), limit))
+        parse_errors.merge(errors, dropped)
+        unknown_cards.update(cards)
+        return items
+
+    async def tweets(self, rep: Response, limit: int = -1) -> list[Tweet]:
+        return await self._run("tweet", rep, limit)
+
+    async def users(self, rep: Response, limit: int = -1) -> list[User]:
+        return await self._run("user", rep, limit)
+
+    async def call(self, fn: Callable[[dict], Any], rep: Response) -> Any:
+        """
+        `fn(rep.json())`, in the pool for large pages: the checks that read a page besides its main parse (page log,
+        stopping condition). `fn` must pickle (a module-level function or a `functools.partial` of one) and record
+        no parse failure, the main parse of the page does.
+        """
+        if len(rep.content) < self.min_bytes:
+            return fn(rep.json())
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), _call, fn, rep.content)
+        except BrokenProcessPool as e:
+            logger.error(f"Parse executor broken, parsing inline: {type(e)} {e}")
+            self._pool = None
+            return fn(rep.json())
+
+    async def tweet_views(self, rep: Response) -> list[TweetView]:
+        """
+        `parse_tweet_views`. Tweets of large pages come back parsed, filtering them is then free and `tweet()` just
+        returns them.
+        """
+        if len(rep.content) < self.min_bytes:
+            return list(parse_tweet_views(rep.json()))
+        return [ParsedTweetView(x) for x in await self.tweets(rep)]
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def __repr__(self):
+        return f"ParseExecutor(workers={self.workers}, min_bytes={self.min_bytes})"
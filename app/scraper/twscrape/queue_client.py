@@ -3,7 +3,6 @@ import os
 from typing import Any
 import numpy as np
 import datetime
-import random
 
 import httpx
 from httpx import AsyncClient, Response
@@ -18,7 +17,9 @@ ReqParams = dict[str, str | int] | None
 TMP_TS = utc.now().isoformat().split(".")[0].replace("T", "_").replace(":", "-")[0:16]
 
 # added by mika_jpd
-from .models import parse_tweets, parse_tweet, parse_users, parse_user
+from .filters import own_tweets, without_pinned
+from .models import parse_tweet_views, parse_tweets, parse_tweet, parse_users, parse_user
+from .parse_executor import ParseExecutor
 
 logger = get_logger()
 
@@ -74,9 +75,30 @@ def dump_rep(rep: Response):
         f.write(txt)
 
 
+def page_summary(res: dict) -> tuple[int, str, str, str] | None:
+    """The tweets of a timeline page for its log line: how many the user wrote, between which dates and by whom."""
+    tweets = list(parse_tweet_views(res, record_errors=False))
+    if len(tweets) == 0:
+        return None
+    # remove the original quoted and RT tweets, then the pinned tweet
+    tweets = without_pinned(own_tweets(tweets))
+
+    # fetch the dates and users
+    dates = [i.date for i in tweets]
+    users = [i.username for i in tweets]
+
+    # fetch some stats
+    min_date = min(dates).strftime("%d/%m/%Y-%H:%M:%S")
+    max_date = max(dates).strftime("%d/%m/%Y-%H:%M:%S")
+    top_user_values, top_user_count = np.unique(users, return_counts=True)
+    top_users = "".join([f"{v} ({c}) " for v, c in zip(top_user_values, top_user_count)]).rstrip()
+    return len(tweets), min_date, max_date, top_users
+
+
 class QueueClient:
     def __init__(self, pool: AccountsPool, queue: str, debug=False, proxy: str | None = None, use_case: int = None,
-                 _num_calls_before_humanization: tuple[int, int] = (15, 30)):
+                 _num_calls_before_humanization: tuple[int, int] = (15, 30),
+                 parse_executor: ParseExecutor | None = None):
         self.pool = pool
         self.queue = queue
         self.debug = debug
@@ -86,6 +108,8 @@ class QueueClient:
         # added by mika_jpd
         self.use_case = use_case
         self._num_calls_before_humanization: tuple[int, int] = _num_calls_before_humanization
+        # the page log reads large pages in the pool of the API's parser, off the event loop
+        self.parse_executor: ParseExecutor | None = parse_executor
 
     async def __aenter__(self):
         await self._get_ctx()  # Todo: double check if this is actually good.
@@ -188,28 +212,12 @@ class QueueClient:
         try:
             if self.queue in ['SearchTimeline', 'UserTweets',
                               'UserTweetsAndReplies'] and rep.status_code == 200:  # parse tweets
-                tweets = [i for i in parse_tweets(rep, -1)]
-                if len(tweets) > 0:
-                    # remove the original quoted and RT tweets
-                    rt_tweets = [t.retweetedTweet.id for t in tweets if t.retweetedTweet]
-                    qt_tweets = [t.quotedTweet.id for t in tweets if t.quotedTweet]
-                    tweets = [t for t in tweets if (t.id not in rt_tweets) and (t.id not in qt_tweets)]
-
-                    # remove pinned tweet
-                    if len(tweets) > 1:
-                        pinned_tweets = random.sample(tweets[1:], 1).pop().user.pinnedIds
-                        tweets = [t for t in tweets if t.id not in pinned_tweets]
-
-                    # fetch the dates and users
-                    dates = [i.date for i in tweets]
-                    users = [i.user.username for i in tweets]
-
-                    # fetch some stats
-                    total_tweets = len(tweets)
-                    min_date = min(dates).strftime("%d/%m/%Y-%H:%M:%S")
-                    max_date = max(dates).strftime("%d/%m/%Y-%H:%M:%S")
-                    top_user_values, top_user_count = np.unique(users, return_counts=True)
-                    top_users = "".join([f"{v} ({c}) " for v, c in zip(top_user_values, top_user_count)]).rstrip()
+                if self.parse_executor is not None:
+                    summary = await self.parse_executor.call(page_summary, rep)
+                else:
+                    summary = page_summary(res)
+                if summary is not None:
+                    total_tweets, min_date, max_date, top_users = summary
             elif self.queue in ["UserByScreenName"] and rep.status_code == 200:
                 user = parse_user(rep)
                 user_id = user.id_str
@@ -0,0 +1,148 @@
+"""
+JSON of the models written straight from their attributes: the same text as `json.dumps(x.dict())`, without the
+`asdict` copies, the `str()` of every value and the intermediate dicts. What to write for each field is decided once,
+at import.
+"""
+import json
+from dataclasses import asdict, fields
+from datetime import datetime
+from json.encoder import encode_basestring_ascii
+from typing import Callable
+
+from .models import Media, MediaAnimated, MediaPhoto, MediaVideo, MediaVideoVariant, Place, TextLink, Tweet, User, \
+    UserRef
+
+# what json.dumps uses for strings with ensure_ascii (its default), the C version when available
+_str: Callable[[str], str] = encode_basestring_ascii
+
+
+def _key(name: str) -> str:
+    return _str(name) + ": "
+
+
+def _value(v) -> str:
+    if v is None:
+        return "null"
+    if v is True:
+        return "true"
+    if v is False:
+        return "false"
+    if type(v) is str:
+        return _str(v)
+    if type(v) is int:
+        return int.__repr__(v)
+    return json.dumps(v)
+
+
+def _as_str(v) -> str:
+    # `{k: str(v) for k, v in asdict(self).items()}`, scalars
+    return _str(str(v))
+
+
+def _as_str_asdict(v) -> str:
+    # same, for a dataclass attribute: asdict made it a dict before str()
+    return _str(str(asdict(v) if v is not None else v))
+
+
+def _flat(cls) -> Callable[[object], str]:
+    """`asdict` of a dataclass whose attributes are all scalars."""
+    plan = [(f.name, _key(f.name)) for f in fields(cls)]
+
+    def encode(obj) -> str:
+        return "{" + ", ".join([k + _value(getattr(obj, name)) for name, k in plan]) + "}"
+
+    return encode
+
+
+def _list(fn: Callable[[object], str]) -> Callable[[list], str]:
+    return lambda xs: "[" + ", ".join([fn(x) for x in xs]) + "]"
+
+
+def _or_empty(fn: Callable[[object], str]) -> Callable[[object], str]:
+    return lambda x: fn(x) if x is not None else "{}"
+
+
+def _plan(cls, encoders: dict[str, Callable | None]) -> list[tuple[str, str, Callable | None]]:
+    return [(f.name, _key(f.name), encoders.get(f.name, _as_str)) for f in fields(cls)]
+
+
+def _encode(obj, plan: list[tuple[str, str, Callable]]) -> str:
+    return "{" + ", ".join([k + enc(getattr(obj, name)) for name, k, enc in plan]) + "}"
+
+
+_text_link = _flat(TextLink)
+_user_ref = _flat(UserRef)
+_place = _flat(Place)
+_photo = _flat(MediaPhoto)
+_animated = _flat(MediaAnimated)
+
+_VIDEO = _plan(MediaVideo, {"variants": _list(_flat(MediaVideoVariant))})
+_USER = _plan(User, {"descriptionLinks": _list(_text_link)})
+_MEDIA_KEYS = (_key("photos"), _key("videos"), _key("animated"))
+
+
+def _media(m: Media) -> str:
+    return "{" + ", ".join([
+        _MEDIA_KEYS[0] + "[" + ", ".join([_photo(x) for x in m.photos]) + "]",
+        _MEDIA_KEYS[1] + "[" + ", ".join([_encode(x, _VIDEO) for x in m.videos]) + "]",
+        _MEDIA_KEYS[2] + "[" + ", ".join([_animated(x) for x in m.animated]) + "]",
+    ]) + "}"
+
+
+def _user(u: User) -> str:
+    return _encode(u, _USER)
+
+
+# None: retweetedTweet & quotedTweet, written by _tweet to pass date_scrape along
+_TWEET = _plan(Tweet, {
+    "user": _or_empty(_user),
+    "retweetedTweet": None,
+    "quotedTweet": None,
+    "media": _or_empty(_media),
+    "hashtags": _list(_str),
+    "cashtags": _list(_str),
+    "mentionedUsers": _list(_user_ref),
+    "links": _list(_text_link),
+    "inReplyToUser": _or_empty(_user_ref),
+    "place": _or_empty(_place),
+    "coordinates": _as_str_asdict,
+    "card": _as_str_asdict,
+})
+_DATE_SCRAPE = _key("date_scrape")
+
+
+def _tweet(tw: Tweet, date_scrape: str) -> str:
+    parts = []
+    for name, k, enc in _TWEET:
+        v = getattr(tw, name)
+        if enc is not None:
+            parts.append(k + enc(v))
+        else:
+            parts.append(k + (_tweet(v, date_scrape) if v is not None else "{}"))
+    parts.append(_DATE_SCRAPE + date_scrape)
+    return "{" + ", ".join(parts) + "}"
+
+
+DATE_SCRAPE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def scrape_date() -> str:
+    """
+    The `date_scrape` of tweets scraped now, on the clock `Tweet.dict()` uses. Taken once for what is written
+    together: the JSON lines, the Parquet rows and the headers of the new format all carry the same value.
+    """
+    return datetime.now().strftime(DATE_SCRAPE_FORMAT)
+
+
+def tweet_to_json(tweet: Tweet, date_scrape: str | None = None) -> str:
+    """
+    `json.dumps(tweet.dict())`, ASCII only like json.dumps' default.
+    :param date_scrape: `DATE_SCRAPE_FORMAT`, now by default; also used for the retweeted and quoted tweets
+    """
+    date_scrape = date_scrape or scrape_date()
+    return _tweet(tweet, _str(date_scrape))
+
+
+def user_to_json(user: User) -> str:
+    """`json.dumps(user.dict())`"""
+    return _user(user)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+import aiosqlite
+
+from app.common.logger import get_logger
+from .api import API
+from .db import lock_retry
+from .models import parse_user
+from .utils import utc
+
+logger = get_logger()
+
+# sqlite's default limit of host parameters is 999
+_CHUNK = 500
+
+
+class UserCache:
+    """
+    Persistent profile cache, keyed by handle (lowercase) and indexed by ID. Users that don't exist or are suspended
+    are cached too (`data` is None) so they aren't looked up again on every run.
+    """
+
+    def __init__(self, db_file: str):
+        self._db_file = db_file
+        self._ready = False
+
+    async def _init(self):
+        if self._ready:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self._db_file)), exist_ok=True)
+        async with aiosqlite.connect(self._db_file) as db:
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                handle TEXT PRIMARY KEY NOT NULL,
+                id INT DEFAULT NULL,
+                data TEXT DEFAULT NULL,
+                fetched_at TEXT NOT NULL
+            );""")
+            await db.execute("CREATE INDEX IF NOT EXISTS users_id ON users (id);")
+            await db.commit()
+        self._ready = True
+
+    async def _get_many(self, column: str, keys: list) -> dict:
+        await self._init()
+        res = {}
+        async with aiosqlite.connect(self._db_file) as db:
+            db.row_factory = aiosqlite.Row
+            for i in range(0, len(keys), _CHUNK):
+                chunk = keys[i:i + _CHUNK]
+                qs = f"SELECT * FROM users WHERE {column} IN ({','.join('?' * len(chunk))})"
+                async with db.execute(qs, chunk) as cur:
+                    for rs in await cur.fetchall():
+                        res[rs[column]] = (
+                            json.loads(rs["data"]) if rs["data"] else None, utc.from_iso(rs["fetched_at"])
+                        )
+        return res
+
+    @lock_retry()
+    async def get_by_handles(self, handles: list[str]) -> dict[str, tuple[dict | None, datetime]]:
+        return await self._get_many("handle", [h.lower() for h in handles])
+
+    @lock_retry()
+    async def get_by_ids(self, ids: list[int]) -> dict[int, tuple[dict | None, datetime]]:
+        return await self._get_many("id", [int(x) for x in ids])
+
+    @lock_retry()
+    async def put_many(self, users: list[tuple[str, dict | None]], fetched_at: datetime | None = None):
+        await self._init()
+        fetched_at = (fetched_at or utc.now()).replace(tzinfo=None).isoformat()
+        rows = [
+            (h.lower(), int(data["id"]) if data else None, json.dumps(data, default=str) if data else None, fetched_at)
+            for h, data in users
+        ]
+        async with aiosqlite.connect(self._db_file) as db:
+            await db.executemany(
+                "INSERT OR REPLACE INTO users (handle, id, data, fetched_at) VALUES (?, ?, ?, ?)", rows
+            )
+            await db.commit()
+
+
+class UserResolver:
+    """
+    Handle and ID lookups through the cache first. What is missing or expired is fetched concurrently, each request
+    going through its own account of the pool, and written back in one transaction.
+    """
+
+    def __init__(self,
+                 api: API,
+                 cache: UserCache | str,
+                 ttl: timedelta = timedelta(days=90),
+                 negative_ttl: timedelta = timedelta(days=7),
+                 concurrency: int = 8):
+        self.api = api
+        self.cache = UserCache(cache) if isinstance(cache, str) else cache
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency
+
+    def _is_fresh(self, data: dict | None, fetched_at: datetime) -> bool:
+        return utc.now() - fetched_at < (self.ttl if data else self.negative_ttl)
+
+    async def cached(self, handles: list[str]) -> dict[str, dict | None]:
+        """Fresh cache entries only, by lowercase handle; a None value is a user known to be missing."""
+        rs = await self.cache.get_by_handles(handles)
+        return {h: data for h, (data, fetched_at) in rs.items() if self._is_fresh(data, fetched_at)}
+
+    async def prime(self, users: list[tuple[str, dict | None]], fetched_at: datetime | None = None):
+        """Seed the cache from another source, e.g. a dump of profiles."""
+        await self.cache.put_many(users, fetched_at=fetched_at)
+
+    async def _fetch(self, keys: list, fn) -> dict:
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def one(key):
+            async with sem:
+                rep = await fn(key)
+            # no response means the request failed, unlike a response without a user (missing or suspended)
+            return key, rep is not None, parse_user(rep) if rep is not None else None
+
+        return {key: (ok, user) for key, ok, user in await asyncio.gather(*[one(k) for k in keys])}
+
+    async def resolve_handles(self, handles: list[str]) -> dict[str, dict | None]:
+        """User of each handle (lowercase) as `User.dict()`, None when it doesn't exist or is suspended."""
+        handles = list(dict.fromkeys(h.lower() for h in handles))
+        rs = await self.cache.get_by_handles(handles)
+        res = {h: data for h, (data, fetched_at) in rs.items() if self._is_fresh(data, fetched_at)}
+
+        todo = [h for h in handles if h not in res]
+        if len(todo) > 0:
+            logger.info(f"Resolving {len(todo)} handles ({len(res)} cached)")
+            fetched = await self._fetch(todo, self.api.user_by_login_raw)
+            resolved: list[tuple[str, dict | None]] = []
+            for h, (ok, user) in fetched.items():
+                if ok:
+                    resolved.append((h, json.loads(user.json()) if user else None))
+                elif h in rs:  # keep serving the expired entry
+                    res[h] = rs[h][0]
+            await self.cache.put_many(resolved)
+            res.update(resolved)
+        return res
+
+    async def resolve_ids(self, ids: list[int]) -> dict[int, dict | None]:
+        """User of each ID as `User.dict()`, None when it doesn't exist or is suspended."""
+        ids = list(dict.fromkeys(int(x) for x in ids))
+        rs = await self.cache.get_by_ids(ids)
+        res = {uid: data for uid, (data, fetched_at) in rs.items() if self._is_fresh(data, fetched_at)}
+
+        todo = [uid for uid in ids if uid not in res]
+        if len(todo) > 0:
+            logger.info(f"Resolving {len(todo)} user IDs ({len(res)} cached)")
+            fetched = await self._fetch(todo, self.api.user_by_id_raw)
+            resolved: list[tuple[str, dict | None]] = []
+            for uid, (ok, user) in fetched.items():
+                if ok and user:
+                    data = json.loads(user.json())
+                    resolved.append((user.username, data))
+                    res[uid] = data
+                elif ok:
+                    res[uid] = None  # the handle is unknown, nothing to key a negative entry on
+                elif uid in rs:
+                    res[uid] = rs[uid][0]
+            await self.cache.put_many(resolved)
+        return res
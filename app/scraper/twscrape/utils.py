@@ -1,12 +1,16 @@
 import base64
 import json
 import os
+import re
 from collections import defaultdict
 from datetime import datetime, timezone
 from typing import Any, AsyncGenerator, Callable, TypeVar
 
 T = TypeVar("T")
 
+TWEET_ENTRY_ID = re.compile(r"tweet-(\d+)$")
+TWITTER_EPOCH_MS = 1288834974657
+
 
 class utc:
     @staticmethod
@@ -134,23 +138,73 @@ def to_old_obj(obj: dict):
     }
 
 
+# keys whose values never hold a Tweet, User or trend: entities, media details, card values, profile settings...
+_PLAIN_KEYS = frozenset((
+    "hashtags", "symbols", "urls", "user_mentions", "timestamps", "note_tweet", "place", "edit_control", "views",
+    "unmention_data", "ext_media_availability", "media_availability", "original_info", "sizes", "features",
+    "video_info", "binding_values", "professional", "verification_info", "highlights_info", "tipjar_settings",
+    "legacy_extended_profile", "clientEventInfo", "feedbackInfo",
+))
+_PLAIN_USER_KEYS = _PLAIN_KEYS | {"legacy"}
+
+
 def to_old_rep(obj: dict) -> dict[str, dict]:
-    tmp = get_typed_object(obj, defaultdict(list))
+    """
+    Tweets and users of a response by ID (as `to_old_obj`), trends by name. Same result as collecting them with
+    `get_typed_object`, in one iterative pass that skips `_PLAIN_KEYS`, the `legacy` of users and lists of scalars
+    (lists of a response are homogeneous), and that merges `legacy` once per ID rather than once per occurrence.
+    """
+    tw1, tw2, users, trends = {}, {}, {}, {}
+    stack = [obj]
+    while stack:
+        x = stack.pop()
+        obj_type = x.get("__typename")
+        skip = _PLAIN_KEYS
+        if obj_type == "Tweet":
+            if "legacy" in x:
+                tw1[str(x["rest_id"])] = x
+        elif obj_type == "TweetWithVisibilityResults":
+            # https://github.com/vladkens/twscrape/issues/53
+            if "legacy" in x["tweet"]:
+                tw2[str(x["tweet"]["rest_id"])] = x["tweet"]
+        elif obj_type == "User":
+            if "legacy" in x and "id" in x:
+                users[str(x["rest_id"])] = x
+            skip = _PLAIN_USER_KEYS
+        elif obj_type == "TimelineTrend":
+            trends[x["name"]] = x
+
+        # depth-first with the children in order, so the last occurrence of an ID wins as it did
+        children = [v for k, v in x.items() if (type(v) is dict or type(v) is list) and k not in skip]
+        for v in reversed(children):
+            if type(v) is dict:
+                stack.append(v)
+            elif v and type(v[0]) is dict:
+                stack.extend(reversed(v))
+
+    return {
+        "tweets": {k: to_old_obj(v) for k, v in {**tw1, **tw2}.items()},
+        "users": {k: to_old_obj(v) for k, v in users.items()},
+        "trends": trends,
+    }
+
 
-    tw1 = [x for x in tmp.get("Tweet", []) if "legacy" in x]
-    tw1 = {str(x["rest_id"]): to_old_obj(x) for x in tw1}
+def entry_tweet_ids(entry: dict) -> list[int]:
+    # "tweet-<id>" entries and the items of conversation modules ("profile-conversation-<x>-tweet-<id>")
+    ids = []
+    for item in [entry, *((entry.get("content") or {}).get("items") or [])]:
+        if m := TWEET_ENTRY_ID.search(item.get("entryId", "")):
+            ids.append(int(m.group(1)))
+    return ids
 
-    # https://github.com/vladkens/twscrape/issues/53
-    tw2 = [x["tweet"] for x in tmp.get("TweetWithVisibilityResults", []) if "legacy" in x["tweet"]]
-    tw2 = {str(x["rest_id"]): to_old_obj(x) for x in tw2}
 
-    users = [x for x in tmp.get("User", []) if "legacy" in x and "id" in x]
-    users = {str(x["rest_id"]): to_old_obj(x) for x in users}
+# tweet IDs are snowflakes, their top bits are a timestamp in ms since the twitter epoch
+def snowflake_to_datetime(twid: int) -> datetime:
+    return datetime.fromtimestamp(((twid >> 22) + TWITTER_EPOCH_MS) / 1000, tz=timezone.utc)
 
-    trends = [x for x in tmp.get("TimelineTrend", [])]
-    trends = {x["name"]: x for x in trends}
 
-    return {"tweets": {**tw1, **tw2}, "users": users, "trends": trends}
+def datetime_to_snowflake(dt: datetime) -> int:
+    return max(int(dt.timestamp() * 1000) - TWITTER_EPOCH_MS, 0) << 22
 
 
 def print_table(rows: list[dict], hr_after=False):
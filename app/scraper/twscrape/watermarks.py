@@ -0,0 +1,91 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import aiosqlite
+
+from app.common.logger import get_logger
+from .db import lock_retry
+from .utils import datetime_to_snowflake, entry_tweet_ids, utc
+
+logger = get_logger()
+
+
+@dataclass
+class Watermark:
+    seed: str
+    newest_id: int
+    newest_date: datetime
+
+    def bound(self, overlap: timedelta) -> int:
+        """Lowest tweet ID worth fetching again: anything older was collected by a previous run."""
+        return datetime_to_snowflake(self.newest_date - overlap)
+
+
+def page_crossed_watermark(els: list[dict], bound: int) -> bool:
+    # a conversation module is as recent as its newest item (the seed's reply), not the tweet it replies to
+    oldest = [max(ids) for x in els if (ids := entry_tweet_ids(x))]
+    return len(oldest) > 0 and min(oldest) < bound
+
+
+class WatermarkStore:
+    """
+    Persistent per-seed record of the newest tweet already collected. Unlike the cursor checkpoints it outlives jobs:
+    the next run of the same seed stops paging its timeline once a page reaches tweets older than the watermark.
+    """
+
+    def __init__(self, db_file: str):
+        self._db_file = db_file
+        self._ready = False
+
+    async def _init(self):
+        if self._ready:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self._db_file)), exist_ok=True)
+        async with aiosqlite.connect(self._db_file) as db:
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                seed TEXT PRIMARY KEY NOT NULL,
+                newest_id INT NOT NULL,
+                newest_date TEXT NOT NULL,
+                updated_at TEXT DEFAULT NULL
+            );""")
+            await db.commit()
+        self._ready = True
+
+    @lock_retry()
+    async def get(self, seed: str) -> Watermark | None:
+        await self._init()
+        async with aiosqlite.connect(self._db_file) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM watermarks WHERE seed = :seed", {"seed": seed}) as cur:
+                rs = await cur.fetchone()
+        if not rs:
+            return None
+        return Watermark(seed=rs["seed"], newest_id=rs["newest_id"], newest_date=utc.from_iso(rs["newest_date"]))
+
+    @lock_retry()
+    async def update(self, seed: str, newest_id: int, newest_date: datetime):
+        # never move a watermark backwards, e.g. when re-scraping an older window
+        await self._init()
+        qs = """
+        INSERT INTO watermarks (seed, newest_id, newest_date, updated_at)
+        VALUES (:seed, :newest_id, :newest_date, :updated_at)
+        ON CONFLICT(seed) DO UPDATE SET
+            newest_id = excluded.newest_id,
+            newest_date = excluded.newest_date,
+            updated_at = excluded.updated_at
+        WHERE excluded.newest_id > watermarks.newest_id
+        """
+        params = {
+            "seed": seed,
+            "newest_id": newest_id,
+            "newest_date": newest_date.astimezone(utc.now().tzinfo).replace(tzinfo=None).isoformat(),
+            "updated_at": utc.now().isoformat(),
+        }
+        async with aiosqlite.connect(self._db_file) as db:
+            async with db.execute(qs, params) as cur:
+                moved = cur.rowcount > 0
+            await db.commit()
+        if moved:
+            logger.debug(f"Watermark of seed {seed} moved to {newest_id} ({newest_date})")
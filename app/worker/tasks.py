@@ -1,24 +1,33 @@
 import traceback
 import uuid
 
-from app.scraper.TwitterScraper import TwitterScraper
+from app.scraper.TwitterScraper import TwitterScraper, output_path
 from app.scraper.my_utils.meo_api.get_seeds import get_seeds
 from app.scraper.my_utils.seed_manipulation.seeds import sort_seeds
-from app.scraper.twscrape.models import Tweet, parse_tweets
-from app.common.logger import setup_logging, get_logger, logger
+from app.scraper.my_utils.seed_manipulation.query_packing import load_tweets_per_day, pack_seeds, packed_search_query
+from app.scraper.my_utils.seed_manipulation.seed_lists import load_seed_lists, assign_seeds_to_lists
+from app.scraper.twscrape.api import API
+from app.scraper.twscrape.filters import own_tweets, utc_day, without_pinned
+from app.scraper.twscrape.models import TweetView, parse_tweet_views
+from app.scraper.twscrape.parse_executor import ParseExecutor
+from app.scraper.twscrape.user_resolver import UserResolver
+from app.scraper.my_utils.upload_to_s3.uploader import S3Uploader
+from app.common.logger import setup_logging, get_logger, logger, get_current_job_id
 from app.scraper.my_utils.dates import bin_and_tuple_date_range
-from app.scraper.my_utils.queryModels import SearchQuery, TimelineQuery, ExploreQuery, SearchExploreQuery
-from app.common.models.scraper_models import ConfigModel
+from app.scraper.my_utils.queryModels import SearchQuery, TimelineQuery, ExploreQuery, SearchExploreQuery, \
+    PackedSearchQuery, ListTimelineQuery
+from app.common.models.scraper_models import ConfigModel, QueryPacking
 from app.common.utils import get_project_root
 from app.common.queues import scraper_queue, account_queue
 
-from rq import Retry
+from rq import Retry, get_current_job
 from dateutil import tz
 from rq.queue import Queue
 
 import asyncio
 from dotenv import load_dotenv
 import datetime
+import functools
 import os
 import json
 import random
@@ -26,18 +35,13 @@ from typing import Callable, Optional
 
 
 def date_stopping_condition(res, min_date) -> bool:
-    min_date = datetime.datetime.strptime(min_date, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
-    tweets: list[Tweet] = [t for t in parse_tweets(res)]
+    min_date = utc_day(min_date)
     # remove original retweet/quote tweets by the same user
-    rt_tweets = [t.retweetedTweet.id for t in tweets if t.retweetedTweet]
-    qt_tweets = [t.quotedTweet.id for t in tweets if t.quotedTweet]
-
-    tweets = [t for t in tweets if (t.id not in rt_tweets) and (t.id not in qt_tweets)]
+    tweets: list[TweetView] = own_tweets(list(parse_tweet_views(res, record_errors=False)))
 
     # remove the pinned tweet
     if len(tweets) > 1:
-        pinned_tweets = random.sample(tweets[1:], 1).pop().user.pinnedIds
-        tweets = [t for t in tweets if t.id not in pinned_tweets]
+        tweets = without_pinned(tweets)
 
         # filter tweets by date
         tweets = [t for t in tweets if t.date < min_date]
@@ -49,14 +53,143 @@ def date_stopping_condition(res, min_date) -> bool:
         return False
 
 
+async def resolve_seed_handles(handles: list[str],
+                               path_handle_to_user_information_dir: str,
+                               resolver: UserResolver) -> dict[str, dict | None]:
+    """
+    Users of the handles (lowercase), None for the ones that don't exist. Looked up in the cache, then in the
+    handle_to_user_information dump and finally on X, whatever X resolves is written back to the dump.
+    """
+    logger = get_logger()
+    users: dict[str, dict | None] = await resolver.cached(handles)
+
+    imported: list[tuple[str, dict | None]] = []
+    for handle in handles:
+        full_path = os.path.join(path_handle_to_user_information_dir, f"{handle}.json")
+        if handle.lower() in users or not os.path.exists(full_path):
+            continue
+        with open(full_path, "r") as f:
+            tw_user_info = json.load(f)
+        if "id_str" in tw_user_info:
+            imported.append((handle, tw_user_info))
+        elif "Not found" in tw_user_info.values():
+            imported.append((handle, None))
+        else:
+            logger.warning(f"Parsing error while parsing handle {handle} with json\n{tw_user_info}")
+    await resolver.prime(imported)
+    users.update((h.lower(), data) for h, data in imported)
+
+    missing: list[str] = [h for h in handles if h.lower() not in users]
+    if len(missing) > 0:
+        resolved: dict[str, dict | None] = await resolver.resolve_handles(missing)
+        for handle in missing:
+            if handle.lower() not in resolved:  # the request failed, try again next run
+                continue
+            data = resolved[handle.lower()]
+            with open(os.path.join(path_handle_to_user_information_dir, f"{handle}.json"), "w") as f:
+                json.dump(data if data else {handle: "Not found"}, f)
+            users[handle.lower()] = data
+    return users
+
+
+def generate_packed_search_queries(handles: list[dict],
+                                   home_dir: str,
+                                   path_output_data: str,
+                                   start_date: str,
+                                   end_date: str,
+                                   date_ranges: list[tuple[str, str]],
+                                   query_packing: QueryPacking) -> list[PackedSearchQuery]:
+    logger = get_logger()
+    tweets_per_day = load_tweets_per_day(os.path.join(home_dir, "scraper", "my_utils", "seed_manipulation"))
+    seeds: dict[str, dict] = {
+        h["Handle"]: {
+            "seed_info": h,
+            "path": os.path.join(path_output_data,
+                                 f"{h['ID']}_"
+                                 f"{h['SeedID']}_"
+                                 f"{h['Collection'].replace('_', '-')}_"
+                                 f"{h['Handle'].replace('_', '-')}_"
+                                 f"{start_date}_{end_date}"
+                                 f".jsonl")
+        } for h in handles
+    }
+
+    queries = []
+    for start, end in date_ranges:
+        days = (datetime.datetime.strptime(end, "%Y-%m-%d") - datetime.datetime.strptime(start, "%Y-%m-%d")).days
+        groups = pack_seeds(handles,
+                            tweets_per_day=tweets_per_day,
+                            days=max(days, 1),
+                            page_size=query_packing.page_size,
+                            max_pages=query_packing.max_pages,
+                            max_query_length=query_packing.max_query_length)
+        logger.info(f"Packed {len(handles)} seeds into {len(groups)} search queries for {start} --> {end}")
+        for g in groups:
+            queries.append(
+                PackedSearchQuery(
+                    query=packed_search_query([h["Handle"] for h in g], start=start, end=end),
+                    seeds=[seeds[h["Handle"]] for h in g],
+                    start_date=start_date,
+                    end_date=end_date
+                )
+            )
+    return queries
+
+
+def generate_list_timeline_queries(handles: list[dict],
+                                   handle_to_id: dict[str, str],
+                                   home_dir: str,
+                                   path_output_data: str,
+                                   start_date: str,
+                                   end_date: str) -> list[ListTimelineQuery | TimelineQuery]:
+    logger = get_logger()
+    seeds: dict[int, dict] = {
+        int(handle_to_id[h["Handle"]]): {
+            "seed_info": h,
+            "user_id": int(handle_to_id[h["Handle"]]),
+            "path": os.path.join(path_output_data,
+                                 f"{h['ID']}_"
+                                 f"{h['SeedID']}_"
+                                 f"{h['Collection'].replace('_', '-')}_"
+                                 f"{h['Handle'].replace('_', '-')}_"
+                                 f"{start_date}_{end_date}"
+                                 f".jsonl")
+        } for h in handles
+    }
+    seed_lists = load_seed_lists(os.path.join(home_dir, "scraper", "my_utils", "seed_manipulation"))
+    covered, uncovered = assign_seeds_to_lists(list(seeds.keys()), seed_lists)
+    logger.info(f"{len(seeds) - len(uncovered)} seeds served by {len(covered)} lists, "
+                f"{len(uncovered)} seeds fall back to their own timeline")
+
+    queries: list[ListTimelineQuery | TimelineQuery] = [
+        ListTimelineQuery(query=int(list_id),
+                          seeds=[seeds[uid] for uid in members],
+                          start_date=start_date,
+                          end_date=end_date)
+        for list_id, members in covered.items()
+    ]
+    for uid in uncovered:
+        queries.append(
+            TimelineQuery(query=uid,
+                          path=seeds[uid]["path"],
+                          seed_info=seeds[uid]["seed_info"],
+                          start_date=start_date,
+                          end_date=end_date,
+                          stopping_condition=functools.partial(date_stopping_condition, min_date=start_date))
+        )
+    return queries
+
+
 def generate_queries(seed_query: str,
                      scrape_method: str,
                      home_dir: str,
                      path_output_data: str,
                      start_date: Optional[str],
                      end_date: Optional[str],
-                     date_ranges: list[tuple[str, str]]
-                     ) -> list[SearchQuery | TimelineQuery]:
+                     date_ranges: list[tuple[str, str]],
+                     query_packing: Optional[QueryPacking] = None,
+                     resolver: Optional[UserResolver] = None
+                     ) -> list[SearchQuery | TimelineQuery | PackedSearchQuery | ListTimelineQuery]:
     logger = get_logger()
     handles = get_seeds(
         username=os.getenv('MEO_USERNAME'),
@@ -65,36 +198,67 @@ def generate_queries(seed_query: str,
     )
     handles = sort_seeds(handles, path_setup=os.path.join(home_dir, "scraper", "my_utils", "seed_manipulation"))
 
+    # low-volume seeds share their searches
+    if scrape_method == "search" and query_packing is not None and query_packing.enabled:
+        return generate_packed_search_queries(handles=handles,
+                                              home_dir=home_dir,
+                                              path_output_data=path_output_data,
+                                              start_date=start_date,
+                                              end_date=end_date,
+                                              date_ranges=date_ranges,
+                                              query_packing=query_packing)
+
     # TODO: TEMPORARY REFERENCE TO LOCAL twitter_handle.json -> user files !
     handle_to_id = {}
     not_found: list[str] = []
-    if scrape_method == "timeline":
+    if scrape_method in ("timeline", "list_timeline"):
         path_handle_to_user_information_dir = os.path.join(home_dir,
                                                            "scraper",
                                                            "my_utils",
                                                            "seed_manipulation",
                                                            "handle_to_user_information")
         warning_msg: Optional[str] = None
-        for h in handles:
-            handle = h["Handle"]
-            full_path = os.path.join(path_handle_to_user_information_dir, f"{handle}.json")
-            if os.path.exists(full_path):
-                tw_user_info = json.load(open(full_path, "r"))
-                if "id_str" in tw_user_info:
-                    handle_to_id[handle] = tw_user_info["id_str"]
-                elif "Not found" in tw_user_info.values():
+        if resolver is not None:
+            users: dict[str, dict | None] = asyncio.run(
+                resolve_seed_handles([h["Handle"] for h in handles], path_handle_to_user_information_dir, resolver)
+            )
+            for h in handles:
+                handle = h["Handle"]
+                if users.get(handle.lower()):
+                    handle_to_id[handle] = users[handle.lower()]["id_str"]
+                elif handle.lower() in users:
                     not_found.append(handle)
                 else:
-                    warning_msg: str = f"Parsing error while parsing handle {handle} with json\n{tw_user_info}"
-            else:
-                warning_msg: str = f"Unable to find the user info for handle {handle} in {path_handle_to_user_information_dir}"
-            # send warning if there
-            if warning_msg:
-                logger.warning(warning_msg)
+                    logger.warning(f"Unable to resolve handle {handle}")
+        else:
+            for h in handles:
+                handle = h["Handle"]
+                full_path = os.path.join(path_handle_to_user_information_dir, f"{handle}.json")
+                if os.path.exists(full_path):
+                    tw_user_info = json.load(open(full_path, "r"))
+                    if "id_str" in tw_user_info:
+                        handle_to_id[handle] = tw_user_info["id_str"]
+                    elif "Not found" in tw_user_info.values():
+                        not_found.append(handle)
+                    else:
+                        warning_msg: str = f"Parsing error while parsing handle {handle} with json\n{tw_user_info}"
+                else:
+                    warning_msg: str = f"Unable to find the user info for handle {handle} in {path_handle_to_user_information_dir}"
+                # send warning if there
+                if warning_msg:
+                    logger.warning(warning_msg)
         logger.warning(f"{len(not_found)} users weren't found: {not_found}")
         # TODO: tell account for this !
         handles = [h for h in handles if h["Handle"] in handle_to_id.keys()]
 
+    if scrape_method == "list_timeline":
+        return generate_list_timeline_queries(handles=handles,
+                                              handle_to_id=handle_to_id,
+                                              home_dir=home_dir,
+                                              path_output_data=path_output_data,
+                                              start_date=start_date,
+                                              end_date=end_date)
+
     queries = []
     for h in handles:
         if scrape_method == "timeline":
@@ -111,7 +275,7 @@ def generate_queries(seed_query: str,
                  "seed_info": h,
                  "start_date": start_date,
                  "end_date": end_date,
-                 "stopping_condition": lambda x: date_stopping_condition(x, start_date)
+                 "stopping_condition": functools.partial(date_stopping_condition, min_date=start_date)
                  }
             )
         elif scrape_method == "search":
@@ -189,6 +353,15 @@ def scrape_twitter_(config: ConfigModel) -> dict:
     path_logs = os.path.join(path_output, 'logs')
     path_output_data = os.path.join(path_output, data_dir)
 
+    # cursor checkpoints are scoped to the job so that a retry resumes its chains but the next run starts fresh
+    job_id: Optional[str] = get_current_job_id()
+    path_checkpoints: Optional[str] = os.path.join(path_output, "checkpoints", f"{job_id}.db") if job_id else None
+    # watermarks outlive jobs: they record what previous runs already collected for each seed
+    path_watermarks: Optional[str] = os.path.join(get_project_root(), "db", "watermarks.db") \
+        if config.watermarks.enabled and scrape_method in ("timeline", "list_timeline") else None
+    # raw pages of every run, appended to, to parse them again without scraping (cli.py reparse)
+    path_archive: Optional[str] = os.path.join(path_output, "archive") if config.archive.enabled else None
+
     path_log_for_this_run = os.path.join(path_logs,
                                          f'logs_{data_dir_name}_{datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.log')
 
@@ -207,6 +380,14 @@ def scrape_twitter_(config: ConfigModel) -> dict:
     logger.info(f"\t- path_logs: {path_log_for_this_run}")
     logger.info(f"\t- path_browser: {path_browser}")
     logger.info(f'\t- path_db: {os.path.join(get_project_root(), "db/accounts.db")}')
+    logger.info(f"\t- path_checkpoints: {path_checkpoints}")
+    logger.info(f"\t- path_watermarks: {path_watermarks} (overlap {config.watermarks.overlap_hours}h)")
+    logger.info(f"\t- query_packing: {config.query_packing}")
+    logger.info(f"\t- parse_offload: {config.parse_offload}")
+    logger.info(f"\t- path_archive: {path_archive}")
+    logger.info(f"\t- output_format: {config.output_format}")
+    logger.info(f"\t- streaming: {config.streaming}")
+    logger.info(f"\t- uploads: {config.uploads}")
     if seed_query:
         logger.info(f"Seed query for this run: {seed_query}")
     else:
@@ -223,7 +404,21 @@ def scrape_twitter_(config: ConfigModel) -> dict:
         path_db=os.path.join(os.path.join(get_project_root(), "db", "accounts.db")),
         headless=True,
         use_case=use_case,
-        path_browser=path_browser
+        path_browser=path_browser,
+        path_checkpoints=path_checkpoints,
+        path_watermarks=path_watermarks,
+        path_archive=path_archive,
+        watermark_overlap=datetime.timedelta(hours=config.watermarks.overlap_hours),
+        parse_executor=ParseExecutor(
+            workers=config.parse_offload.workers,
+            min_bytes=config.parse_offload.min_page_kib * 1024
+        ) if config.parse_offload.enabled else None,
+        uploader=S3Uploader(
+            workers=config.uploads.workers,
+            max_pending=config.uploads.max_pending,
+            multipart_mib=config.uploads.multipart_mib,
+            retries=config.uploads.retries
+        )
     )
 
     # get custom or generated queries
@@ -236,8 +431,20 @@ def scrape_twitter_(config: ConfigModel) -> dict:
             path_output_data=path_output_data,
             start_date=start_date,
             end_date=end_date,
-            date_ranges=date_ranges
+            date_ranges=date_ranges,
+            query_packing=config.query_packing,
+            resolver=UserResolver(
+                api=API(pool=os.path.join(get_project_root(), "db", "accounts.db"), use_case=use_case),
+                cache=os.path.join(get_project_root(), "db", "users.db"),
+                ttl=datetime.timedelta(days=config.user_resolution.ttl_days),
+                negative_ttl=datetime.timedelta(days=config.user_resolution.negative_ttl_days),
+                concurrency=config.user_resolution.concurrency
+            ) if config.user_resolution.enabled else None
         )
+        for q in queries:
+            q.output_format = config.output_format
+            if isinstance(q, (SearchQuery, TimelineQuery)):
+                q.streaming = config.streaming
     else:
         queries: list[SearchQuery | TimelineQuery | ExploreQuery | SearchExploreQuery] = []
         for q in config.custom_queries:
@@ -252,7 +459,9 @@ def scrape_twitter_(config: ConfigModel) -> dict:
                         update_phh_history=q.update_phh_history,
                         bool_upload_to_s3=q.bool_upload_to_s3,
                         bool_change_to_new_format=q.bool_change_to_new_format,
-                        force_collection=q.force_collection
+                        force_collection=q.force_collection,
+                        output_format=q.output_format or config.output_format,
+                        streaming=config.streaming
                     )
                 )
             elif scrape_method == "explore":
@@ -268,7 +477,8 @@ def scrape_twitter_(config: ConfigModel) -> dict:
                     SearchExploreQuery(
                         query=q.query,
                         path=os.path.join(path_output_data, q.filename),
-                        bool_upload_to_s3=q.bool_upload_to_s3
+                        bool_upload_to_s3=q.bool_upload_to_s3,
+                        streaming=config.streaming
                     )
                 )
             else:  # scrape_method is timeline
@@ -279,16 +489,22 @@ def scrape_twitter_(config: ConfigModel) -> dict:
                         seed_info=q.seed_info,
                         start_date=q.start_date,
                         end_date=q.end_date,
-                        stopping_condition=lambda x: date_stopping_condition(x, start_date),
+                        stopping_condition=functools.partial(date_stopping_condition, min_date=start_date),
                         update_phh_history=True,
                         bool_upload_to_s3=True,
                         bool_change_to_new_format=True,
-                        force_collection=False
+                        force_collection=False,
+                        output_format=q.output_format or config.output_format,
+                        streaming=config.streaming
                     )
                 )
-    # filter out the queries
+    # filter out the queries whose output is already there
     queries: list[dict] = [q.to_dict() for q in queries]
-    queries: list[dict] = [i for i in queries if not os.path.exists(i["path"])]
+    queries: list[dict] = [
+        i for i in queries
+        if not (all(os.path.exists(output_path(s["path"], i.get("output_format", "jsonl"))) for s in i["seeds"])
+                if "seeds" in i else os.path.exists(output_path(i["path"], i.get("output_format", "jsonl"))))
+    ]
     if config.limit.queries > 0:
         queries: list[dict] = random.sample(queries, config.limit.queries)
 
@@ -298,6 +514,18 @@ def scrape_twitter_(config: ConfigModel) -> dict:
                 queries=queries
             )
         )
+    elif scrape_method == "list_timeline":
+        scrape_meta_data: dict = asyncio.run(
+            scraper.list_timeline_scrape(
+                queries=queries
+            )
+        )
+    elif scrape_method == "search" and seed_query and config.query_packing.enabled:
+        scrape_meta_data: dict = asyncio.run(
+            scraper.packed_search_queries_scrape(
+                queries=queries
+            )
+        )
     elif scrape_method == "search":
         scrape_meta_data: dict = asyncio.run(
             scraper.search_queries_scrape(
@@ -318,6 +546,9 @@ def scrape_twitter_(config: ConfigModel) -> dict:
         )
     else:
         raise ValueError(f"Scrape method must either be timeline or search !")
+    if scraper.api.parse_executor is not None:
+        scraper.api.parse_executor.shutdown()
+    scraper.uploader.shutdown()
     results: Optional[list[dict]] = None
     if scrape_method == "explore":
         results = scrape_meta_data["scraping_results"]
@@ -332,9 +563,28 @@ def scrape_twitter_(config: ConfigModel) -> dict:
     logger.info(f"Total scraped queries: {total_scraped_queries}")
     logger.info(f"Start time: {start_time}")
     logger.info(f"End time: {end_time}")
+    if scrape_meta_data["parse_errors"]["total"] > 0:
+        logger.warning(f"Parse failures: {scrape_meta_data['parse_errors']['total']} "
+                       f"(samples in {scrape_meta_data['parse_errors_file']})")
+        for x in scrape_meta_data["parse_errors"]["signatures"]:
+            logger.warning(f"\t- {x['count']} x {x['kind']}: {x['error']} at {x['location']}")
+    if uploads := scrape_meta_data.get("uploads"):
+        logger.info(f"Uploaded {uploads['uploaded']} files ({uploads['bytes'] / 2 ** 20:.1f} MiB) to S3")
+        for x in uploads["failed"]:
+            logger.error(f"\t- upload failed: {x['path']}: {x['error']}")
+    if scrape_meta_data["unknown_cards"]:
+        logger.warning(f"Unknown card types (not parsed): {scrape_meta_data['unknown_cards']}")
+    # shown with the job's status by the API
+    if (job := get_current_job()) is not None:
+        job.meta["parse_errors"] = scrape_meta_data["parse_errors"]
+        job.save_meta()
     logger.info(f"Post scraping accounts:")
     msg: str = "".join(f"\n\t- {username}: active {active}" for username, active in post_scraping_accounts.items())
     logger.info(msg)
+
+    # every chain completed and its output is on disk, nothing left to resume
+    if scraper.api.cursor_store is not None:
+        scraper.api.cursor_store.remove()
     if scrape_method == "explore":
         return {"scrape_meta_data": scrape_meta_data, "scraping_results": results}
     return scrape_meta_data
@@ -530,7 +780,9 @@ def run_scraper_daily(scrape_meta_data: dict):
             "limit": {"accounts": 25, "browsers": 6},
             "seed_query": query,
             "use_case": 0,
-            "scrape_method": "timeline"
+            "scrape_method": "timeline",
+            "watermarks": {"enabled": True},
+            "user_resolution": {"enabled": True}
         }
         config: ConfigModel = ConfigModel(**config)
 
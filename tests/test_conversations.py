@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.scraper.twscrape.conversations import ConversationCrawler
+from app.scraper.twscrape.models import parse_tweets
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+class FakeAPI:
+    """A TweetDetail chain of one page for any tweet, parsed through `_parse_tweets` like `API` does."""
+
+    def __init__(self, page: dict):
+        self.page = page
+        self.parsed = 0
+
+    async def tweet_replies_raw(self, twid: int):
+        yield self.page
+
+    async def _parse_tweets(self, rep, limit: int = -1):
+        self.parsed += 1
+        return list(parse_tweets(rep, limit))
+
+
+@pytest.fixture(scope="module")
+def page() -> dict:
+    with open(os.path.join(DATA, "user_tweets_and_replies_page.json")) as f:
+        return json.load(f)
+
+
+def read_ids(path) -> list[str]:
+    with open(path) as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def test_rerun_replaces_the_output(page, tmp_path):
+    path = tmp_path / "conversations.jsonl"
+    expected = {str(x.id) for x in parse_tweets(page)}
+    for _ in range(2):
+        api = FakeAPI(page)
+        stats = asyncio.run(ConversationCrawler(api, concurrency=2).crawl_to_jsonl([1], str(path)))
+        assert api.parsed == stats.pages > 0
+        ids = read_ids(path)
+        assert len(ids) == len(set(ids))
+        assert set(ids) == expected
+    assert not os.path.exists(f"{path}.part")
+
+
+def test_failed_crawl_keeps_the_previous_output(page, tmp_path):
+    path = tmp_path / "conversations.jsonl"
+    path.write_text("previous\n")
+
+    async def run():
+        crawler = ConversationCrawler(FakeAPI(page), concurrency=1)
+
+        async def crawl(roots):
+            raise RuntimeError("interrupted")
+            yield
+
+        crawler.crawl = crawl
+        await crawler.crawl_to_jsonl([1], str(path))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert path.read_text() == "previous\n"
+    assert not os.path.exists(f"{path}.part")
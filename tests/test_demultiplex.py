@@ -0,0 +1,52 @@
+import datetime
+from types import SimpleNamespace
+
+from app.scraper.TwitterScraper import demultiplex_tweets
+
+UTC = datetime.timezone.utc
+START = datetime.datetime(2025, 2, 1, tzinfo=UTC)
+END = datetime.datetime(2025, 2, 2, tzinfo=UTC)
+
+
+def tweet(twid: int, username: str, date: datetime.datetime, retweeted=None, quoted=None):
+    # demultiplex_tweets only reads these fields of a Tweet
+    return SimpleNamespace(id=twid, user=SimpleNamespace(username=username), date=date,
+                           retweetedTweet=retweeted, quotedTweet=quoted)
+
+
+def routed_ids(tweets) -> dict[str, list[int]]:
+    routed = demultiplex_tweets(tweets, {"a": "A", "b": "B"}, START, END)
+    return {h: [t.id for t in ts] for h, ts in routed.items()}
+
+
+def test_own_tweets_in_window():
+    tweets = [tweet(1, "A", START), tweet(2, "b", START + datetime.timedelta(hours=1))]
+    assert routed_ids(tweets) == {"A": [1], "B": [2]}
+
+
+def test_old_tweet_retweeted_by_another_seed():
+    # A retweets B's 2020 tweet: `from:B since:... until:...` would never return it
+    original = tweet(1, "B", datetime.datetime(2020, 5, 1, tzinfo=UTC))
+    tweets = [tweet(2, "A", START, retweeted=original), original]
+    assert routed_ids(tweets) == {"A": [2, 1], "B": []}
+
+
+def test_old_tweet_quoted_by_another_seed():
+    original = tweet(1, "A", datetime.datetime(2020, 5, 1, tzinfo=UTC))
+    tweets = [tweet(2, "B", START, quoted=original), original]
+    assert routed_ids(tweets) == {"A": [], "B": [2, 1]}
+
+
+def test_tweet_in_window_retweeted_by_another_seed():
+    # B's tweet is in the window, both queries would have returned it
+    original = tweet(1, "B", START)
+    tweets = [tweet(2, "A", START, retweeted=original), original]
+    assert routed_ids(tweets) == {"A": [2, 1], "B": [1]}
+
+
+def test_references_of_out_of_window_tweets_are_not_routed():
+    # an old quote of A, itself quoted by B: only B's own query reaches A's quoted tweet
+    quoted = tweet(1, "x", datetime.datetime(2020, 1, 1, tzinfo=UTC))
+    old = tweet(2, "A", datetime.datetime(2020, 5, 1, tzinfo=UTC), quoted=quoted)
+    tweets = [tweet(3, "B", START, quoted=old), old, quoted]
+    assert routed_ids(tweets) == {"A": [], "B": [3, 2]}
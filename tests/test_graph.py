@@ -0,0 +1,57 @@
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+from app.scraper.twscrape.graph import DONE, FAILED, GraphCrawler, read_edges
+
+
+class FakeAPI:
+    """Followers served one page per user; `failing` users raise after their first page."""
+
+    def __init__(self, followers: dict[int, list[int]], failing: set[int] = frozenset()):
+        self.followers = followers
+        self.failing = set(failing)
+
+    async def followers_raw(self, uid: int, limit: int = -1):
+        yield self.followers.get(uid, [])
+        if uid in self.failing:
+            raise RuntimeError("rate limited")
+
+    async def _parse_users(self, rep, limit: int = -1):
+        return [SimpleNamespace(id=x) for x in rep]
+
+
+FOLLOWERS = {1: [2, 3], 2: [4], 3: [4, 5]}
+
+
+def crawl(tmp_path, api: FakeAPI, seeds=(1,), max_attempts: int = 3) -> dict:
+    crawler = GraphCrawler(api, str(tmp_path / "frontier.db"), str(tmp_path / "edges.bin"), hop_limits=(10, 10),
+                           concurrency=2, max_attempts=max_attempts)
+    return asyncio.run(crawler.crawl(list(seeds)))
+
+
+def nodes(tmp_path) -> dict[int, tuple[int, int]]:
+    with sqlite3.connect(tmp_path / "frontier.db") as db:
+        return {uid: (state, attempts) for uid, state, attempts in db.execute("SELECT uid, state, attempts FROM nodes")}
+
+
+def test_failed_user_commits_nothing(tmp_path):
+    stats = crawl(tmp_path, FakeAPI(FOLLOWERS, failing={1}))
+    assert stats == {"queued": 0, "done": 0, "failed": 1, "edges": 0}
+    # the followers of its first page aren't queued
+    assert nodes(tmp_path) == {1: (FAILED, 1)}
+
+
+def test_failed_user_is_retried_on_resume(tmp_path):
+    crawl(tmp_path, FakeAPI(FOLLOWERS, failing={1}))
+    stats = crawl(tmp_path, FakeAPI(FOLLOWERS))
+    assert stats == {"queued": 0, "done": 3, "failed": 0, "edges": 5}
+    assert sorted(read_edges(str(tmp_path / "edges.bin"))) == [(2, 1), (3, 1), (4, 2), (4, 3), (5, 3)]
+    assert nodes(tmp_path)[1] == (DONE, 1)
+
+
+def test_retries_are_bounded(tmp_path):
+    api = FakeAPI(FOLLOWERS, failing={1})
+    for _ in range(3):
+        crawl(tmp_path, api, max_attempts=2)
+    assert nodes(tmp_path) == {1: (FAILED, 2)}
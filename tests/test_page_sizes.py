@@ -0,0 +1,61 @@
+import asyncio
+import json
+import math
+
+import httpx
+import pytest
+
+import app.scraper.twscrape.api as api_module
+from app.benchmarks.pages import make_page
+from app.scraper.twscrape.api import API
+from app.scraper.twscrape.page_sizes import PageSizes
+
+# the most tweets the fake timeline sends in a page
+HONOURED = 40
+
+
+class FakeClient:
+    """Answers every request with a UserTweetsAndReplies page of `count` tweets, at most `HONOURED`."""
+
+    requests: list[int] = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def get(self, url: str, params: dict) -> httpx.Response:
+        count = json.loads(params["variables"])["count"]
+        FakeClient.requests.append(count)
+        # every fifth entry of make_page is a conversation module of two tweets
+        n = math.ceil(min(count, HONOURED) * 5 / 6)
+        page = make_page("UserTweetsAndReplies", n=n, seed=len(FakeClient.requests))
+        return httpx.Response(200, json=page)
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    FakeClient.requests = []
+    monkeypatch.setattr(api_module, "QueueClient", FakeClient)
+    api = API(pool=str(tmp_path / "accounts.db"), cursor_store=str(tmp_path / "checkpoints.db"),
+              page_sizes=PageSizes(str(tmp_path / "page_sizes.json")))
+    yield api
+    asyncio.run(api.cursor_store.close())
+
+
+def test_calibration_counts_conversation_tweets(api):
+    res = asyncio.run(api.calibrate_page_sizes({"UserTweetsAndReplies": 1}, candidates=(20, 40, 60), trials=2))
+    assert res == {"UserTweetsAndReplies": 40}
+    assert api.page_sizes.get("UserTweetsAndReplies", 0) == 40
+
+
+def test_probes_bypass_the_cursor_store(api, tmp_path):
+    asyncio.run(api.calibrate_page_sizes({"UserTweetsAndReplies": 1}, candidates=(20, 40, 60), trials=2))
+    # every trial is a request of its own, none is replayed from the checkpoint of the previous one
+    assert FakeClient.requests == [20, 20, 40, 40, 60, 60]
+    # and no unfinished chain is left behind
+    assert not (tmp_path / "checkpoints.db").exists()
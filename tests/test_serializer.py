@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+from app.scraper.TwitterScraper import to_json_lines
+from app.scraper.twscrape.models import materialize, parse_tweet_views, parse_tweets
+from app.scraper.twscrape.serializer import user_to_json
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+# the golden files were written by the original `json.dumps(Tweet.dict())` path, with its clock set to this
+DATE_SCRAPE = "2025-02-19 03:04:05"
+SEED_INFO = {"ID": 123, "SeedID": 456, "Collection": "news", "Handle": "user_10000"}
+
+
+def read(name: str) -> bytes:
+    with open(os.path.join(DATA, name), "rb") as f:
+        return f.read()
+
+
+def jsonl(lines: list[str]) -> bytes:
+    # what save_to_jsonl writes
+    return "".join(line + "\n" for line in lines).encode()
+
+
+@pytest.fixture(scope="module")
+def page() -> dict:
+    return json.loads(read("user_tweets_and_replies_page.json"))
+
+
+def test_tweets_match_the_golden_file(page):
+    tweets = list(parse_tweets(page))
+    assert jsonl(to_json_lines(tweets, None, date_scrape=DATE_SCRAPE)) == read("user_tweets_and_replies_page.jsonl")
+
+
+def test_new_format_matches_the_golden_file(page):
+    tweets = list(parse_tweets(page))
+    lines = to_json_lines(tweets, SEED_INFO, date_scrape=DATE_SCRAPE)
+    assert jsonl(lines) == read("user_tweets_and_replies_page_new_format.jsonl")
+
+
+def test_views_serialize_like_full_parses(page):
+    tweets = list(materialize(parse_tweet_views(page)))
+    assert jsonl(to_json_lines(tweets, None, date_scrape=DATE_SCRAPE)) == read("user_tweets_and_replies_page.jsonl")
+
+
+def test_users_match_the_golden_file(page):
+    golden = [json.loads(line)["user"] for line in read("user_tweets_and_replies_page.jsonl").splitlines()]
+    assert [json.loads(user_to_json(t.user)) for t in parse_tweets(page)] == golden
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import boto3
+import pytest
+
+from app.scraper.my_utils.upload_to_s3.uploader import S3Uploader
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "test-bucket"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    monkeypatch.delenv("S3BUCKET", raising=False)
+    monkeypatch.delenv("S3FOLDER", raising=False)
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def write_file(tmp_path, name: str, size: int) -> str:
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_uploads_and_flush(s3, tmp_path):
+    uploader = S3Uploader(workers=2)
+    paths = [write_file(tmp_path, f"{i}.jsonl", 100) for i in range(5)]
+    empty = write_file(tmp_path, "empty.jsonl", 0)
+
+    async def run():
+        futures = [await uploader.upload(p, bucket=BUCKET, folder="tweets") for p in paths]
+        assert await uploader.upload(empty, bucket=BUCKET, folder="tweets") is None
+        assert all(f is not None for f in futures)
+        return await uploader.flush()
+
+    summary = asyncio.run(run())
+    uploader.shutdown()
+    assert summary == {"uploaded": 5, "bytes": 500, "failed": []}
+    keys = {o["Key"] for o in s3.list_objects_v2(Bucket=BUCKET)["Contents"]}
+    assert keys == {f"tweets/{i}.jsonl" for i in range(5)}
+
+
+def test_upload_waits_for_a_slot(s3, tmp_path, monkeypatch):
+    uploader = S3Uploader(workers=1, max_pending=2)
+    release = threading.Event()
+    upload_file = uploader._upload_file
+
+    def blocked(*args):
+        release.wait(timeout=10)
+        return upload_file(*args)
+
+    monkeypatch.setattr(uploader, "_upload_file", blocked)
+    paths = [write_file(tmp_path, f"{i}.jsonl", 10) for i in range(3)]
+
+    async def run():
+        await uploader.upload(paths[0], bucket=BUCKET)
+        await uploader.upload(paths[1], bucket=BUCKET)
+        third = asyncio.ensure_future(uploader.upload(paths[2], bucket=BUCKET))
+        await asyncio.sleep(0.2)
+        # both slots are taken until an upload ends
+        assert not third.done()
+        assert len(uploader._pending) == 2
+        release.set()
+        await third
+        return await uploader.flush()
+
+    summary = asyncio.run(run())
+    uploader.shutdown()
+    assert summary["uploaded"] == 3
+
+
+def test_large_files_are_sent_in_parts(s3, tmp_path):
+    # 5 MiB is the smallest part S3 accepts
+    uploader = S3Uploader(multipart_mib=5)
+    assert uploader.transfer.multipart_threshold == 5 * 2 ** 20
+    small = write_file(tmp_path, "small.parquet", 2 ** 20)
+    large = write_file(tmp_path, "large.parquet", 6 * 2 ** 20)
+
+    async def run():
+        await uploader.upload(small, bucket=BUCKET)
+        await uploader.upload(large, bucket=BUCKET)
+        return await uploader.flush()
+
+    summary = asyncio.run(run())
+    uploader.shutdown()
+    assert summary["failed"] == []
+    # the ETag of a multipart upload ends with its number of parts
+    assert "-" not in s3.head_object(Bucket=BUCKET, Key="small.parquet")["ETag"]
+    assert s3.head_object(Bucket=BUCKET, Key="large.parquet")["ETag"].strip('"').endswith("-1")
+
+
+def test_failed_upload_skips_its_callback(s3, tmp_path):
+    uploader = S3Uploader(retries=0)
+    path = write_file(tmp_path, "0.jsonl", 10)
+    called: list[str] = []
+
+    async def run():
+        ok = await uploader.upload(path, bucket=BUCKET)
+        uploader.when_uploaded([ok, None], lambda: called.append("ok"))
+        missing = await uploader.upload(path, bucket="missing-bucket")
+        uploader.when_uploaded([ok, missing], lambda: called.append("missing"))
+        return await uploader.flush()
+
+    summary = asyncio.run(run())
+    uploader.shutdown()
+    assert called == ["ok"]
+    assert summary["uploaded"] == 1
+    assert [f["key"] for f in summary["failed"]] == ["0.jsonl"]
+    assert "NoSuchBucket" in summary["failed"][0]["error"]
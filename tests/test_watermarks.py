@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.scraper.TwitterScraper import TwitterScraper
+from app.scraper.twscrape.api import Flag
+from app.scraper.twscrape.utils import datetime_to_snowflake
+
+UTC = datetime.timezone.utc
+OVERLAP = datetime.timedelta(hours=12)
+
+
+@pytest.fixture
+def scraper(tmp_path):
+    return TwitterScraper(lim_acc=1, lim_browser=1, use_case=None, path_db=str(tmp_path / "accounts.db"),
+                          path_watermarks=str(tmp_path / "watermarks.db"), watermark_overlap=OVERLAP)
+
+
+def set_watermark(scraper: TwitterScraper, seed: str, newest_date: datetime.datetime):
+    asyncio.run(scraper.watermarks.update(seed=seed, newest_id=datetime_to_snowflake(newest_date),
+                                          newest_date=newest_date))
+
+
+def day(d: int) -> datetime.datetime:
+    return datetime.datetime(2025, 3, d, tzinfo=UTC)
+
+
+def test_no_watermark(scraper):
+    assert asyncio.run(scraper.watermark_bound("1", day(1), day(2))) is None
+
+
+def test_window_past_the_watermark_stops_at_it(scraper):
+    set_watermark(scraper, "1", day(5))
+    # the next daily window: everything from the watermark (less the overlap) on is fetched again
+    bound = asyncio.run(scraper.watermark_bound("1", day(5), day(6)))
+    assert bound == datetime_to_snowflake(day(5) - OVERLAP)
+
+
+def test_watermark_never_cuts_above_the_window_start(scraper):
+    set_watermark(scraper, "1", day(5))
+    # a window starting before the watermark is paged down to its start
+    bound = asyncio.run(scraper.watermark_bound("1", day(3), day(6)))
+    assert bound == datetime_to_snowflake(day(3))
+
+
+def test_covered_window_ignores_the_watermark(scraper):
+    set_watermark(scraper, "1", day(5))
+    assert asyncio.run(scraper.watermark_bound("1", day(2), day(3))) is None
+    assert asyncio.run(scraper.watermark_bound("1", day(4), day(5))) is None
+
+
+def test_rerun_of_a_covered_window_pages_it_whole(scraper, monkeypatch):
+    set_watermark(scraper, "1", day(5))
+    fetched: list = []
+    saved: list = []
+
+    async def user_tweets_and_replies_twscrape(uid, stopping_condition=None, watermark=None):
+        fetched.append(watermark)
+        return [], Flag(False)
+
+    async def save(data, **kwargs):
+        saved.append(kwargs["path"])
+        return data
+
+    monkeypatch.setattr(scraper, "user_tweets_and_replies_twscrape", user_tweets_and_replies_twscrape)
+    monkeypatch.setattr(scraper, "save", save)
+    asyncio.run(scraper.user_tweets_and_replies_twscrape_and_save(
+        query=1, path="1.jsonl", seed_info=SimpleNamespace(), start_date="2025-03-02", end_date="2025-03-03"))
+    assert fetched == [None]
+    assert saved == ["1.jsonl"]
+    # re-scraping an older window doesn't move the watermark back
+    watermark = asyncio.run(scraper.watermarks.get("1"))
+    assert watermark.newest_date == day(5)